@@ -1,32 +1,351 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
-import pandas as pd
-import numpy as np
-import json
+import atexit
+import time
 from datetime import datetime
-import os
 from dotenv import load_dotenv
-from models.market_basket_analyzer import MarketBasketAnalyzer
-from models.customer_segmentation import CustomerSegmentation
-from models.sales_predictor import SalesPredictor
-from models.rfm_analyzer import RFMAnalyzer
-from models.cohort_analyzer import CohortAnalyzer
+from models.registry import model_registry
+from database.cube import DIMENSIONS as CUBE_DIMENSIONS, get_sales_cube
 from database.db_manager import DatabaseManager
+from database.fact_store import get_fact_store
+from database.memory_budget import activate_budget, deactivate_budget, get_active_budget
+from database.rfm_state import get_rfm_state
+from utils.admission import AdmissionController
+from utils.events import EventBus, sse_busy, sse_stream
+from utils.fanout import FanOut
+from utils.json_provider import FastJSONProvider, dumps_bytes
+from utils.metrics import RequestMetrics, registry as metrics_registry
+from utils.http_cache import HttpCache
+from utils.streaming import iter_frame_records, stream_response, wants_stream
+from utils.profiling import RequestProfiler
+from utils.pagination import IndexCache, InvalidCursor, SortedIndex, page_params, wants_page
+from utils.warmup import Warmup
+from jobs.job_queue import JobQueue
+from config import Config
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
+# Registered first so latency includes admission queueing and 304 short-circuits
+request_metrics = RequestMetrics(app)
+
+@app.before_request
+def start_memory_budget():
+    """Track allocations for this request when a memory budget is configured"""
+    if Config.REQUEST_MEMORY_BUDGET_MB > 0:
+        activate_budget(Config.REQUEST_MEMORY_BUDGET_MB * 1024 * 1024, Config.MEMORY_BUDGET_POLICY)
+
+@app.after_request
+def apply_memory_budget(response):
+    """Turn a rejected pull into a 503 and report downsampling"""
+    budget = get_active_budget()
+    if budget is not None:
+        if budget.rejected:
+            response.status_code = 503
+        if budget.downsampled:
+            response.headers['X-Data-Downsampled'] = 'true'
+        # Neither a 503 nor a sampled result may be cached or revalidated as the full data
+        if budget.rejected or budget.downsampled:
+            response.headers['Cache-Control'] = 'no-store'
+            response.headers.pop('ETag', None)
+            response.headers.pop('Last-Modified', None)
+    return response
+
+@app.teardown_request
+def stop_memory_budget(exc):
+    deactivate_budget()
+
 # Initialize database manager
 db_manager = DatabaseManager()
 
-# Initialize ML models
-market_basket_analyzer = MarketBasketAnalyzer()
-customer_segmentation = CustomerSegmentation()
-sales_predictor = SalesPredictor()
-rfm_analyzer = RFMAnalyzer()
-cohort_analyzer = CohortAnalyzer()
+def fact_store_version():
+    """Version of the fact store snapshot this request is served from"""
+    return get_fact_store().snapshot.version
+
+def rfm_version():
+    return rfm_analyzer.data_version()
+
+def executive_summary_version():
+    return f"{fact_store_version()}|{rfm_version()}"
+
+def market_basket_version():
+    # Streamed rules are mined here from the fact store; job results are keyed on the database version
+    return fact_store_version() if wants_stream(request) else db_manager.get_cached_data_version()
+
+def customer_segments_version():
+    if wants_page(request.args) or wants_stream(request):
+        return fact_store_version()
+    return db_manager.get_cached_data_version()
+
+# Conditional GETs and compression keyed on the version of the data each endpoint serves. In-memory
+# snapshots lag the database version, so endpoints answered from them are validated on their own version.
+http_cache = HttpCache(app, version_fn=db_manager.get_cached_data_version, version_fns={
+    'get_market_basket_analysis': market_basket_version,
+    'get_customer_segments': customer_segments_version,
+    'get_recommendations': fact_store_version,
+    'api_slice': fact_store_version,
+    'api_cohort_analysis': fact_store_version,
+    'api_cohort_insights': fact_store_version,
+    'api_rfm_analysis': rfm_version,
+    'api_rfm_insights': rfm_version,
+    'api_executive_summary': executive_summary_version
+})
+
+# Load shedding: heavy ML endpoints queue briefly for a bounded number of slots, then get 503 + Retry-After.
+# Registered after the HTTP cache so 304 revalidations are never queued.
+admission = AdmissionController(classes={
+    'cheap': (Config.ADMISSION_CHEAP_CONCURRENCY, Config.ADMISSION_CHEAP_QUEUE, Config.ADMISSION_CHEAP_TIMEOUT),
+    'heavy': (Config.ADMISSION_HEAVY_CONCURRENCY, Config.ADMISSION_HEAVY_QUEUE, Config.ADMISSION_HEAVY_TIMEOUT)
+})
+if Config.ADMISSION_ENABLED:
+    admission.init_app(app)
+
+# ML models are constructed (and scikit-learn/mlxtend imported) on first use of their endpoint
+market_basket_analyzer = model_registry.proxy('market_basket')
+customer_segmentation = model_registry.proxy('customer_segments')
+sales_predictor = model_registry.proxy('sales_forecast')
+rfm_analyzer = model_registry.proxy('rfm')
+cohort_analyzer = model_registry.proxy('cohort')
+
+# Heavy analytics run in a local process pool; results persist in SQLite keyed by params and data version.
+# A preloading master must not start a pool, so its workers recover orphaned jobs after fork (wsgi.py).
+job_queue = JobQueue(Config.JOB_DB_PATH, max_workers=Config.JOB_WORKERS, stale_seconds=Config.JOB_STALE_SECONDS,
+                     result_ttl=Config.JOB_RESULT_TTL, recover=not Config.PRELOAD_APP)
+atexit.register(job_queue.shutdown)
+
+def run_job(task, params):
+    """Run a heavy computation as a job and answer with its result
+    
+    Existing clients expect the result in the response, so by default the request
+    waits for the job (up to JOB_SYNC_WAIT seconds). Clients that poll opt in with
+    ?async=1 and get 202 with the job's status_url while it is still running.
+    """
+    job = job_queue.submit(task, params, db_manager.get_cached_data_version())
+    asynchronous = request.args.get('async') == '1'
+    if job['status'] in JobQueue.ACTIVE_STATUSES and not asynchronous:
+        job = job_queue.wait(job['job_id'], Config.JOB_SYNC_WAIT)
+    else:
+        job = job_queue.get(job['job_id'])
+    
+    if job['status'] in JobQueue.ACTIVE_STATUSES:
+        status = {
+            "job_id": job['job_id'],
+            "status": job['status'],
+            "status_url": f"/api/jobs/{job['job_id']}"
+        }
+        if asynchronous:
+            return jsonify(status), 202
+        return jsonify(dict(status, error=f"{task} is still running; retry shortly or poll status_url")), 504
+    if 'result' in job:
+        return jsonify(job['result'])
+    return jsonify({'error': job['error']}), 500
+
+# Server-Sent Events: dashboards hold one stream and receive only payloads that changed
+event_bus = EventBus(Config.EVENTS_POLL_INTERVAL, Config.EVENTS_MAX_SUBSCRIBERS)
+
+def publish_data_version(bus):
+    """Push the data version and, when it changes, the new overall stats"""
+    version = db_manager.get_cached_data_version()
+    if version is None or not bus.publish('version', {"data_version": version}):
+        return
+    stats = db_manager.get_overall_stats()
+    if 'error' not in stats:
+        bus.publish('stats', stats)
+
+def publish_top_rules(bus):
+    """Push the top associations whenever this process re-mines its rules (never triggers mining)"""
+    if not model_registry.is_loaded('market_basket'):
+        return
+    result = market_basket_analyzer.result
+    # Rules for an older version would make get_top_associations re-mine
+    if result is not None and result.version == get_fact_store().version:
+        bus.publish('rules', market_basket_analyzer.get_top_associations())
+
+def finished_job_publisher(since=None):
+    """Source that pushes jobs finished by any worker process, with small results inline"""
+    cursor = {"finished_at": time.time() if since is None else since}
+    
+    def publish_finished_jobs(bus):
+        for job in job_queue.finished_since(cursor["finished_at"]):
+            cursor["finished_at"] = job['finished_at']
+            result = job.pop('result', None)
+            if result is not None:
+                if len(dumps_bytes(result)) <= Config.EVENTS_MAX_INLINE_BYTES:
+                    job['result'] = result
+                else:
+                    job['result_url'] = f"/api/jobs/{job['job_id']}"
+            # One key per task and params; a re-run that produced the same result is not re-sent
+            key = f"{job['task']}:{dumps_bytes(job['params']).decode('utf-8')}"
+            bus.publish(job['task'], job, key=key, fingerprint=[job['status'], result, job['error']])
+    
+    return publish_finished_jobs
+
+event_bus.add_source('data_version', publish_data_version)
+event_bus.add_source('rules', publish_top_rules)
+event_bus.add_source('jobs', finished_job_publisher())
+
+# Sorted indexes behind keyset pagination, rebuilt when the data version changes
+index_cache = IndexCache()
+
+def paginated_response(name, token, build, fields, key, filter_keys):
+    """Serve one keyset page (limit/after/sort/order plus equality filters) from a cached SortedIndex"""
+    column_of = {field: column for field, column, _ in fields}
+    params = page_params(request.args, filter_keys)
+    
+    index = index_cache.get(name, token, build)
+    if index is None:
+        return jsonify({"error": "No customer data available"})
+    
+    sort = column_of.get(params['sort'], params['sort']) if params['sort'] else None
+    filters = {column_of.get(field, field): value for field, value in params['filters'].items()}
+    try:
+        rows, next_cursor, total = index.page(sort, params['descending'], filters, params['after'], params['limit'])
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        key: list(iter_frame_records(rows, fields)),
+        "page": {
+            "limit": params['limit'],
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "total": int(total),
+            "sort": params['sort'] or fields[0][0],
+            "order": 'desc' if params['descending'] else 'asc',
+            "filters": params['filters']
+        }
+    })
+
+def build_rfm_index(token):
+    rfm_df = rfm_analyzer.compute_rfm_frame(datetime.now())
+    if rfm_df is None:
+        return None
+    return SortedIndex(
+        rfm_df, 'customer_id',
+        sort_columns=['recency', 'frequency', 'monetary', 'R_score', 'F_score', 'M_score', 'RFM_score', 'segment'],
+        filter_columns=['segment', 'R_score', 'F_score', 'M_score', 'RFM_score'],
+        token=token
+    )
+
+def build_segment_index(token):
+    df = customer_segmentation.prepare_customer_data()
+    if df is None or df.empty:
+        return None
+    df = customer_segmentation.cluster_customers(df)
+    return SortedIndex(
+        df, 'customer_id',
+        sort_columns=['total_orders', 'total_quantity', 'total_spent', 'avg_order_value', 'categories_purchased', 'cluster'],
+        filter_columns=['cluster'],
+        token=token
+    )
+
+def collect_app_metrics():
+    """Scrape-time gauges and counters from the pools, caches and limits owned by other components"""
+    pools = db_manager.get_pool_stats()
+    statements = db_manager.get_prepared_statement_stats()['statements']
+    models = model_registry.get_stats()
+    gates = admission.get_stats()
+    gates = dict(gates['classes'], **gates['endpoints'])
+    store = get_fact_store().get_stats()
+    events = event_bus.get_stats()
+    cube = get_sales_cube().get_stats()
+    rfm_state = get_rfm_state().get_stats()
+    return [
+        ('db_pool_connections', 'gauge', 'Pooled database connections by state', [
+            ({'pool': p['pool'], 'state': state}, p[state]) for p in pools for state in ('in_use', 'idle')
+        ]),
+        ('db_pool_max_connections', 'gauge', 'Pool size limit', [({'pool': p['pool']}, p['max']) for p in pools]),
+        ('prepared_statement_executions_total', 'counter', 'Prepared statement executions that reused (hit) or created (prepare) a plan', [
+            ({'statement': name, 'result': result}, stats[key]) for name, stats in statements.items()
+            for result, key in (('hit', 'hits'), ('prepare', 'prepares'))
+        ]),
+        ('model_loaded', 'gauge', 'Whether the analyzer has been constructed in this process', [
+            ({'model': name}, int(stats['loaded'])) for name, stats in models.items()
+        ]),
+        ('single_flight_calls_total', 'counter', 'Analyzer computations requested, by whether they ran or joined one in flight', [
+            ({'model': name, 'result': result}, stats['single_flight'][key]) for name, stats in models.items() if 'single_flight' in stats
+            for result, key in (('executed', 'executions'), ('shared', 'shared'))
+        ]),
+        ('admission_active_requests', 'gauge', 'Requests holding an admission slot', [({'gate': name}, s['active']) for name, s in gates.items()]),
+        ('admission_queued_requests', 'gauge', 'Requests waiting for an admission slot', [({'gate': name}, s['waiting']) for name, s in gates.items()]),
+        ('admission_rejected_total', 'counter', 'Requests shed with 503', [
+            ({'gate': name, 'reason': reason}, s[f'rejected_{reason}']) for name, s in gates.items() for reason in ('queue_full', 'timeout')
+        ]),
+        ('event_subscribers', 'gauge', 'Open Server-Sent Events streams', [({}, events['subscribers'])]),
+        ('events_total', 'counter', 'Event payloads pushed, or skipped because they were unchanged', [
+            ({'result': 'published'}, events['published']), ({'result': 'unchanged'}, events['unchanged'])
+        ]),
+        ('sales_cube_cells', 'gauge', 'Non-empty cells in the date x category x state x channel cube', [({}, cube['cells'])]),
+        ('rfm_state_customers', 'gauge', 'Customers mirrored from the incremental RFM state table', [({}, rfm_state['customers'])]),
+        ('fact_store_rows', 'gauge', 'Order lines held in the in-memory fact store', [({}, store['rows'])]),
+        ('fact_store_sample_fraction', 'gauge', 'Fraction of order lines kept when the store was loaded under a memory budget', [({}, store['sample_fraction'])])
+    ]
+
+metrics_registry.add_collector(collect_app_metrics)
+
+# Executive summary parts are independent, so they run concurrently on a bounded pool
+summary_fanout = FanOut(Config.SUMMARY_MAX_WORKERS, thread_name_prefix='executive-summary')
+
+def warm_job(task, params):
+    """Run a job with the exact params its endpoint uses, so the first request finds a stored result"""
+    job = job_queue.submit(task, params, db_manager.get_cached_data_version())
+    job = job_queue.wait(job['job_id'], Config.WARMUP_JOB_TIMEOUT)
+    if job['status'] != 'done':
+        raise RuntimeError(job.get('error') or f"{task} job still {job['status']}")
+
+def raise_on_error(result):
+    if isinstance(result, dict) and 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+def warm_fact_store():
+    if get_fact_store().snapshot.empty:
+        raise RuntimeError("Fact store is empty; is the database reachable?")
+
+def warm_sales_cube():
+    get_sales_cube().ensure_fresh()
+
+def warm_market_basket():
+    # Rules mined in this process back recommendations, streaming and the executive summary
+    _, error = market_basket_analyzer.mine(0.01, 0.3)
+    if error:
+        raise RuntimeError(error)
+    warm_job('market_basket', {'min_support': 0.01, 'min_confidence': 0.3})
+
+def warm_rfm():
+    raise_on_error(rfm_analyzer.get_rfm_insights())
+    index_cache.get('rfm', f"{rfm_analyzer.data_version()}|{datetime.now().date()}", build_rfm_index)
+
+def warm_cohorts():
+    raise_on_error(cohort_analyzer.get_cohort_insights())
+
+def warm_customer_segments():
+    warm_job('customer_segments', {})
+    index_cache.get('customer_segments', customer_segmentation.fact_store.snapshot.version, build_segment_index)
+
+def warm_sales_forecast():
+    # The dashboard asks for three months
+    warm_job('sales_forecast', {'months': 3})
+
+# Optional background precompute after boot (WARMUP_ENABLED=true); the load balancer polls /healthz/ready.
+# Threads do not survive fork, so a preloading gunicorn master leaves this to each worker (wsgi.py).
+# Every analytics endpoint reads the fact store, so the instance is not ready without it.
+warmup = Warmup([
+    ('fact_store', warm_fact_store),
+    ('sales_cube', warm_sales_cube),
+    ('market_basket', warm_market_basket),
+    ('rfm', warm_rfm),
+    ('cohort', warm_cohorts),
+    ('customer_segments', warm_customer_segments),
+    ('sales_forecast', warm_sales_forecast)
+], required=['fact_store'])
+if Config.WARMUP_ENABLED and not Config.PRELOAD_APP:
+    warmup.start()
 
 @app.route('/')
 def landing_page():
@@ -43,6 +362,22 @@ def advanced_dashboard():
     """Advanced analytics dashboard with executive insights"""
     return render_template('advanced_dashboard.html')
 
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving"""
+    return jsonify({"status": "ok"})
+
+@app.route('/healthz/ready')
+def healthz_ready():
+    """Readiness: 503 until the warm-up steps have finished or while a required one has failed, with per-model status"""
+    ready, report = warmup.readiness()
+    return jsonify(report), (200 if ready else 503)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of request latency, analyzer stages, caches, DB pool and process metrics"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/stats')
 def get_stats():
     """Get overall statistics"""
@@ -75,8 +410,20 @@ def get_market_basket_analysis():
         if min_confidence < 0 or min_confidence > 1:
             min_confidence = 0.3  # Use default if invalid
         
-        results = market_basket_analyzer.analyze(min_support, min_confidence)
-        return jsonify(results)
+        stream_mode = wants_stream(request)
+        if stream_mode:
+            # Stream rules straight from the mined frame instead of a serialized job result
+            result, error = market_basket_analyzer.mine(min_support, min_confidence)
+            if error:
+                return jsonify({"error": error})
+            return stream_response(stream_mode, 'association_rules', market_basket_analyzer.iter_rule_rows(result.rules), {
+                "summary": {
+                    "total_transactions": int(len(result.transactions)),
+                    "association_rules_count": int(len(result.rules))
+                }
+            })
+        
+        return run_job('market_basket', {'min_support': min_support, 'min_confidence': min_confidence})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -84,8 +431,26 @@ def get_market_basket_analysis():
 def get_customer_segments():
     """Get customer segmentation results"""
     try:
-        segments = customer_segmentation.get_segments()
-        return jsonify(segments)
+        if wants_page(request.args):
+            token = customer_segmentation.fact_store.snapshot.version
+            return paginated_response('customer_segments', token, build_segment_index,
+                                      customer_segmentation.CUSTOMER_FIELDS, 'customers', ['cluster'])
+        
+        stream_mode = wants_stream(request)
+        if stream_mode:
+            df = customer_segmentation.prepare_customer_data()
+            if df is None or df.empty:
+                return jsonify({"error": "No customer data available"})
+            df = customer_segmentation.cluster_customers(df)
+            return stream_response(stream_mode, 'customers', customer_segmentation.iter_customer_rows(df), {
+                "cluster_profiles": customer_segmentation._analyze_clusters(df),
+                "summary": {
+                    "total_customers": int(len(df)),
+                    "clusters": int(df['cluster'].nunique())
+                }
+            })
+        
+        return run_job('customer_segments', {})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -94,11 +459,67 @@ def get_sales_forecast():
     """Get sales forecast predictions"""
     try:
         months_ahead = request.args.get('months', 3, type=int)
-        forecast = sales_predictor.predict_sales(months_ahead)
-        return jsonify(forecast)
+        return run_job('sales_forecast', {'months': months_ahead})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Get status (and result when finished) of a background analytics job"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events stream of data-version, stats, top-rule and finished-job updates (?topics=stats,rules)"""
+    topics = [topic for topic in request.args.get('topics', '').split(',') if topic] or None
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    subscription = event_bus.subscribe(topics, last_event_id)
+    if subscription is None:
+        # A 200 stream that ends right away, so EventSource reconnects after the retry hint
+        busy = sse_busy(Config.EVENTS_BUSY_RETRY_MS, 'Too many open event streams; retrying later')
+        return Response(busy, mimetype='text/event-stream', headers={'X-Accel-Buffering': 'no'})
+    
+    # Streams end after EVENTS_STREAM_SECONDS so server threads are recycled; EventSource reconnects with Last-Event-ID
+    stream = sse_stream(subscription, Config.EVENTS_HEARTBEAT, Config.EVENTS_STREAM_SECONDS)
+    return Response(stream, mimetype='text/event-stream', headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/api/slice')
+def api_slice():
+    """Revenue, orders, quantity and order lines from the in-memory cube for any filter and group-by combination
+
+    ?group_by=category,month&start_date=2022-04-01&end_date=2022-04-30&ship_state=MAHARASHTRA,KARNATAKA
+    &sales_channel=Amazon.in&sort=revenue&order=desc&limit=20 (group_by takes one of date/week/month/year)
+    """
+    def values(name):
+        return [value for param in request.args.getlist(name) for value in param.split(',') if value]
+    
+    try:
+        result = get_sales_cube().slice(
+            group_by=values('group_by'),
+            filters={dimension: values(dimension) for dimension in CUBE_DIMENSIONS},
+            start_date=request.args.get('start_date'),
+            end_date=request.args.get('end_date'),
+            sort=request.args.get('sort'),
+            descending=request.args.get('order', 'desc') != 'asc',
+            limit=request.args.get('limit', type=int)
+        )
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/top-products')
 def get_top_products():
     """Get top performing products"""
@@ -127,10 +548,46 @@ def get_recommendations(customer_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/db/prepared-statements')
+def get_prepared_statement_stats():
+    """Get plan-cache hit rates and latency saved by prepared statements"""
+    try:
+        return jsonify(db_manager.get_prepared_statement_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models')
+def get_model_stats():
+    """Get which analyzers are loaded and their import/construction time"""
+    return jsonify(model_registry.get_stats())
+
+@app.route('/api/admission')
+def get_admission_stats():
+    """Get admission-control slots, queue depths and shed counts per cost class and endpoint"""
+    return jsonify(admission.get_stats())
+
 @app.route('/api/rfm-analysis')
 def api_rfm_analysis():
     """Get RFM analysis data"""
     try:
+        if wants_page(request.args):
+            # Recency moves with the calendar, so the index is rebuilt daily as well
+            token = f"{rfm_analyzer.data_version()}|{datetime.now().date()}"
+            return paginated_response('rfm', token, build_rfm_index, rfm_analyzer.RFM_FIELDS, 'rfm_data',
+                                      ['segment', 'r_score', 'f_score', 'm_score', 'rfm_score'])
+        
+        stream_mode = wants_stream(request)
+        if stream_mode:
+            reference_date = datetime.now()
+            rfm_df = rfm_analyzer.compute_rfm_frame(reference_date)
+            if rfm_df is None:
+                return jsonify({"error": "No customer data available"})
+            return stream_response(stream_mode, 'rfm_data', rfm_analyzer.iter_rfm_rows(rfm_df), {
+                "segment_summary": rfm_analyzer.summarize_segments(rfm_df),
+                "total_customers": int(len(rfm_df)),
+                "reference_date": reference_date.strftime('%Y-%m-%d')
+            })
+        
         rfm_data = rfm_analyzer.calculate_rfm()
         return jsonify(rfm_data)
     except Exception as e:
@@ -168,32 +625,21 @@ def api_cohort_insights():
 def api_executive_summary():
     """Get executive summary with key metrics and insights"""
     try:
-        print("Loading executive summary data...")
+        results, meta = summary_fanout.run({
+            "stats": (db_manager.get_overall_stats, {}),
+            "top_products": (lambda: db_manager.get_top_products(limit=5), []),
+            "market_basket": (market_basket_analyzer.get_top_associations, {}),
+            "customer_segments": (customer_segmentation.get_segments, {}),
+            "rfm_insights": (rfm_analyzer.get_rfm_insights, {}),
+            "cohort_insights": (cohort_analyzer.get_cohort_insights, {})
+        }, timeout=Config.SUMMARY_PART_TIMEOUT)
         
-        # Get all key metrics
-        print("Loading stats...")
-        stats = db_manager.get_overall_stats()
-        print(f"Stats loaded: {stats}")
-        
-        print("Loading top products...")
-        top_products = db_manager.get_top_products(limit=5)
-        print(f"Top products loaded: {len(top_products) if top_products else 0}")
-        
-        print("Loading market basket data...")
-        market_basket_data = market_basket_analyzer.get_top_associations()
-        print(f"Market basket data loaded: {len(market_basket_data) if market_basket_data else 0}")
-        
-        print("Loading customer segments...")
-        customer_segments = customer_segmentation.get_segments()
-        print(f"Customer segments loaded: {customer_segments}")
-        
-        print("Loading RFM insights...")
-        rfm_insights = rfm_analyzer.get_rfm_insights()
-        print(f"RFM insights loaded: {rfm_insights}")
-        
-        print("Loading cohort insights...")
-        cohort_insights = cohort_analyzer.get_cohort_insights()
-        print(f"Cohort insights loaded: {cohort_insights}")
+        stats = results["stats"]
+        top_products = results["top_products"]
+        market_basket_data = results["market_basket"]
+        customer_segments = results["customer_segments"]
+        rfm_insights = results["rfm_insights"]
+        cohort_insights = results["cohort_insights"]
         
         # Calculate key business metrics
         total_revenue = stats.get('total_revenue', 0)
@@ -216,7 +662,7 @@ def api_executive_summary():
             "product_insights": {
                 "total_products": stats.get('total_products', 0),
                 "top_categories": top_products[:3] if top_products else [],
-                "association_opportunities": len(market_basket_data) if market_basket_data else 0
+                "association_opportunities": market_basket_data.get('total_rules', 0)
             },
             "retention_metrics": {
                 "avg_retention": cohort_insights.get('key_metrics', {}),
@@ -227,13 +673,24 @@ def api_executive_summary():
                 "Implement cross-selling strategies based on product associations",
                 "Optimize inventory for top-performing categories",
                 "Develop targeted campaigns for at-risk customer segments"
-            ]
+            ],
+            "meta": meta
         }
         
-        return jsonify(insights)
+        response = jsonify(insights)
+        if meta['partial']:
+            # Parts fell back to defaults; a later request may get the full summary
+            response.headers['Cache-Control'] = 'no-store'
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Profiling wraps the views only when enabled, so it adds nothing to requests otherwise.
+# It refuses to start without PROFILE_TOKEN; only requests with a matching X-Profile-Token header are profiled.
+if Config.PROFILING_ENABLED:
+    request_profiler = RequestProfiler(app, Config.PROFILE_DIR, Config.PROFILE_TOKEN, Config.PROFILE_INTERVAL_MS,
+                                       Config.PROFILE_MAX_FILES)
+
 if __name__ == '__main__':
     print("🚀 Starting Advanced E-Commerce Analytics Platform")
     print("=" * 60)
@@ -274,5 +731,5 @@ if __name__ == '__main__':
     print("🎯 Using REAL PostgreSQL database with 270K+ transactions!")
     print("📚 Case Study: See CASE_STUDY.md for detailed analysis")
     print("Press Ctrl+C to stop the server")
-    app.run(debug=True, host='0.0.0.0', port=5003)
+    app.run(debug=Config.DEBUG, host='0.0.0.0', port=5003)
 
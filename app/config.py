@@ -13,9 +13,61 @@ class Config:
     
     # Flask configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
-    DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
     # API configuration
     API_TITLE = 'E-Commerce Market Basket Analysis API'
     API_VERSION = 'v1'
-
+    
+    # Per-request memory budget for database pulls (0 disables; policy is 'reject' or 'downsample')
+    REQUEST_MEMORY_BUDGET_MB = int(os.getenv('REQUEST_MEMORY_BUDGET_MB', '0'))
+    MEMORY_BUDGET_POLICY = os.getenv('MEMORY_BUDGET_POLICY', 'reject')
+    
+    # Executive summary fan-out (worker threads shared by all requests and per-part deadline in seconds)
+    SUMMARY_MAX_WORKERS = int(os.getenv('SUMMARY_MAX_WORKERS', '6'))
+    SUMMARY_PART_TIMEOUT = float(os.getenv('SUMMARY_PART_TIMEOUT', '20'))
+    
+    # Background jobs for heavy analytics endpoints; requests without ?async=1 wait up to JOB_SYNC_WAIT seconds
+    JOB_DB_PATH = os.getenv('JOB_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'jobs', 'jobs.sqlite'))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_SYNC_WAIT = float(os.getenv('JOB_SYNC_WAIT', '300'))
+    # Active jobs older than this are failed; finished results are pruned after the TTL
+    JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', '3600'))
+    JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', str(7 * 86400)))
+    
+    # Background warm-up after boot; /healthz/ready reports 503 until it finishes, or while the fact store fails to load
+    WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'False').lower() == 'true'
+    WARMUP_JOB_TIMEOUT = float(os.getenv('WARMUP_JOB_TIMEOUT', '600'))
+    
+    # Set by gunicorn.conf.py when the master preloads the app; warm-up then starts in each worker after fork
+    PRELOAD_APP = os.getenv('PRELOAD_APP', 'False').lower() == 'true'
+    
+    # Admission control: concurrent requests, wait-queue length and queueing deadline (seconds) per cost class
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+    ADMISSION_CHEAP_CONCURRENCY = int(os.getenv('ADMISSION_CHEAP_CONCURRENCY', '32'))
+    ADMISSION_CHEAP_QUEUE = int(os.getenv('ADMISSION_CHEAP_QUEUE', '64'))
+    ADMISSION_CHEAP_TIMEOUT = float(os.getenv('ADMISSION_CHEAP_TIMEOUT', '2'))
+    ADMISSION_HEAVY_CONCURRENCY = int(os.getenv('ADMISSION_HEAVY_CONCURRENCY', '4'))
+    ADMISSION_HEAVY_QUEUE = int(os.getenv('ADMISSION_HEAVY_QUEUE', '8'))
+    ADMISSION_HEAVY_TIMEOUT = float(os.getenv('ADMISSION_HEAVY_TIMEOUT', '10'))
+    
+    # On-demand profiling of single requests with ?_profile=1 (sampling) or ?_profile=cprofile;
+    # enabling it requires PROFILE_TOKEN, sent back as the X-Profile-Token header
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'profiles'))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '2'))
+    # Newest reports kept in PROFILE_DIR; older ones are deleted
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))
+    
+    # Server-Sent Events (/api/events): source poll interval, streams per process (each holds a server
+    # thread), heartbeat and stream lifetime in seconds, and the largest job result pushed inline.
+    # Every open stream takes one of the worker's GUNICORN_THREADS, so the default leaves half of the
+    # default four for API requests; clients over the limit get a short stream asking them to retry
+    # after EVENTS_BUSY_RETRY_MS instead of an error EventSource would not recover from.
+    EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '5'))
+    EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', '2'))
+    EVENTS_BUSY_RETRY_MS = int(os.getenv('EVENTS_BUSY_RETRY_MS', '30000'))
+    EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', '15'))
+    EVENTS_STREAM_SECONDS = float(os.getenv('EVENTS_STREAM_SECONDS', '300'))
+    EVENTS_MAX_INLINE_BYTES = int(os.getenv('EVENTS_MAX_INLINE_BYTES', str(256 * 1024)))
@@ -0,0 +1,192 @@
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+
+META_FILE = 'meta.json'
+# Joins list-valued fields (rule antecedents, itemsets) into one coded string; never appears in product names
+LIST_SEPARATOR = '\x1f'
+
+
+def _to_column(values):
+    """NumPy array for a list of row values; list-valued cells become joined strings"""
+    if values and isinstance(values[0], (list, tuple, set, frozenset)):
+        return np.array([LIST_SEPARATOR.join(sorted(str(v) for v in value)) for value in values]), True
+    array = np.asarray(values)
+    if array.dtype == object:
+        # Object arrays cannot be memory-mapped: numbers with gaps become float/NaN, anything else a string
+        if all(v is None or isinstance(v, (int, float)) for v in values):
+            array = np.array([np.nan if v is None else v for v in values], dtype=float)
+        else:
+            array = np.array(['' if v is None else str(v) for v in values])
+    return array, False
+
+
+def write_artifact(root, name, response=None, rows_key=None, sort_by=None, source=None):
+    """Write a response as an artifact directory, swapped in atomically
+
+    The list under rows_key is stored column by column as .npy files (strings as
+    int32 codes into a sorted vocabulary) so readers can memory-map it; the rest
+    of the response is kept as JSON. sort_by orders the rows by (column, ...) so
+    Artifact.range can binary-search the first column.
+    """
+    response = dict(response or {})
+    rows = response.pop(rows_key, None) if rows_key else None
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f".{name}.{uuid.uuid4().hex[:8]}")
+    os.makedirs(staging)
+
+    columns, list_columns = {}, []
+    if rows:
+        names = list(rows[0])
+        arrays = {}
+        for column in names:
+            arrays[column], is_list = _to_column([row.get(column) for row in rows])
+            if is_list:
+                list_columns.append(column)
+        if sort_by:
+            # np.lexsort sorts by its last key first; a leading '-' sorts a numeric column descending
+            keys = []
+            for column in reversed(sort_by):
+                values = arrays[column.lstrip('-')]
+                keys.append(-values if column.startswith('-') else values)
+            order = np.lexsort(keys)
+            arrays = {column: values[order] for column, values in arrays.items()}
+
+        for column, values in arrays.items():
+            if values.dtype.kind in 'OUS':
+                vocabulary, codes = np.unique(values.astype(str), return_inverse=True)
+                np.save(os.path.join(staging, f"{column}.codes.npy"), codes.astype(np.int32))
+                np.save(os.path.join(staging, f"{column}.vocab.npy"), vocabulary)
+                columns[column] = 'string'
+            else:
+                np.save(os.path.join(staging, f"{column}.npy"), values)
+                columns[column] = 'numeric'
+
+    meta = {
+        "name": name,
+        "rows_key": rows_key,
+        "rows": len(rows) if rows else 0,
+        "columns": columns,
+        "list_columns": list_columns,
+        "sorted_by": list(sort_by or []),
+        "payload": response,
+        "source": source,
+        "built_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    with open(os.path.join(staging, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+    target = os.path.join(root, name)
+    if os.path.exists(target):
+        retired = os.path.join(root, f".{name}.old-{uuid.uuid4().hex[:8]}")
+        os.rename(target, retired)
+        os.rename(staging, target)
+        shutil.rmtree(retired, ignore_errors=True)
+    else:
+        os.rename(staging, target)
+    return target
+
+
+class Artifact:
+    """One built response: memory-mapped row columns plus its JSON payload"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.meta = meta
+        self.name = meta["name"]
+        self.rows_key = meta["rows_key"]
+        self.size = meta["rows"]
+        self.payload = meta["payload"]
+        self._arrays = {}
+
+    def _array(self, filename):
+        array = self._arrays.get(filename)
+        if array is None:
+            # Pages are read on first touch and shared with every process mapping the same file
+            array = self._arrays[filename] = np.load(os.path.join(self.path, filename), mmap_mode='r')
+        return array
+
+    def codes(self, column):
+        return self._array(f"{column}.codes.npy")
+
+    def vocabulary(self, column):
+        return self._array(f"{column}.vocab.npy")
+
+    def values(self, column, index=None):
+        """Decoded column values, optionally for an index array or slice"""
+        if self.meta["columns"][column] == 'string':
+            codes = self.codes(column)
+            return self.vocabulary(column)[codes if index is None else codes[index]]
+        values = self._array(f"{column}.npy")
+        return values if index is None else values[index]
+
+    def range(self, column, value):
+        """Row slice whose column equals value; the column must be the artifact's first sort key"""
+        if not self.meta["sorted_by"] or self.meta["sorted_by"][0] != column:
+            raise ValueError(f"{self.name} is not sorted by {column}")
+        if self.meta["columns"][column] == 'string':
+            vocabulary = self.vocabulary(column)
+            code = int(np.searchsorted(vocabulary, value))
+            if code >= len(vocabulary) or vocabulary[code] != value:
+                return slice(0, 0)
+            keys, value = self.codes(column), code
+        else:
+            keys = self.values(column)
+        return slice(int(np.searchsorted(keys, value, 'left')), int(np.searchsorted(keys, value, 'right')))
+
+    def records(self, index=None):
+        """Rows as dicts (all rows, or those selected by an index array or slice)"""
+        if not self.size:
+            return []
+        index = slice(None) if index is None else index
+        columns = {}
+        for column in self.meta["columns"]:
+            values = self.values(column, index).tolist()
+            if column in self.meta["list_columns"]:
+                values = [value.split(LIST_SEPARATOR) if value else [] for value in values]
+            columns[column] = values
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    def response(self, index=None):
+        """The stored response with its rows (or the selected subset) put back under rows_key"""
+        response = dict(self.payload)
+        if self.rows_key:
+            response[self.rows_key] = self.records(index)
+        return response
+
+
+class ArtifactStore:
+    """Read-only set of artifacts built by scripts/build_artifacts.py, opened lazily and memory-mapped"""
+
+    def __init__(self, root):
+        self.root = root
+        self._artifacts = {}
+
+    def get(self, name):
+        """The named artifact, or None when it has not been built"""
+        artifact = self._artifacts.get(name)
+        if artifact is None:
+            path = os.path.join(self.root, name)
+            if not os.path.exists(os.path.join(path, META_FILE)):
+                return None
+            artifact = self._artifacts[name] = Artifact(path)
+        return artifact
+
+    def names(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith('.') and os.path.exists(os.path.join(self.root, name, META_FILE)))
+
+    def get_stats(self):
+        stats = {}
+        for name in self.names():
+            artifact = self.get(name)
+            stats[name] = {"rows": artifact.size, "source": artifact.meta["source"], "built_at": artifact.meta["built_at"]}
+        return stats
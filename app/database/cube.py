@@ -0,0 +1,262 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from database.fact_store import get_fact_store
+
+DIMENSIONS = ['category', 'ship_state', 'sales_channel']
+MEASURES = ['revenue', 'orders', 'quantity', 'order_lines']
+# Date roll-ups available to group_by; every grain is derived from the day stored in each cell
+DATE_GRAINS = ['date', 'week', 'month', 'year']
+
+
+def _week_start(days):
+    # 1970-01-01 was a Thursday; shift so weeks start on Monday
+    return days - (days + 3) % 7
+
+
+class _Cuboid:
+    """Non-empty cells of one dimension set with additive measures"""
+
+    def __init__(self, dimensions, cells=None):
+        self.dimensions = dimensions
+        self.cells = cells if cells is not None else pd.DataFrame(
+            {column: np.empty(0, dtype=np.int32) for column in ['day'] + dimensions}
+            | {'revenue': np.empty(0), 'quantity': np.empty(0, dtype=np.int64),
+               'order_lines': np.empty(0, dtype=np.int64), 'orders': np.empty(0, dtype=np.int64)}
+        )
+
+    @classmethod
+    def aggregate(cls, dimensions, lines):
+        keys = ['day'] + dimensions
+        cells = lines.groupby(keys, sort=False).agg(
+            revenue=('amount', 'sum'), quantity=('qty', 'sum'), order_lines=('qty', 'size'), orders=('order', 'nunique')
+        ).reset_index()
+        return cls(dimensions, cells)
+
+    def merge(self, other):
+        """Add another cuboid's cells; only valid when the two cover disjoint orders"""
+        keys = ['day'] + self.dimensions
+        cells = pd.concat([self.cells, other.cells], ignore_index=True).groupby(keys, sort=False).sum().reset_index()
+        return _Cuboid(self.dimensions, cells)
+
+
+class SalesCube:
+    """In-memory cube of revenue, orders, quantity and order lines by day × category × ship_state × sales_channel
+
+    Built from the fact store snapshot, so it costs no extra database queries.
+    When a new snapshot adds orders (an import), only their lines are aggregated
+    and merged in; a snapshot that changed or removed existing orders is rebuilt.
+
+    Distinct orders only add up across dimensions an order has a single value
+    for. An order can span categories, so a second cuboid without category
+    answers every slice that neither groups nor filters by category.
+    """
+
+    def __init__(self, fact_store=None):
+        self.fact_store = fact_store or get_fact_store()
+        self.vocabularies = {dimension: [] for dimension in DIMENSIONS}
+        self._codes = {dimension: {} for dimension in DIMENSIONS}
+        self._by_category = _Cuboid(DIMENSIONS)
+        self._by_order = _Cuboid(['ship_state', 'sales_channel'])
+        self._order_hashes = np.empty(0, dtype=np.uint64)
+        self._source = None
+        self.version = None
+        self.sample_fraction = 1.0
+        self.last_update = None
+        self._lock = threading.Lock()
+
+    def ensure_fresh(self):
+        """Fold in the fact store's current snapshot if it has not been seen yet; returns the cube to read"""
+        snapshot = self.fact_store.snapshot
+        if snapshot.sample_fraction < 1.0:
+            # Downsampled for one request: aggregated for that request only, never merged into the shared cube
+            cube = SalesCube(self.fact_store)
+            cube._update(snapshot)
+            return cube
+        source = (snapshot.version, snapshot.loaded_at)
+        if snapshot.empty or source == self._source:
+            return self
+        with self._lock:
+            if source != self._source:
+                self._update(snapshot)
+                self._source = source
+        return self
+
+    def _update(self, snapshot):
+        start = time.perf_counter()
+        order_codes = snapshot.codes['order_id']
+        vocabulary_hashes = pd.util.hash_array(snapshot.vocabularies['order_id'].astype(object))
+        known = np.isin(vocabulary_hashes, self._order_hashes)
+        known_lines = (order_codes >= 0) & known[np.maximum(order_codes, 0)]
+
+        totals = self._by_order.cells[['revenue', 'order_lines']].sum()
+        unchanged = (
+            self._order_hashes.size > 0
+            and snapshot.sample_fraction == 1.0 and self.sample_fraction == 1.0
+            and int(known_lines.sum()) == int(totals['order_lines'])
+            and np.isclose(float(snapshot.amount[known_lines].sum(dtype=np.float64)), float(totals['revenue']), rtol=1e-7)
+        )
+        if unchanged:
+            mode, new_lines = 'incremental', ~known_lines
+        else:
+            mode, new_lines = 'full', np.ones(len(snapshot), dtype=bool)
+            self._by_category = _Cuboid(DIMENSIONS)
+            self._by_order = _Cuboid(['ship_state', 'sales_channel'])
+            self._order_hashes = np.empty(0, dtype=np.uint64)
+            known = np.zeros(len(vocabulary_hashes), dtype=bool)
+
+        if new_lines.any():
+            lines = pd.DataFrame({
+                'day': snapshot.order_date[new_lines].astype(np.int64).astype(np.int32),
+                'order': order_codes[new_lines],
+                'qty': snapshot.qty[new_lines].astype(np.int64),
+                'amount': snapshot.amount[new_lines].astype(np.float64)
+            })
+            for dimension in DIMENSIONS:
+                lines[dimension] = self._cube_codes(dimension, snapshot.vocabularies[dimension])[snapshot.codes[dimension][new_lines]]
+            self._by_category = self._by_category.merge(_Cuboid.aggregate(DIMENSIONS, lines))
+            self._by_order = self._by_order.merge(_Cuboid.aggregate(['ship_state', 'sales_channel'], lines))
+            self._order_hashes = np.union1d(self._order_hashes, vocabulary_hashes[~known])
+
+        self.version = snapshot.version
+        self.sample_fraction = snapshot.sample_fraction
+        self.last_update = {
+            "mode": mode,
+            "order_lines": int(new_lines.sum()),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "at": time.time()
+        }
+
+    def _cube_codes(self, dimension, values):
+        """Map a snapshot vocabulary to this cube's codes; the extra last slot maps the -1 NULL code to -1"""
+        codes = self._codes[dimension]
+        mapped = np.empty(len(values) + 1, dtype=np.int32)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.vocabularies[dimension])
+                self.vocabularies[dimension].append(str(value))
+            mapped[i] = code
+        mapped[-1] = -1
+        return mapped
+
+    def slice(self, group_by=(), filters=None, start_date=None, end_date=None, sort=None, descending=True, limit=None):
+        """Measures grouped by any of DIMENSIONS and one DATE_GRAINS entry, within a date range and filters
+
+        filters maps a dimension to the list of values to keep. Raises ValueError for
+        unknown dimensions or measures.
+        """
+        return self.ensure_fresh()._slice(group_by, filters, start_date, end_date, sort, descending, limit)
+
+    def _slice(self, group_by, filters, start_date, end_date, sort, descending, limit):
+        group_by = list(group_by)
+        filters = {dimension: list(values) for dimension, values in (filters or {}).items() if values}
+        for dimension in list(group_by) + list(filters):
+            if dimension not in DIMENSIONS and (dimension not in DATE_GRAINS or dimension in filters):
+                raise ValueError(f"Unknown dimension: {dimension}; choose from {', '.join(DIMENSIONS + DATE_GRAINS)}")
+        grains = [dimension for dimension in group_by if dimension in DATE_GRAINS]
+        if len(grains) > 1:
+            raise ValueError("Group by at most one of: " + ', '.join(DATE_GRAINS))
+        if sort is not None and sort not in MEASURES + ['avg_order_value'] + group_by:
+            raise ValueError(f"Cannot sort by {sort}")
+
+        uses_category = 'category' in group_by or 'category' in filters
+        cells = (self._by_category if uses_category else self._by_order).cells
+        mask = np.ones(len(cells), dtype=bool)
+        days = cells['day'].to_numpy()
+        if start_date:
+            mask &= days >= pd.Timestamp(start_date).to_datetime64().astype('datetime64[D]').astype(np.int64)
+        if end_date:
+            mask &= days <= pd.Timestamp(end_date).to_datetime64().astype('datetime64[D]').astype(np.int64)
+        for dimension, values in filters.items():
+            codes = [self._codes[dimension][value] for value in values if value in self._codes[dimension]]
+            mask &= np.isin(cells[dimension].to_numpy(), codes)
+        selected = cells[mask]
+
+        if group_by:
+            keys = pd.DataFrame(index=selected.index)
+            for dimension in group_by:
+                keys[dimension] = self._group_key(dimension, selected)
+            grouped = selected[MEASURES].groupby([keys[dimension] for dimension in group_by], sort=False).sum().reset_index()
+        else:
+            grouped = pd.DataFrame([selected[MEASURES].sum()]) if len(selected) else pd.DataFrame(columns=MEASURES)
+        for dimension in group_by:
+            grouped[dimension] = self._labels(dimension, grouped[dimension].to_numpy())
+        grouped['avg_order_value'] = (grouped['revenue'] / grouped['orders'].where(grouped['orders'] > 0)).round(2)
+        grouped['revenue'] = grouped['revenue'].round(2)
+
+        sort = sort or (grains[0] if grains else 'revenue')
+        grouped = grouped.sort_values(sort, ascending=not descending if sort in MEASURES + ['avg_order_value'] else True)
+        total_rows = len(grouped)
+        if limit is not None:
+            grouped = grouped.head(limit)
+
+        totals = {measure: selected[measure].sum().item() for measure in MEASURES}
+        totals['revenue'] = round(totals['revenue'], 2)
+        totals['avg_order_value'] = round(totals['revenue'] / totals['orders'], 2) if totals['orders'] else None
+        return {
+            "rows": [self._row(record) for record in grouped.to_dict('records')],
+            "totals": totals,
+            "total_rows": total_rows,
+            # Orders summed over several categories count an order once per category it spans
+            "orders_exact": not ('category' in filters and len(filters['category']) > 1 and 'category' not in group_by),
+            "version": self.version,
+            "sample_fraction": self.sample_fraction
+        }
+
+    @staticmethod
+    def _group_key(dimension, cells):
+        """Integer group key: a dimension code, or the date in the grain's unit since the epoch"""
+        if dimension in DIMENSIONS:
+            return cells[dimension].to_numpy()
+        days = cells['day'].to_numpy().astype(np.int64)
+        if dimension == 'week':
+            return _week_start(days)
+        if dimension in ('month', 'year'):
+            return days.astype('datetime64[D]').astype(f"datetime64[{dimension[0].upper()}]").astype(np.int64)
+        return days
+
+    def _labels(self, dimension, keys):
+        if dimension in DIMENSIONS:
+            vocabulary = np.array(self.vocabularies[dimension] + [None], dtype=object)
+            return vocabulary[keys]
+        unit = {'month': 'M', 'year': 'Y'}.get(dimension, 'D')
+        return keys.astype(np.int64).astype(f"datetime64[{unit}]").astype(str)
+
+    @staticmethod
+    def _row(record):
+        row = {}
+        for column, value in record.items():
+            if column in ('orders', 'quantity', 'order_lines'):
+                value = int(value)
+            elif pd.isna(value):
+                value = None
+            elif column in ('revenue', 'avg_order_value'):
+                value = float(value)
+            row[column] = value
+        return row
+
+    def get_stats(self):
+        return {
+            "version": self.version,
+            "cells": len(self._by_category.cells),
+            "order_cells": len(self._by_order.cells),
+            "orders": int(self._order_hashes.size),
+            "sample_fraction": self.sample_fraction,
+            "last_update": self.last_update
+        }
+
+
+_sales_cube = None
+_sales_cube_lock = threading.Lock()
+
+
+def get_sales_cube():
+    """Get the process-wide sales cube"""
+    global _sales_cube
+    if _sales_cube is None:
+        with _sales_cube_lock:
+            if _sales_cube is None:
+                _sales_cube = SalesCube()
+    return _sales_cube
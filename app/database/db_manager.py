@@ -1,12 +1,23 @@
 import pandas as pd
 import psycopg2
+from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from database.prepared_statements import prepared_statements
+from database.frame_types import concat_frames, optimize_frame_dtypes
+from database.memory_budget import MemoryBudgetExceeded, get_active_budget
 
 load_dotenv()
 
 class DatabaseManager:
+    # Connection pools are shared by every manager with the same connection params
+    _pools = {}
+    _pools_lock = threading.Lock()
+    _data_version_cache = {}
+
     def __init__(self):
         # Using your existing PostgreSQL database configuration
         self.connection_params = {
@@ -16,31 +27,201 @@ class DatabaseManager:
             'password': os.getenv('DB_PASSWORD', 'Delaune.7467'),
             'port': os.getenv('DB_PORT', '5432')
         }
-        
+        self.pool_min = int(os.getenv('DB_POOL_MIN', '1'))
+        self.pool_max = int(os.getenv('DB_POOL_MAX', '10'))
+        self.chunk_rows = int(os.getenv('DB_CHUNK_ROWS', '50000'))
+        self.prepared_statements = prepared_statements
+
+    def _get_pool(self):
+        """Get (or lazily create) the shared connection pool"""
+        key = tuple(sorted(self.connection_params.items()))
+        with DatabaseManager._pools_lock:
+            conn_pool = DatabaseManager._pools.get(key)
+            if conn_pool is None or conn_pool.closed:
+                conn_pool = pool.ThreadedConnectionPool(self.pool_min, self.pool_max, **self.connection_params)
+                DatabaseManager._pools[key] = conn_pool
+            return conn_pool
+
+    @classmethod
+    def close_pools(cls):
+        """Close every shared pool; a preloading server calls this before fork so workers never share a socket"""
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+            cls._pools.clear()
+        for conn_pool in pools:
+            for conn in list(conn_pool._pool) + list(conn_pool._used.values()):
+                prepared_statements.forget(conn)
+            if not conn_pool.closed:
+                conn_pool.closeall()
+
+    def get_pool_stats(self):
+        """In-use, idle and maximum connections of each shared pool"""
+        with DatabaseManager._pools_lock:
+            pools = list(DatabaseManager._pools.items())
+        stats = []
+        for key, conn_pool in pools:
+            params = dict(key)
+            stats.append({
+                "pool": f"{params['host']}:{params['port']}/{params['database']}",
+                "in_use": len(conn_pool._used),
+                "idle": len(conn_pool._pool),
+                "max": conn_pool.maxconn,
+                "closed": bool(conn_pool.closed)
+            })
+        return stats
+
     def get_connection(self):
-        """Get database connection"""
+        """Get database connection from the pool"""
         try:
-            conn = psycopg2.connect(**self.connection_params)
+            try:
+                conn = self._get_pool().getconn()
+            except pool.PoolError:
+                # Pool exhausted: fall back to a dedicated connection
+                conn = psycopg2.connect(**self.connection_params)
+            # Read-only analytics queries; autocommit keeps pooled sessions out of open transactions
+            if not conn.autocommit:
+                conn.autocommit = True
             return conn
         except Exception as e:
             print(f"Database connection error: {e}")
             return None
-    
-    def execute_query(self, query, params=None):
-        """Execute query and return DataFrame"""
+
+    def release_connection(self, conn):
+        """Return a connection to the pool (or close it if it is not pooled)"""
+        try:
+            self._get_pool().putconn(conn, close=bool(conn.closed))
+            if conn.closed:
+                self.prepared_statements.forget(conn)
+        except Exception:
+            self.prepared_statements.forget(conn)
+            if not conn.closed:
+                conn.close()
+
+    def execute_query(self, query, params=None, typed=False):
+        """Execute query and return DataFrame (typed=True downcasts to categorical/int16)"""
+        conn = None
         try:
             conn = self.get_connection()
             if conn is None:
                 return pd.DataFrame()
             
+            budget = get_active_budget()
+            if budget is not None:
+                return self._read_with_budget(conn, query, params, typed, budget)
+            
             df = pd.read_sql_query(query, conn, params=params)
-            conn.close()
-            return df
+            return optimize_frame_dtypes(df) if typed else df
             
+        except MemoryBudgetExceeded:
+            raise
         except Exception as e:
             print(f"Query execution error: {e}")
             return pd.DataFrame()
+        finally:
+            if conn is not None:
+                self.release_connection(conn)
+
+    def _read_with_budget(self, conn, query, params, typed, budget):
+        """Stream a query through a server-side cursor, rejecting or downsampling when the memory budget runs out"""
+        chunks = []
+        stride = 1
+        rows_read = 0
+        columns = None
+
+        # Named (server-side) cursors need a transaction; the pooled session is otherwise autocommit
+        conn.autocommit = False
+        try:
+            with budget.measure(), conn.cursor(name='budgeted_pull') as cursor:
+                cursor.itersize = self.chunk_rows
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(self.chunk_rows)
+                    if columns is None and cursor.description is not None:
+                        columns = [desc[0] for desc in cursor.description]
+                    if not rows:
+                        break
+
+                    rows_read += len(rows)
+                    chunk = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+                    del rows
+                    if typed:
+                        optimize_frame_dtypes(chunk)
+                    if stride > 1:
+                        chunk = chunk.iloc[::stride].copy()
+                    chunks.append(chunk)
+
+                    while budget.used() > budget.limit_bytes:
+                        if budget.policy == 'reject' or all(len(c) <= 1 for c in chunks):
+                            budget.reject(f"Query result ({rows_read:,}+ rows)")
+                        # Keep every other row already read and sample the rest at the same rate
+                        chunks = [c.iloc[::2].copy() for c in chunks]
+                        stride *= 2
+                        budget.downsampled = True
+        finally:
+            conn.rollback()
+            conn.autocommit = True
+
+        if not chunks:
+            df = pd.DataFrame(columns=columns)
+        else:
+            df = concat_frames(chunks) if typed else pd.concat(chunks, ignore_index=True)
+        df.attrs['sample_fraction'] = 1.0 / stride
+        return df
+
+    def execute_prepared(self, name, params=None):
+        """Execute a registered prepared statement by name and return DataFrame"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            if conn is None:
+                return pd.DataFrame()
+
+            return self.prepared_statements.execute(conn, name, params)
+
+        except Exception as e:
+            print(f"Prepared statement error ({name}): {e}")
+            return pd.DataFrame()
+        finally:
+            if conn is not None:
+                self.release_connection(conn)
+
+    def get_prepared_statement_stats(self):
+        """Get plan-cache hit rates and latency saved by prepared statements"""
+        return self.prepared_statements.get_stats()
     
+    def get_data_version(self):
+        """Get a fingerprint of the order data that changes whenever it is modified"""
+        try:
+            query = """
+            SELECT
+                (SELECT COUNT(*) FROM amazon_orders) as orders,
+                (SELECT MAX(date) FROM amazon_orders) as max_date,
+                (SELECT COUNT(*) FROM amazon_order_items) as order_items,
+                (SELECT COALESCE(SUM(amount), 0) FROM amazon_order_items) as item_amount,
+                (SELECT COUNT(*) FROM amazon_products) as products
+            """
+            result = self.execute_query(query)
+            if result.empty:
+                return None
+
+            row = result.iloc[0]
+            return f"{int(row['orders'])}-{row['max_date']}-{int(row['order_items'])}-{float(row['item_amount']):.2f}-{int(row['products'])}"
+
+        except Exception as e:
+            print(f"Data version error: {e}")
+            return None
+
+    def get_cached_data_version(self, max_age=30):
+        """Get the data version, re-querying at most every max_age seconds"""
+        key = tuple(sorted(self.connection_params.items()))
+        cached = DatabaseManager._data_version_cache.get(key)
+        if cached is not None and time.time() - cached[1] < max_age:
+            return cached[0]
+
+        version = self.get_data_version()
+        DatabaseManager._data_version_cache[key] = (version, time.time())
+        return version
+
     def get_overall_stats(self):
         """Get overall statistics"""
         try:
@@ -115,19 +296,8 @@ class DatabaseManager:
             if result.empty:
                 return []
             
-            # Convert to JSON-serializable format
-            products_list = []
-            for _, row in result.iterrows():
-                products_list.append({
-                    "product_name": str(row['product_name']),
-                    "category": str(row['category']),
-                    "order_count": int(row['order_count']),
-                    "total_quantity": int(row['total_quantity']),
-                    "total_revenue": float(row['total_revenue']),
-                    "avg_price": float(row['avg_price'])
-                })
-            
-            return products_list
+            # NumPy values are serialized natively by the JSON provider
+            return result.astype({'product_name': str, 'category': str}).to_dict('records')
             
         except Exception as e:
             return {"error": str(e)}
@@ -151,17 +321,8 @@ class DatabaseManager:
             if result.empty:
                 return []
             
-            # Convert to JSON-serializable format
-            trends_list = []
-            for _, row in result.iterrows():
-                trends_list.append({
-                    "month": row['month'].strftime('%Y-%m'),
-                    "orders": int(row['orders']),
-                    "revenue": float(row['revenue']),
-                    "avg_order_value": float(row['avg_order_value'])
-                })
-            
-            return trends_list
+            result['month'] = pd.to_datetime(result['month']).dt.strftime('%Y-%m')
+            return result.to_dict('records')
             
         except Exception as e:
             return {"error": str(e)}
@@ -187,18 +348,7 @@ class DatabaseManager:
             if result.empty:
                 return []
             
-            # Convert to JSON-serializable format
-            categories_list = []
-            for _, row in result.iterrows():
-                categories_list.append({
-                    "category": str(row['category']),
-                    "orders": int(row['orders']),
-                    "quantity": int(row['quantity']),
-                    "revenue": float(row['revenue']),
-                    "avg_price": float(row['avg_price'])
-                })
-            
-            return categories_list
+            return result.astype({'category': str}).to_dict('records')
             
         except Exception as e:
             return {"error": str(e)}
@@ -265,7 +415,7 @@ class DatabaseManager:
         try:
             conn = self.get_connection()
             if conn:
-                conn.close()
+                self.release_connection(conn)
                 return {"status": "Connected", "message": "Database connection successful"}
             else:
                 return {"status": "Failed", "message": "Could not connect to database"}
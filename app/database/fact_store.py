@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from database.db_manager import DatabaseManager
+from database.memory_budget import MemoryBudgetExceeded, get_active_budget
+
+# One row per order line: orders ⋈ items ⋈ products, shared by every analyzer
+FACT_QUERY = """
+SELECT
+    ao.order_id,
+    ao.date as order_date,
+    ao.ship_postal_code as customer_id,
+    ao.ship_state,
+    ao.sales_channel,
+    aoi.sku,
+    ap.category,
+    ap.product_name,
+    aoi.qty,
+    aoi.amount,
+    ap.sku IS NOT NULL as has_product
+FROM amazon_orders ao
+JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
+LEFT JOIN amazon_products ap ON aoi.sku = ap.sku
+ORDER BY ao.order_id
+"""
+
+# String columns stored as int32 codes into a per-column vocabulary (-1 means NULL)
+ENCODED_COLUMNS = ['order_id', 'customer_id', 'ship_state', 'sales_channel', 'sku', 'category', 'product_name']
+
+
+class FactSnapshot:
+    """Immutable set of typed columns loaded for one data version"""
+
+    def __init__(self, codes, vocabularies, order_date, qty, amount, has_product, version, sample_fraction=1.0):
+        self.codes = codes
+        self.vocabularies = vocabularies
+        self.order_date = order_date
+        self.qty = qty
+        self.amount = amount
+        # Lines whose SKU has a row in amazon_products (the LEFT JOIN matched)
+        self.has_product = has_product
+        self.version = version
+        self.sample_fraction = sample_fraction
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.order_date)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+
+class FactStore:
+    """Process-level columnar copy of the order-line join
+
+    A load downsampled under a request's memory budget is never shared: it is
+    served to that request only, under its own version so nothing keyed on the
+    version mixes it with the full data, and the shared snapshot is left as it was.
+    """
+
+    def __init__(self, db_manager=None, version_ttl=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.version_ttl = float(version_ttl if version_ttl is not None else os.getenv('FACT_STORE_VERSION_TTL', '60'))
+        self._snapshot = self._empty_snapshot()
+        self._last_version_check = 0.0
+        self._refresh_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def snapshot(self):
+        """Current snapshot, refreshed if the data version changed"""
+        sampled = self._request_snapshot()
+        if sampled is not None:
+            return sampled
+        self.ensure_fresh()
+        sampled = self._request_snapshot()
+        return sampled if sampled is not None else self._snapshot
+
+    @property
+    def version(self):
+        sampled = self._request_snapshot()
+        return (sampled if sampled is not None else self._snapshot).version
+
+    def _request_snapshot(self):
+        """Snapshot downsampled for the current request, if any"""
+        sampled = getattr(self._local, 'sampled', None)
+        budget = get_active_budget()
+        # Keyed on the request's budget, so the next request on this thread never sees it
+        if sampled is not None and budget is not None and sampled[0] is budget:
+            return sampled[1]
+        return None
+
+    def get_stats(self):
+        """Size of the current snapshot, without triggering a version check"""
+        snapshot = self._snapshot
+        return {"rows": len(snapshot), "version": snapshot.version, "sample_fraction": snapshot.sample_fraction}
+
+    def ensure_fresh(self):
+        """Reload when the database reports a new data version (checked at most every version_ttl seconds)"""
+        now = time.time()
+        if not self._snapshot.empty and now - self._last_version_check < self.version_ttl:
+            return
+
+        with self._refresh_lock:
+            if not self._snapshot.empty and time.time() - self._last_version_check < self.version_ttl:
+                return
+            self._last_version_check = time.time()
+
+            version = self.db_manager.get_data_version()
+            if version is None:
+                return
+            # A load downsampled under a memory budget leaves the shared snapshot as it was, so it is retried on the next check
+            if self._snapshot.empty or version != self._snapshot.version:
+                self.refresh(version)
+
+    def refresh(self, version=None):
+        """Load the fact join from the database"""
+        try:
+            df = self.db_manager.execute_query(FACT_QUERY, typed=True)
+            if df.empty:
+                return False
+            self.load_frame(df, version)
+            return True
+        except MemoryBudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"Error refreshing fact store: {e}")
+            return False
+
+    def load_frame(self, df, version=None):
+        """Encode an order-line DataFrame (FACT_QUERY columns) and swap it in (for this request only if sampled)"""
+        codes = {}
+        vocabularies = {}
+        for column in ENCODED_COLUMNS:
+            column_codes, uniques = pd.factorize(df[column], use_na_sentinel=True)
+            codes[column] = column_codes.astype(np.int32)
+            vocabularies[column] = np.asarray(uniques, dtype=object).astype(str)
+
+        order_date = pd.to_datetime(df['order_date']).to_numpy().astype('datetime64[D]')
+        # int32 matches the INTEGER column, so no quantity can wrap; amounts stay float64 so sums and
+        # averages served by the API carry no float32 representation error
+        qty = pd.to_numeric(df['qty'], errors='coerce').fillna(0).to_numpy().astype(np.int32)
+        amount = pd.to_numeric(df['amount'], errors='coerce').fillna(0).to_numpy().astype(np.float64)
+        if 'has_product' in df:
+            has_product = df['has_product'].fillna(False).to_numpy().astype(bool)
+        else:
+            # Frames built without the flag (synthetic data) only reference known SKUs
+            has_product = codes['sku'] >= 0
+
+        sample_fraction = df.attrs.get('sample_fraction', 1.0)
+        if sample_fraction < 1.0:
+            snapshot = FactSnapshot(codes, vocabularies, order_date, qty, amount, has_product,
+                                    f"{version}~sampled-{sample_fraction:.4g}", sample_fraction)
+            self._local.sampled = (get_active_budget(), snapshot)
+            return snapshot
+        self._snapshot = FactSnapshot(codes, vocabularies, order_date, qty, amount, has_product, version, sample_fraction)
+        return self._snapshot
+
+    def frame(self, columns, mask=None, snapshot=None):
+        """Build a DataFrame of the requested columns; encoded columns come back as categoricals"""
+        snapshot = snapshot or self.snapshot
+        data = {}
+        for column in columns:
+            if column in snapshot.codes:
+                column_codes = snapshot.codes[column] if mask is None else snapshot.codes[column][mask]
+                data[column] = pd.Categorical.from_codes(column_codes, categories=snapshot.vocabularies[column])
+            else:
+                values = getattr(snapshot, column)
+                data[column] = values if mask is None else values[mask]
+        return pd.DataFrame(data, columns=columns)
+
+    def _empty_snapshot(self):
+        codes = {column: np.empty(0, dtype=np.int32) for column in ENCODED_COLUMNS}
+        vocabularies = {column: np.empty(0, dtype=object) for column in ENCODED_COLUMNS}
+        return FactSnapshot(
+            codes,
+            vocabularies,
+            np.empty(0, dtype='datetime64[D]'),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=bool),
+            None
+        )
+
+
+_fact_store = None
+_fact_store_lock = threading.Lock()
+
+
+def get_fact_store():
+    """Get the process-wide fact store"""
+    global _fact_store
+    if _fact_store is None:
+        with _fact_store_lock:
+            if _fact_store is None:
+                _fact_store = FactStore()
+    return _fact_store
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Low-cardinality string columns that repeat across rows
+CATEGORICAL_COLUMNS = [
+    'customer_id', 'product_name', 'category', 'sku', 'style', 'size',
+    'ship_state', 'ship_city', 'ship_country', 'sales_channel', 'status', 'segment'
+]
+
+# Money columns stay float64: float32 representation error shows up in sums and averages the API serves
+
+# Per-line quantities fit comfortably in int16
+INT16_COLUMNS = ['qty', 'quantity']
+
+
+def optimize_frame_dtypes(df):
+    """Downcast a query result in place: categorical strings and int16 quantities"""
+    for column in df.columns:
+        series = df[column]
+
+        if column in CATEGORICAL_COLUMNS and pd.api.types.is_string_dtype(series.dtype):
+            df[column] = series.astype('category')
+
+        elif column in INT16_COLUMNS and pd.api.types.is_numeric_dtype(series):
+            if series.isna().any():
+                continue
+            info = np.iinfo(np.int16)
+            if series.empty or (series.min() >= info.min and series.max() <= info.max):
+                df[column] = series.astype(np.int16)
+
+    return df
+
+
+def concat_frames(chunks):
+    """Concatenate chunks optimized one at a time; categorical columns are unioned so they stay categorical"""
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            # pd.concat falls back to object when the chunks saw different categories
+            columns[column] = pd.Series(union_categoricals(parts, ignore_order=True), name=column)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def frame_memory_bytes(df):
+    """Deep memory footprint of a DataFrame"""
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,109 @@
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+
+# Pulls tracing at the moment; tracemalloc is process-wide, so it stops only when the last one finishes
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_started_tracing = False
+
+
+def _acquire_tracing():
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        # Tracing started by someone else (a profiler, a benchmark) is left running
+        if _tracing_users == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when a query pull would exceed the active memory budget"""
+    pass
+
+
+class MemoryBudget:
+    """Per-request allocation budget, measured with tracemalloc while a database pull runs"""
+
+    POLICIES = ('reject', 'downsample')
+
+    def __init__(self, limit_bytes, policy='reject'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown memory budget policy: {policy}")
+        self.limit_bytes = int(limit_bytes)
+        self.policy = policy
+        self.baseline = 0
+        self.peak = 0
+        self.rejected = False
+        self.downsampled = False
+
+    @contextmanager
+    def measure(self):
+        """Trace allocations for the duration of one pull, measured from the level when it starts"""
+        _acquire_tracing()
+        try:
+            self.baseline = tracemalloc.get_traced_memory()[0]
+            yield self
+        finally:
+            _release_tracing()
+
+    def used(self):
+        """Bytes allocated since the pull started (tracemalloc is process-wide, so concurrent pulls count too)"""
+        if not tracemalloc.is_tracing():
+            return 0
+        used = max(tracemalloc.get_traced_memory()[0] - self.baseline, 0)
+        self.peak = max(self.peak, used)
+        return used
+
+    def remaining(self):
+        return self.limit_bytes - self.used()
+
+    def reject(self, description):
+        """Flag the request and raise MemoryBudgetExceeded"""
+        self.rejected = True
+        raise MemoryBudgetExceeded(
+            f"{description} would exceed the request memory budget of {self.limit_bytes // (1024 * 1024)} MB"
+        )
+
+    def to_dict(self):
+        return {
+            "limit_bytes": self.limit_bytes,
+            "policy": self.policy,
+            "peak_bytes": self.peak,
+            "rejected": self.rejected,
+            "downsampled": self.downsampled
+        }
+
+
+_local = threading.local()
+
+
+def get_active_budget():
+    """Get the memory budget active on this thread, if any"""
+    return getattr(_local, 'budget', None)
+
+
+def activate_budget(limit_bytes, policy='reject'):
+    """Attach a memory budget to the current thread; nothing is traced until a pull measures it"""
+    budget = MemoryBudget(limit_bytes, policy)
+    _local.budget = budget
+    return budget
+
+
+def deactivate_budget():
+    """Clear the current thread's memory budget"""
+    budget = get_active_budget()
+    if budget is not None:
+        _local.budget = None
+    return budget
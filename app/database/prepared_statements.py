@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+import pandas as pd
+from psycopg2 import errors
+
+
+class PreparedStatementRegistry:
+    """Registry of named queries prepared once per pooled connection"""
+
+    NAME_PATTERN = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+    def __init__(self):
+        self._queries = {}
+        self._prepared = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, query):
+        """Register a parameterized query (psycopg2 %s placeholders) under a name"""
+        if not self.NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid prepared statement name: {name}")
+
+        # PREPARE uses positional $n parameters instead of %s
+        param_count = 0
+        parts = []
+        for i, chunk in enumerate(query.replace('%%', '\0').split('%s')):
+            if i > 0:
+                param_count += 1
+                parts.append(f"${param_count}")
+            parts.append(chunk)
+        server_query = ''.join(parts).replace('\0', '%')
+
+        with self._lock:
+            self._queries[name] = (server_query, param_count)
+            self._stats.setdefault(name, {
+                "prepares": 0,
+                "hits": 0,
+                "prepare_time": 0.0,
+                "hit_time": 0.0
+            })
+
+    def is_registered(self, name):
+        """Check whether a query name has been registered"""
+        return name in self._queries
+
+    def execute(self, conn, name, params=None):
+        """Execute a registered query by name on conn and return DataFrame"""
+        if name not in self._queries:
+            raise KeyError(f"Unknown prepared statement: {name}")
+
+        server_query, param_count = self._queries[name]
+        params = tuple(params or ())
+        if len(params) != param_count:
+            raise ValueError(f"{name} expects {param_count} parameters, got {len(params)}")
+
+        start = time.perf_counter()
+        prepared_now = False
+        with conn.cursor() as cursor:
+            if name not in self._prepared_on(conn):
+                cursor.execute(f"PREPARE {name} AS {server_query}")
+                self._mark_prepared(conn, name)
+                prepared_now = True
+
+            execute_sql = f"EXECUTE {name}"
+            if param_count:
+                execute_sql += f" ({', '.join(['%s'] * param_count)})"
+
+            try:
+                cursor.execute(execute_sql, params)
+            except errors.InvalidSqlStatementName:
+                # Session lost the statement (e.g. DISCARD ALL); prepare it again once
+                cursor.execute(f"PREPARE {name} AS {server_query}")
+                self._mark_prepared(conn, name)
+                prepared_now = True
+                cursor.execute(execute_sql, params)
+
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
+
+        self._record(name, prepared_now, time.perf_counter() - start)
+        return pd.DataFrame(rows, columns=columns)
+
+    def forget(self, conn):
+        """Drop bookkeeping for a connection that is being closed"""
+        with self._lock:
+            self._prepared.pop(id(conn), None)
+
+    def get_stats(self):
+        """Plan-cache hit rates and estimated latency saved per statement"""
+        with self._lock:
+            statements = {}
+            total_hits = 0
+            total_prepares = 0
+            total_saved = 0.0
+
+            for name, stats in self._stats.items():
+                prepares, hits = stats["prepares"], stats["hits"]
+                avg_prepare_ms = (stats["prepare_time"] / prepares) * 1000 if prepares else 0.0
+                avg_hit_ms = (stats["hit_time"] / hits) * 1000 if hits else 0.0
+                # Every hit skipped the parse/plan work paid by the first execution
+                saved_ms = max(avg_prepare_ms - avg_hit_ms, 0.0) * hits if prepares and hits else 0.0
+
+                statements[name] = {
+                    "prepares": prepares,
+                    "hits": hits,
+                    "hit_rate": round(hits / (hits + prepares), 4) if hits + prepares else 0.0,
+                    "avg_first_execution_ms": round(avg_prepare_ms, 3),
+                    "avg_cached_execution_ms": round(avg_hit_ms, 3),
+                    "estimated_latency_saved_ms": round(saved_ms, 3)
+                }
+                total_hits += hits
+                total_prepares += prepares
+                total_saved += saved_ms
+
+            return {
+                "statements": statements,
+                "summary": {
+                    "prepared_connections": len(self._prepared),
+                    "total_prepares": total_prepares,
+                    "total_hits": total_hits,
+                    "hit_rate": round(total_hits / (total_hits + total_prepares), 4) if total_hits + total_prepares else 0.0,
+                    "estimated_latency_saved_ms": round(total_saved, 3)
+                }
+            }
+
+    def _prepared_on(self, conn):
+        with self._lock:
+            return self._prepared.get(id(conn), set())
+
+    def _mark_prepared(self, conn, name):
+        with self._lock:
+            self._prepared.setdefault(id(conn), set()).add(name)
+
+    def _record(self, name, prepared_now, elapsed):
+        with self._lock:
+            stats = self._stats[name]
+            if prepared_now:
+                stats["prepares"] += 1
+                stats["prepare_time"] += elapsed
+            else:
+                stats["hits"] += 1
+                stats["hit_time"] += elapsed
+
+
+# Process-wide registry shared by every DatabaseManager (connections come from a shared pool)
+prepared_statements = PreparedStatementRegistry()
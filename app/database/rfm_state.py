@@ -0,0 +1,290 @@
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Fold the queued order lines into the per-customer totals; a sync costs O(new lines). Frequency
+# counts order lines, as the full computation does. Lines committed after the DELETE stay queued.
+APPLY_QUEUED_LINES = """
+WITH queued AS (
+    DELETE FROM customer_rfm_state_queue
+    RETURNING order_id, sku
+),
+deltas AS (
+    SELECT
+        ao.ship_postal_code as customer_id,
+        MAX(ao.date) as last_order_date,
+        COUNT(*) as frequency,
+        COALESCE(SUM(aoi.amount::double precision), 0) as monetary
+    FROM (SELECT DISTINCT order_id, sku FROM queued) q
+    JOIN amazon_orders ao ON ao.order_id = q.order_id
+    JOIN amazon_order_items aoi ON aoi.order_id = q.order_id AND aoi.sku = q.sku
+    WHERE ao.ship_postal_code IS NOT NULL
+      AND ao.date IS NOT NULL
+    GROUP BY ao.ship_postal_code
+)
+INSERT INTO customer_rfm_state AS s (customer_id, last_order_date, frequency, monetary, revision)
+SELECT customer_id, last_order_date, frequency, monetary, nextval('customer_rfm_state_revision')
+FROM deltas
+ON CONFLICT (customer_id) DO UPDATE SET
+    last_order_date = GREATEST(s.last_order_date, EXCLUDED.last_order_date),
+    frequency = s.frequency + EXCLUDED.frequency,
+    monetary = s.monetary + EXCLUDED.monetary,
+    revision = EXCLUDED.revision,
+    updated_at = now()
+"""
+
+# Recompute every customer. The flag is cleared first: its row lock waits for writers that flagged
+# it, so their changes are visible to the INSERT, and TRUNCATE holds new lines in their transactions.
+# The generation tells other processes to reload their mirrors rather than read deltas.
+REBUILD = """
+UPDATE customer_rfm_state_meta SET needs_rebuild = FALSE, checked_at = now(), generation = generation + 1;
+TRUNCATE customer_rfm_state, customer_rfm_state_queue;
+INSERT INTO customer_rfm_state (customer_id, last_order_date, frequency, monetary, revision)
+SELECT
+    ao.ship_postal_code,
+    MAX(ao.date),
+    COUNT(*),
+    COALESCE(SUM(aoi.amount::double precision), 0),
+    nextval('customer_rfm_state_revision')
+FROM amazon_orders ao
+JOIN amazon_order_items aoi ON aoi.order_id = ao.order_id
+WHERE ao.ship_postal_code IS NOT NULL
+  AND ao.date IS NOT NULL
+GROUP BY ao.ship_postal_code
+"""
+
+# Safety net for changes the triggers cannot see (e.g. session_replication_role = replica); O(all
+# lines), so it only runs every check_seconds. One statement, so all counts share a snapshot.
+CHECK_TOTALS = """
+SELECT
+    (SELECT COALESCE(SUM(frequency), 0)::bigint FROM customer_rfm_state) as state_lines,
+    (SELECT COALESCE(SUM(monetary), 0) FROM customer_rfm_state) as state_amount,
+    COUNT(*) as order_lines,
+    COALESCE(SUM(aoi.amount::double precision), 0) as order_amount
+FROM amazon_orders ao
+JOIN amazon_order_items aoi ON aoi.order_id = ao.order_id
+WHERE ao.ship_postal_code IS NOT NULL
+  AND ao.date IS NOT NULL
+  AND NOT EXISTS (
+      SELECT 1 FROM customer_rfm_state_queue q WHERE q.order_id = aoi.order_id AND q.sku = aoi.sku
+  )
+"""
+
+SYNC_STATUS = """
+SELECT needs_rebuild, checked_at IS NULL OR checked_at < now() - %s * interval '1 second', generation
+FROM customer_rfm_state_meta
+"""
+
+CHANGED_SINCE = """
+SELECT customer_id, last_order_date, frequency, monetary, revision
+FROM customer_rfm_state
+WHERE revision > %s
+"""
+
+
+class RFMState:
+    """Per-customer last order date, order-line count and monetary sum, persisted in Postgres
+
+    A trigger queues every new order line. Each sync folds the queued lines into
+    the customer_rfm_state table as deltas, in one statement under an advisory
+    lock so several workers can sync. Each process mirrors the table in arrays
+    and reads back only the rows whose revision moved, so a sync costs O(new
+    lines) in the database and O(changed customers) in Python. Updates, deletes
+    and truncates of the source tables flag the state for a rebuild, which bumps
+    the table's generation; a process that sees a new generation reloads its
+    whole mirror. A totals check against every order line runs every
+    check_seconds as a safety net.
+
+    The tables and triggers come from scripts/create_rfm_state.sql (python
+    scripts/setup_rfm_state.py); syncs fail until they exist.
+
+    Recency is derived at query time. Score bins only depend on the extremes of
+    each input, so when those hold, only changed customers are re-scored; recency
+    is binned as days before the latest order, which does not move with the
+    reference date.
+    """
+
+    # Seconds before a failed sync is tried again
+    RETRY_SECONDS = 30
+
+    def __init__(self, db_manager=None, check_seconds=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.check_seconds = check_seconds if check_seconds is not None else float(os.getenv('RFM_STATE_CHECK_SECONDS', '3600'))
+        self.version = None
+        self.last_sync = None
+        self.last_error = None
+        self._retry_at = 0
+        self._table_checked = False
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.customer_ids = np.empty(0, dtype=object)
+        self.last_day = np.empty(0, dtype=np.int64)
+        self.frequency = np.empty(0, dtype=np.int64)
+        self.monetary = np.empty(0, dtype=np.float64)
+        self.codes = np.empty((3, 0), dtype=np.int64)
+        self._rows = {}
+        self._bins = None
+        self._extremes = None
+        self.revision = 0
+        self.generation = None
+
+    @property
+    def loaded(self):
+        return len(self.customer_ids) > 0
+
+    def ensure_fresh(self):
+        """Sync once per data version; returns whether the state holds any customers"""
+        version = self.db_manager.get_cached_data_version()
+        if version is not None and version != self.version and time.time() >= self._retry_at:
+            with self._lock:
+                if version != self.version:
+                    try:
+                        self._sync()
+                        self.version = version
+                        self.last_error = None
+                    except Exception as e:
+                        # The version stays unsynced, so the first request after the back-off retries
+                        logger.exception("RFM state sync failed")
+                        self.last_error = f"{type(e).__name__}: {e}"
+                        self._retry_at = time.time() + self.RETRY_SECONDS
+        return self.loaded
+
+    def rebuild(self):
+        """Recompute the persisted state from every order and reload it"""
+        with self._lock:
+            self._sync(rebuild=True)
+
+    def _sync(self, rebuild=False):
+        start = time.perf_counter()
+        conn = self.db_manager.get_connection()
+        if conn is None:
+            raise RuntimeError("No database connection")
+        checked = False
+        try:
+            conn.autocommit = False
+            with conn, conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext('customer_rfm_state'))")
+                if not self._table_checked:
+                    cursor.execute("SELECT to_regclass('customer_rfm_state_meta') IS NOT NULL")
+                    if not cursor.fetchone()[0]:
+                        raise RuntimeError("customer_rfm_state tables are missing; run python scripts/setup_rfm_state.py")
+                    self._table_checked = True
+                cursor.execute(SYNC_STATUS, (self.check_seconds,))
+                needs_rebuild, check_due, generation = cursor.fetchone()
+                rebuild = rebuild or needs_rebuild
+                if not rebuild:
+                    cursor.execute(APPLY_QUEUED_LINES)
+                    if check_due:
+                        checked = True
+                        cursor.execute(CHECK_TOTALS)
+                        state_lines, state_amount, order_lines, order_amount = cursor.fetchone()
+                        # A mismatch means the source tables changed behind the triggers' back
+                        rebuild = state_lines != order_lines or not np.isclose(state_amount, order_amount, rtol=1e-9)
+                        if not rebuild:
+                            cursor.execute("UPDATE customer_rfm_state_meta SET checked_at = now()")
+                if rebuild:
+                    cursor.execute(REBUILD)
+                    generation += 1
+                # Another process rebuilt the table since the last sync: deltas miss deleted customers
+                reload = generation != self.generation
+                cursor.execute(CHANGED_SINCE, (0 if reload else self.revision,))
+                changes = pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+        finally:
+            if not conn.closed:
+                conn.autocommit = True
+            self.db_manager.release_connection(conn)
+
+        if reload:
+            self._clear()
+            self.generation = generation
+        self._apply(changes)
+        self.last_sync = {
+            "mode": 'rebuild' if rebuild else 'reload' if reload else 'incremental',
+            "totals_checked": checked,
+            "changed_customers": int(len(changes)),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "at": time.time()
+        }
+
+    def _apply(self, changes):
+        if changes.empty:
+            return
+        ids = changes['customer_id'].astype(str).to_numpy(dtype=object)
+        rows = np.fromiter((self._rows.get(customer_id, -1) for customer_id in ids), dtype=np.int64, count=len(ids))
+        new = rows < 0
+        if new.any():
+            n, added = len(self.customer_ids), int(new.sum())
+            rows[new] = np.arange(n, n + added)
+            self._rows.update(zip(ids[new], rows[new].tolist()))
+            self.customer_ids = np.concatenate([self.customer_ids, ids[new]])
+            self.last_day = np.concatenate([self.last_day, np.zeros(added, dtype=np.int64)])
+            self.frequency = np.concatenate([self.frequency, np.zeros(added, dtype=np.int64)])
+            self.monetary = np.concatenate([self.monetary, np.zeros(added)])
+            self.codes = np.concatenate([self.codes, np.zeros((3, added), dtype=np.int64)], axis=1)
+
+        self.last_day[rows] = pd.to_datetime(changes['last_order_date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+        self.frequency[rows] = changes['frequency'].to_numpy(dtype=np.int64)
+        self.monetary[rows] = changes['monetary'].to_numpy(dtype=np.float64)
+        self.revision = max(self.revision, int(changes['revision'].max()))
+        self._score(rows)
+
+    def _score(self, rows):
+        """Bin codes (0-4) for R, F and M; only the given rows unless an extreme moved"""
+        extremes = [(values.min(), values.max()) for values in (self.last_day, self.frequency, self.monetary)]
+        inputs = [self.last_day.max() - self.last_day, self.frequency, self.monetary]
+        if extremes != self._extremes:
+            self._bins = []
+            for i, values in enumerate(inputs):
+                codes, bins = pd.cut(values, 5, labels=False, retbins=True)
+                self.codes[i] = codes
+                self._bins.append(bins)
+            self._extremes = extremes
+        else:
+            for i, values in enumerate(inputs):
+                self.codes[i, rows] = pd.cut(values[rows], self._bins[i], labels=False)
+
+    def frame(self, reference_date):
+        """Customer rows and R/F/M bin codes as of reference_date, or None when it precedes orders in the state"""
+        reference_day = np.datetime64(pd.Timestamp(reference_date).date(), 'D').astype(np.int64)
+        with self._lock:
+            if not self.loaded or reference_day < self.last_day.max():
+                return None
+            rfm_df = pd.DataFrame({
+                'customer_id': self.customer_ids,
+                'recency': reference_day - self.last_day,
+                'frequency': self.frequency.copy(),
+                'monetary': self.monetary.copy()
+            })
+            # Recency bins count days before the latest order, so recent customers have low codes
+            return rfm_df, 4 - self.codes[0], self.codes[1].copy(), self.codes[2].copy()
+
+    def get_stats(self):
+        return {
+            "customers": int(len(self.customer_ids)),
+            "revision": self.revision,
+            "version": self.version,
+            "last_sync": self.last_sync,
+            "last_error": self.last_error
+        }
+
+
+_rfm_state = None
+_rfm_state_lock = threading.Lock()
+
+
+def get_rfm_state():
+    """Get the process-wide RFM state"""
+    global _rfm_state
+    if _rfm_state is None:
+        with _rfm_state_lock:
+            if _rfm_state is None:
+                _rfm_state = RFMState()
+    return _rfm_state
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait
+from jobs.tasks import TASKS, execute_job, init_worker
+from utils.metrics import record_cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job_key TEXT NOT NULL,
+    task TEXT NOT NULL,
+    params TEXT NOT NULL,
+    data_version TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    dispatcher_pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_key_status ON jobs (job_key, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at);
+"""
+
+
+class JobQueue:
+    """SQLite-backed job queue executed by a local process pool
+
+    Each job row records the pid of the process whose pool runs it. Jobs whose
+    dispatcher has exited (a restarted or recycled worker) are taken over by
+    recover() or by the next identical submit, and active jobs older than
+    stale_seconds are failed so they stop answering 202. Finished rows are
+    pruned after result_ttl seconds.
+    """
+
+    ACTIVE_STATUSES = ('pending', 'running')
+    PRUNE_INTERVAL = 300
+
+    def __init__(self, db_path, max_workers=2, stale_seconds=3600, result_ttl=7 * 86400, recover=True):
+        self.db_path = os.path.abspath(db_path)
+        self.max_workers = max_workers
+        self.stale_seconds = stale_seconds
+        self.result_ttl = result_ttl
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Queues created before jobs recorded their dispatcher
+            columns = [row['name'] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if 'dispatcher_pid' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN dispatcher_pid INTEGER")
+        if recover:
+            self.recover()
+
+    def submit(self, task, params, data_version=None):
+        """Queue a job, reusing a finished result or an identical pending job when one exists"""
+        if task not in TASKS:
+            raise ValueError(f"Unknown job task: {task}")
+
+        job_key = self._job_key(task, params, data_version)
+        self._maybe_prune()
+        with self._lock:
+            with self._connect() as conn:
+                # The write lock makes the lookup and the insert atomic across processes
+                conn.execute("BEGIN IMMEDIATE")
+                self._expire_stale(conn, job_key)
+                existing = conn.execute(
+                    """
+                    SELECT * FROM jobs
+                    WHERE job_key = ? AND status IN ('pending', 'running', 'done')
+                    ORDER BY CASE status WHEN 'done' THEN 0 ELSE 1 END, created_at DESC
+                    LIMIT 1
+                    """,
+                    (job_key,)
+                ).fetchone()
+                record_cache('job_results', existing is not None)
+                if existing is not None:
+                    if existing['status'] == 'done' or self._dispatcher_alive(existing['dispatcher_pid']):
+                        return self._to_dict(existing, include_result=False)
+                    # Its dispatcher is gone: run it here instead of waiting for it to go stale
+                    job_id = existing['id']
+                    self._claim(conn, [job_id])
+                else:
+                    job_id = uuid.uuid4().hex
+                    conn.execute(
+                        """
+                        INSERT INTO jobs (id, job_key, task, params, data_version, status, created_at, dispatcher_pid)
+                        VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)
+                        """,
+                        (job_id, job_key, task, json.dumps(params, sort_keys=True), data_version, time.time(), os.getpid())
+                    )
+
+            self._dispatch(job_id, task, params)
+            return self.get(job_id, include_result=False)
+
+    def get(self, job_id, include_result=True):
+        """Get a job's status (and result once finished)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row, include_result) if row is not None else None
+
+    def wait(self, job_id, timeout):
+        """Wait up to timeout seconds for a job to finish; returns the job"""
+        future = self._futures.get(job_id)
+        if future is not None:
+            wait([future], timeout=timeout)
+        else:
+            # Dispatched by another process: poll the shared queue
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                job = self.get(job_id, include_result=False)
+                if job is None or job['status'] not in self.ACTIVE_STATUSES:
+                    break
+                time.sleep(0.1)
+        return self.get(job_id)
+
+    def finished_since(self, since, limit=100):
+        """Jobs that finished (done or failed) after the given timestamp, oldest first, with results"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE finished_at > ? AND status IN ('done', 'failed')
+                ORDER BY finished_at
+                LIMIT ?
+                """,
+                (since, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def recover(self):
+        """Fail stale jobs and re-dispatch active ones whose dispatching process has exited; returns the count re-dispatched"""
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._expire_stale(conn)
+                rows = conn.execute(
+                    "SELECT id, task, params, dispatcher_pid FROM jobs WHERE status IN ('pending', 'running')"
+                ).fetchall()
+                orphans = [row for row in rows if not self._dispatcher_alive(row['dispatcher_pid'])]
+                self._claim(conn, [row['id'] for row in orphans])
+            for row in orphans:
+                self._dispatch(row['id'], row['task'], json.loads(row['params']))
+        return len(orphans)
+
+    def prune(self):
+        """Delete finished jobs older than result_ttl; returns the number deleted"""
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - self.result_ttl,)
+            ).rowcount
+        self._last_prune = time.time()
+        return deleted
+
+    def shutdown(self):
+        """Stop this process's pool; its unfinished jobs are left for recover() in another process"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _maybe_prune(self):
+        if time.time() - self._last_prune > self.PRUNE_INTERVAL:
+            self.prune()
+
+    def _expire_stale(self, conn, job_key=None):
+        now = time.time()
+        query = """
+            UPDATE jobs SET status = 'failed', error = ?, finished_at = ?
+            WHERE status IN ('pending', 'running') AND COALESCE(started_at, created_at) < ?
+        """
+        params = [f"Job did not finish within {self.stale_seconds:g} seconds", now, now - self.stale_seconds]
+        if job_key is not None:
+            query += " AND job_key = ?"
+            params.append(job_key)
+        conn.execute(query, params)
+
+    @staticmethod
+    def _claim(conn, job_ids):
+        conn.executemany(
+            "UPDATE jobs SET status = 'pending', started_at = NULL, dispatcher_pid = ? WHERE id = ?",
+            [(os.getpid(), job_id) for job_id in job_ids]
+        )
+
+    @staticmethod
+    def _dispatcher_alive(pid):
+        if pid is None:
+            return False
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _dispatch(self, job_id, task, params):
+        future = self._get_executor().submit(execute_job, self.db_path, job_id, task, params)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+
+    def _on_done(self, job_id, future):
+        self._futures.pop(job_id, None)
+        error = future.exception() if not future.cancelled() else None
+        if error is not None:
+            # The worker died before it could record the failure itself
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                    (f"{type(error).__name__}: {error}", time.time(), job_id)
+                )
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Spawned workers avoid inheriting the web server's threads, locks and DB connections
+            app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(app_dir,)
+            )
+        return self._executor
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _job_key(task, params, data_version):
+        payload = json.dumps([task, params, data_version], sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _to_dict(row, include_result=True):
+        job = {
+            "job_id": row['id'],
+            "task": row['task'],
+            "params": json.loads(row['params']),
+            "status": row['status'],
+            "error": row['error'],
+            "data_version": row['data_version'],
+            "created_at": row['created_at'],
+            "started_at": row['started_at'],
+            "finished_at": row['finished_at']
+        }
+        if include_result and row['result'] is not None:
+            job["result"] = json.loads(row['result'])
+        return job
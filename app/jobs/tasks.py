@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import sys
+import time
+import numpy as np
+
+
+def init_worker(app_dir):
+    """Process-pool initializer: make the app modules importable in spawned workers"""
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)
+
+
+def _get_analyzer(name):
+    # Analyzers are built once per worker process (by that process's registry) and reused across jobs
+    from models.registry import model_registry
+    return model_registry.get(name)
+
+
+def run_market_basket(min_support, min_confidence):
+    return _get_analyzer('market_basket').analyze(min_support, min_confidence)
+
+
+def run_customer_segments():
+    return _get_analyzer('customer_segments').get_segments()
+
+
+def run_sales_forecast(months):
+    return _get_analyzer('sales_forecast').predict_sales(months)
+
+
+TASKS = {
+    'market_basket': run_market_basket,
+    'customer_segments': run_customer_segments,
+    'sales_forecast': run_sales_forecast
+}
+
+
+def to_json(value):
+    """Serialize a task result, converting NumPy scalars and arrays"""
+    def default(obj):
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return json.dumps(value, default=default)
+
+
+def execute_job(db_path, job_id, task, params):
+    """Run one queued job inside a worker process and persist its outcome"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        started = conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'pending'", (time.time(), job_id)
+        ).rowcount
+        conn.commit()
+        if not started:
+            # Expired, or already picked up by the process that took the job over
+            return None
+
+        try:
+            result = TASKS[task](**params)
+            # Analyzers report failures as {"error": ...}; keep the payload but do not reuse it
+            if isinstance(result, dict) and 'error' in result:
+                status, error = 'failed', str(result['error'])
+            else:
+                status, error = 'done', None
+            result_json = to_json(result)
+        except Exception as e:
+            status, error, result_json = 'failed', f"{type(e).__name__}: {e}", None
+
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, result_json, error, time.time(), job_id)
+        )
+        conn.commit()
+        return status
+    finally:
+        conn.close()
@@ -2,28 +2,29 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from database.db_manager import DatabaseManager
+from database.fact_store import get_fact_store
+from utils.metrics import stage
+from utils.single_flight import SingleFlight
 
 class CohortAnalyzer:
     def __init__(self):
         self.db_manager = DatabaseManager()
+        self.fact_store = get_fact_store()
+        self.flights = SingleFlight()
     
     def calculate_cohort_analysis(self, cohort_period='month'):
-        """Calculate customer cohort analysis"""
+        """Calculate customer cohort analysis (concurrent identical calls share one run)"""
+        key = ('cohorts', self.fact_store.snapshot.version, cohort_period)
+        return self.flights.do(key, lambda: self._calculate_cohort_analysis(cohort_period))
+    
+    @stage('cohort', 'compute')
+    def _calculate_cohort_analysis(self, cohort_period):
         try:
-            # Get customer order data
-            query = """
-            SELECT 
-                ao.ship_postal_code as customer_id,
-                ao.date as order_date,
-                aoi.amount as order_value
-            FROM amazon_orders ao
-            JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
-            WHERE ao.ship_postal_code IS NOT NULL
-            AND ao.date >= '2022-01-01'
-            ORDER BY ao.ship_postal_code, ao.date
-            """
-            
-            df = self.db_manager.execute_query(query)
+            # Get customer order data from the shared fact store
+            snapshot = self.fact_store.snapshot
+            mask = (snapshot.codes['customer_id'] >= 0) & (snapshot.order_date >= np.datetime64('2022-01-01'))
+            df = self.fact_store.frame(['customer_id', 'order_date', 'amount'], mask, snapshot)
+            df.columns = ['customer_id', 'order_date', 'order_value']
             
             if df.empty:
                 return {"error": "No customer data available"}
@@ -40,7 +41,7 @@ class CohortAnalyzer:
                 df['order_period'] = df['order_date'].dt.to_period('W')
             
             # Get first order for each customer
-            df['first_order'] = df.groupby('customer_id')['order_date'].transform('min')
+            df['first_order'] = df.groupby('customer_id', observed=True)['order_date'].transform('min')
             if cohort_period == 'month':
                 df['cohort_group'] = df['first_order'].dt.to_period('M')
             else:
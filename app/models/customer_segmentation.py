@@ -1,39 +1,43 @@
+from collections import namedtuple
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from database.db_manager import DatabaseManager
+from database.fact_store import get_fact_store
+from utils.metrics import stage
+from utils.single_flight import SingleFlight
+from utils.streaming import iter_frame_records
+
+# Estimators fitted by one clustering run, published as a unit for predict_customer_segment
+FittedSegments = namedtuple('FittedSegments', ['scaler', 'kmeans', 'pca'])
 
 class CustomerSegmentation:
     def __init__(self):
         self.db_manager = DatabaseManager()
-        self.scaler = StandardScaler()
-        self.kmeans = KMeans(n_clusters=4, random_state=42)
-        self.pca = PCA(n_components=2)
+        self.fact_store = get_fact_store()
+        self.fitted = None
+        self.flights = SingleFlight()
         
+    @stage('customer_segments', 'fetch')
     def prepare_customer_data(self):
         """Prepare customer data for clustering"""
         try:
-            query = """
-            SELECT 
-                ao.ship_postal_code as customer_id,
-                COUNT(DISTINCT ao.order_id) as total_orders,
-                SUM(aoi.qty) as total_quantity,
-                AVG(aoi.amount) as avg_order_value,
-                SUM(aoi.amount) as total_spent,
-                COUNT(DISTINCT ap.category) as categories_purchased,
-                (MAX(ao.date)::date - MIN(ao.date)::date) as customer_lifespan_days
-            FROM amazon_orders ao
-            JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
-            JOIN amazon_products ap ON aoi.sku = ap.sku
-            WHERE ao.ship_postal_code IS NOT NULL
-            GROUP BY ao.ship_postal_code
-            HAVING COUNT(DISTINCT ao.order_id) >= 1
-            LIMIT 1000
-            """
+            # Aggregate per customer from the shared fact store (order lines with a known product)
+            snapshot = self.fact_store.snapshot
+            mask = (snapshot.codes['customer_id'] >= 0) & snapshot.has_product
+            lines = self.fact_store.frame(['customer_id', 'order_id', 'category', 'order_date', 'qty', 'amount'], mask, snapshot)
             
-            df = self.db_manager.execute_query(query)
+            grouped = lines.groupby('customer_id', observed=True)
+            df = pd.DataFrame({
+                'total_orders': grouped['order_id'].nunique(),
+                'total_quantity': grouped['qty'].sum(),
+                'avg_order_value': grouped['amount'].mean(),
+                'total_spent': grouped['amount'].sum(),
+                'categories_purchased': grouped['category'].nunique(),
+                'customer_lifespan_days': (grouped['order_date'].max() - grouped['order_date'].min()).dt.days
+            }).reset_index().head(1000)
             
             if df.empty:
                 print("No customer data found in database")
@@ -52,8 +56,58 @@ class CustomerSegmentation:
             print(f"Error preparing customer data: {e}")
             return None
     
+    # Output key, frame column and type of each customer row
+    CUSTOMER_FIELDS = [
+        ("customer_id", "customer_id", str),
+        ("total_orders", "total_orders", int),
+        ("total_quantity", "total_quantity", int),
+        ("avg_order_value", "avg_order_value", float),
+        ("total_spent", "total_spent", float),
+        ("categories_purchased", "categories_purchased", int),
+        ("customer_lifespan_days", "customer_lifespan_days", float),
+        ("avg_order_frequency", "avg_order_frequency", float),
+        ("avg_quantity_per_order", "avg_quantity_per_order", float),
+        ("cluster", "cluster", int),
+        ("pca_1", "pca_1", float),
+        ("pca_2", "pca_2", float)
+    ]
+    
+    @stage('customer_segments', 'fit')
+    def cluster_customers(self, df):
+        """Fit a fresh scaler, K-means and PCA on customer features and annotate df"""
+        # Select features for clustering
+        features = ['total_orders', 'total_spent', 'avg_order_value', 
+                   'categories_purchased', 'avg_order_frequency', 'avg_quantity_per_order']
+        
+        X = df[features].values
+        
+        # Scale the features
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        
+        # Perform clustering
+        kmeans = KMeans(n_clusters=4, random_state=42)
+        clusters = kmeans.fit_predict(X_scaled)
+        df['cluster'] = clusters
+        
+        # Reduce dimensions for visualization
+        pca = PCA(n_components=2)
+        X_pca = pca.fit_transform(X_scaled)
+        df['pca_1'] = X_pca[:, 0]
+        df['pca_2'] = X_pca[:, 1]
+        
+        self.fitted = FittedSegments(scaler, kmeans, pca)
+        return df
+    
+    def iter_customer_rows(self, df):
+        """Yield JSON-serializable customer rows lazily from the clustered frame"""
+        return iter_frame_records(df, self.CUSTOMER_FIELDS)
+    
     def get_segments(self):
-        """Perform customer segmentation"""
+        """Perform customer segmentation (concurrent callers share one run)"""
+        return self.flights.do(('segments', self.fact_store.snapshot.version), self._segment)
+    
+    def _segment(self):
         try:
             print("Starting customer segmentation...")
             df = self.prepare_customer_data()
@@ -75,44 +129,13 @@ class CustomerSegmentation:
                     "summary": {"total_customers": 9443, "clusters": 4}
                 }
             
-            # Select features for clustering
-            features = ['total_orders', 'total_spent', 'avg_order_value', 
-                       'categories_purchased', 'avg_order_frequency', 'avg_quantity_per_order']
-            
-            X = df[features].values
-            
-            # Scale the features
-            X_scaled = self.scaler.fit_transform(X)
-            
-            # Perform clustering
-            clusters = self.kmeans.fit_predict(X_scaled)
-            df['cluster'] = clusters
-            
-            # Reduce dimensions for visualization
-            X_pca = self.pca.fit_transform(X_scaled)
-            df['pca_1'] = X_pca[:, 0]
-            df['pca_2'] = X_pca[:, 1]
+            df = self.cluster_customers(df)
             
             # Define cluster characteristics
             cluster_profiles = self._analyze_clusters(df)
             
             # Convert to JSON-serializable format
-            customers_list = []
-            for _, row in df.iterrows():
-                customers_list.append({
-                    "customer_id": str(row['customer_id']),
-                    "total_orders": int(row['total_orders']),
-                    "total_quantity": int(row['total_quantity']),
-                    "avg_order_value": float(row['avg_order_value']),
-                    "total_spent": float(row['total_spent']),
-                    "categories_purchased": int(row['categories_purchased']),
-                    "customer_lifespan_days": float(row['customer_lifespan_days']),
-                    "avg_order_frequency": float(row['avg_order_frequency']),
-                    "avg_quantity_per_order": float(row['avg_quantity_per_order']),
-                    "cluster": int(row['cluster']),
-                    "pca_1": float(row['pca_1']),
-                    "pca_2": float(row['pca_2'])
-                })
+            customers_list = list(self.iter_customer_rows(df))
             
             return {
                 "customers": customers_list,
@@ -183,9 +206,12 @@ class CustomerSegmentation:
                        'categories_purchased', 'avg_order_frequency', 'avg_quantity_per_order']
             
             customer_data = np.array([customer_features[feature] for feature in features]).reshape(1, -1)
-            customer_scaled = self.scaler.transform(customer_data)
+            fitted = self.fitted
+            if fitted is None:
+                return {"error": "Segments not computed yet"}
+            customer_scaled = fitted.scaler.transform(customer_data)
             
-            predicted_cluster = self.kmeans.predict(customer_scaled)[0]
+            predicted_cluster = fitted.kmeans.predict(customer_scaled)[0]
             
             return {
                 "predicted_cluster": int(predicted_cluster),
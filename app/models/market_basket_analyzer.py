@@ -1,101 +1,163 @@
+from collections import namedtuple
 import pandas as pd
 import numpy as np
 from mlxtend.frequent_patterns import apriori, association_rules
 from mlxtend.preprocessing import TransactionEncoder
 from database.db_manager import DatabaseManager
+from database.prepared_statements import prepared_statements
+from database.fact_store import get_fact_store
+from utils.metrics import record_cache, stage
+from utils.single_flight import SingleFlight
+from utils.streaming import iter_frame_records
 import json
 
+# One immutable mining run; replaced as a whole so readers never see rules from one run and itemsets from another
+MiningResult = namedtuple('MiningResult', ['version', 'min_support', 'min_confidence', 'transactions', 'frequent_itemsets', 'rules'])
+
+# Per-customer lookups run on every recommendation request, so they are prepared once per connection
+prepared_statements.register('customer_products', """
+SELECT DISTINCT ap.product_name
+FROM amazon_orders ao
+JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
+JOIN amazon_products ap ON aoi.sku = ap.sku
+WHERE ao.ship_postal_code = %s
+AND ap.product_name IS NOT NULL
+""")
+
 class MarketBasketAnalyzer:
+    # Output key, frame column and type of each association rule row
+    RULE_FIELDS = [
+        ("antecedents", "antecedents", list),
+        ("consequents", "consequents", list),
+        ("support", "support", float),
+        ("confidence", "confidence", float),
+        ("lift", "lift", float)
+    ]
+    
+    ITEMSET_FIELDS = [
+        ("support", "support", float),
+        ("itemsets", "itemsets", list)
+    ]
+    
+    # Thresholds of the dashboard's analysis, also used for recommendations and the executive summary
+    DEFAULT_MIN_SUPPORT = 0.01
+    DEFAULT_MIN_CONFIDENCE = 0.3
+    
     def __init__(self):
         self.db_manager = DatabaseManager()
-        self.transactions = None
-        self.frequent_itemsets = None
-        self.rules = None
+        self.fact_store = get_fact_store()
+        self.result = None
+        self.flights = SingleFlight()
+        self._transactions = (None, None)
+    
+    @property
+    def transactions(self):
+        return self.result.transactions if self.result is not None else None
+    
+    @property
+    def frequent_itemsets(self):
+        return self.result.frequent_itemsets if self.result is not None else None
+    
+    @property
+    def rules(self):
+        return self.result.rules if self.result is not None else None
         
-    def prepare_transaction_data(self):
-        """Prepare transaction data for Apriori algorithm"""
+    def prepare_transaction_data(self, snapshot=None):
+        """One-hot transaction matrix for Apriori, built once per fact store version (None on failure)"""
         try:
-            # Get order items grouped by order_id
-            query = """
-            SELECT 
-                ao.order_id,
-                ap.product_name,
-                aoi.qty
-            FROM amazon_orders ao
-            JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
-            JOIN amazon_products ap ON aoi.sku = ap.sku
-            WHERE ap.product_name IS NOT NULL
-            ORDER BY ao.order_id
-            """
-            
-            df = self.db_manager.execute_query(query)
-            
+            snapshot = snapshot or self.fact_store.snapshot
+            version, transactions = self._transactions
+            record_cache('mba_transactions', transactions is not None and version == snapshot.version)
+            if transactions is not None and version == snapshot.version:
+                return transactions
+            return self.flights.do(('transactions', snapshot.version), lambda: self._build_transactions(snapshot))
+        except Exception as e:
+            print(f"Error preparing transaction data: {e}")
+            return None
+    
+    def _build_transactions(self, snapshot):
+        with stage('market_basket', 'fetch'):
+            # Get order lines with a named product from the shared fact store
+            mask = snapshot.codes['product_name'] >= 0
+            df = self.fact_store.frame(['order_id', 'product_name'], mask, snapshot)
+        
+        with stage('market_basket', 'encode'):
             # Create transaction list
-            transactions = []
-            for order_id in df['order_id'].unique():
-                order_items = df[df['order_id'] == order_id]['product_name'].tolist()
-                if len(order_items) > 1:  # Only include orders with multiple items
-                    transactions.append(order_items)
+            baskets = df['product_name'].astype(str).groupby(df['order_id'], observed=True).agg(list)
+            transactions = [items for items in baskets if len(items) > 1]  # Only include orders with multiple items
             
             # Convert to transaction format for Apriori
             te = TransactionEncoder()
             te_ary = te.fit(transactions).transform(transactions)
-            self.transactions = pd.DataFrame(te_ary, columns=te.columns_)
-            
-            return True
-        except Exception as e:
-            print(f"Error preparing transaction data: {e}")
-            return False
+            transactions = pd.DataFrame(te_ary, columns=te.columns_)
+        self._transactions = (snapshot.version, transactions)
+        return transactions
     
-    def analyze(self, min_support=0.01, min_confidence=0.3):
-        """Perform market basket analysis using Apriori algorithm"""
-        try:
-            if self.transactions is None:
-                if not self.prepare_transaction_data():
-                    return {"error": "Failed to prepare transaction data"}
-            
-            # Find frequent itemsets using Apriori
-            self.frequent_itemsets = apriori(
-                self.transactions, 
+    def mine(self, min_support=0.01, min_confidence=0.3):
+        """Mine frequent itemsets and association rules; returns (MiningResult, None) or (None, error message)
+        
+        The latest result is reused for identical parameters on the same data, and
+        concurrent identical requests share a single Apriori run.
+        """
+        snapshot = self.fact_store.snapshot
+        result = self.result
+        reuse = result is not None and (result.version, result.min_support, result.min_confidence) == (snapshot.version, min_support, min_confidence)
+        record_cache('mba_mining_result', reuse)
+        if reuse:
+            return result, None
+        return self.flights.do(
+            ('mine', snapshot.version, min_support, min_confidence),
+            lambda: self._mine(snapshot, min_support, min_confidence)
+        )
+    
+    def _mine(self, snapshot, min_support, min_confidence):
+        transactions = self.prepare_transaction_data(snapshot)
+        if transactions is None:
+            return None, "Failed to prepare transaction data"
+        
+        # Find frequent itemsets using Apriori
+        with stage('market_basket', 'mine'):
+            frequent_itemsets = apriori(
+                transactions, 
                 min_support=min_support, 
                 use_colnames=True
             )
-            
-            if self.frequent_itemsets.empty:
-                return {"error": "No frequent itemsets found with given support"}
-            
-            # Generate association rules
-            self.rules = association_rules(
-                self.frequent_itemsets, 
+        
+        if frequent_itemsets.empty:
+            return None, "No frequent itemsets found with given support"
+        
+        # Generate association rules
+        with stage('market_basket', 'rules'):
+            rules = association_rules(
+                frequent_itemsets, 
                 metric="confidence", 
                 min_threshold=min_confidence
             )
+        
+        result = MiningResult(snapshot.version, min_support, min_confidence, transactions, frequent_itemsets, rules)
+        self.result = result
+        return result, None
+    
+    def analyze(self, min_support=0.01, min_confidence=0.3):
+        """Perform market basket analysis using Apriori algorithm"""
+        try:
+            result, error = self.mine(min_support, min_confidence)
+            if error:
+                return {"error": error}
             
             # Prepare results with JSON-serializable data
-            frequent_itemsets_list = []
-            for _, row in self.frequent_itemsets.iterrows():
-                frequent_itemsets_list.append({
-                    "support": float(row['support']),
-                    "itemsets": list(row['itemsets'])
-                })
-            
-            association_rules_list = []
-            for _, row in self.rules.iterrows():
-                association_rules_list.append({
-                    "antecedents": list(row['antecedents']),
-                    "consequents": list(row['consequents']),
-                    "support": float(row['support']),
-                    "confidence": float(row['confidence']),
-                    "lift": float(row['lift'])
-                })
+            with stage('market_basket', 'serialize'):
+                frequent_itemsets_list = list(iter_frame_records(result.frequent_itemsets, self.ITEMSET_FIELDS))
+                
+                association_rules_list = list(self.iter_rule_rows(result.rules))
             
             results = {
                 "frequent_itemsets": frequent_itemsets_list,
                 "association_rules": association_rules_list,
                 "summary": {
-                    "total_transactions": int(len(self.transactions)),
-                    "frequent_itemsets_count": int(len(self.frequent_itemsets)),
-                    "association_rules_count": int(len(self.rules))
+                    "total_transactions": int(len(result.transactions)),
+                    "frequent_itemsets_count": int(len(result.frequent_itemsets)),
+                    "association_rules_count": int(len(result.rules))
                 }
             }
             
@@ -104,44 +166,49 @@ class MarketBasketAnalyzer:
         except Exception as e:
             return {"error": f"Analysis failed: {str(e)}"}
     
+    def iter_rule_rows(self, rules=None):
+        """Yield JSON-serializable association rules lazily"""
+        rules = self.rules if rules is None else rules
+        return iter_frame_records(rules, self.RULE_FIELDS)
+    
+    def ensure_rules(self):
+        """Rules mined from the current data; returns (rules, None) or (None, error message)
+        
+        The dashboard's analysis runs in a job process, so this process mines its
+        own copy with the same thresholds when it has none for the current version.
+        """
+        result = self.result
+        if result is None or result.version != self.fact_store.snapshot.version:
+            result, error = self.mine(self.DEFAULT_MIN_SUPPORT, self.DEFAULT_MIN_CONFIDENCE)
+            if error:
+                return None, error
+        return result.rules, None
+    
     def get_top_associations(self, limit=20):
         """Get top association rules by lift"""
-        if self.rules is None:
-            return {"error": "No rules found. Run analysis first."}
-        
-        top_rules = self.rules.nlargest(limit, 'lift')
-        top_associations_list = []
-        for _, row in top_rules.iterrows():
-            top_associations_list.append({
-                "antecedents": list(row['antecedents']),
-                "consequents": list(row['consequents']),
-                "support": float(row['support']),
-                "confidence": float(row['confidence']),
-                "lift": float(row['lift'])
-            })
+        rules, error = self.ensure_rules()
+        if error:
+            return {"error": error}
+        
+        top_rules = rules.nlargest(limit, 'lift')
+        top_associations_list = list(self.iter_rule_rows(top_rules))
         return {
-            "top_associations": top_associations_list
+            "top_associations": top_associations_list,
+            "total_rules": int(len(rules))
         }
     
     def get_product_recommendations(self, product_name, limit=10):
         """Get product recommendations based on association rules"""
-        if self.rules is None:
-            return {"error": "No rules found. Run analysis first."}
+        rules, error = self.ensure_rules()
+        if error:
+            return {"error": error}
         
         # Find rules where the product is in antecedents
-        recommendations = self.rules[
-            self.rules['antecedents'].apply(lambda x: product_name in str(x))
+        recommendations = rules[
+            rules['antecedents'].apply(lambda x: product_name in str(x))
         ].nlargest(limit, 'confidence')
         
-        recommendations_list = []
-        for _, row in recommendations.iterrows():
-            recommendations_list.append({
-                "antecedents": list(row['antecedents']),
-                "consequents": list(row['consequents']),
-                "support": float(row['support']),
-                "confidence": float(row['confidence']),
-                "lift": float(row['lift'])
-            })
+        recommendations_list = list(self.iter_rule_rows(recommendations))
         
         return {
             "product": product_name,
@@ -151,25 +218,19 @@ class MarketBasketAnalyzer:
     def get_recommendations(self, customer_id):
         """Get recommendations for a specific customer based on their purchase history"""
         try:
-            # Get customer's purchase history
-            query = """
-            SELECT DISTINCT ap.product_name
-            FROM amazon_orders ao
-            JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
-            JOIN amazon_products ap ON aoi.sku = ap.sku
-            WHERE ao.ship_postal_code = %s
-            AND ap.product_name IS NOT NULL
-            """
+            _, error = self.ensure_rules()
+            if error:
+                return {"error": error}
             
-            customer_products = self.db_manager.execute_query(query, (customer_id,))
+            # Get customer's purchase history
+            customer_products = self.db_manager.execute_prepared('customer_products', (customer_id,))
             
             if customer_products.empty:
                 return {"error": "No purchase history found for customer"}
             
             # Get recommendations based on their purchase history
             all_recommendations = []
-            for _, row in customer_products.iterrows():
-                product = row['product_name']
+            for product in customer_products['product_name'].tolist():
                 recs = self.get_product_recommendations(product, limit=5)
                 if "recommendations" in recs:
                     all_recommendations.extend(recs["recommendations"])
@@ -179,15 +240,7 @@ class MarketBasketAnalyzer:
                 df_recs = pd.DataFrame(all_recommendations)
                 df_recs = df_recs.drop_duplicates().nlargest(10, 'confidence')
                 
-                recommendations_list = []
-                for _, row in df_recs.iterrows():
-                    recommendations_list.append({
-                        "antecedents": list(row['antecedents']),
-                        "consequents": list(row['consequents']),
-                        "support": float(row['support']),
-                        "confidence": float(row['confidence']),
-                        "lift": float(row['lift'])
-                    })
+                recommendations_list = list(self.iter_rule_rows(df_recs))
                 return {"recommendations": recommendations_list}
             else:
                 return {"error": "No recommendations available"}
@@ -197,36 +250,16 @@ class MarketBasketAnalyzer:
     
     def get_insights(self):
         """Get key insights from the analysis"""
-        if self.rules is None:
+        result = self.result
+        if result is None:
             return {"error": "No analysis results available"}
         
         # Convert to JSON-serializable format
-        strongest_associations = []
-        for _, row in self.rules.nlargest(5, 'lift').iterrows():
-            strongest_associations.append({
-                "antecedents": list(row['antecedents']),
-                "consequents": list(row['consequents']),
-                "support": float(row['support']),
-                "confidence": float(row['confidence']),
-                "lift": float(row['lift'])
-            })
-        
-        highest_confidence_rules = []
-        for _, row in self.rules.nlargest(5, 'confidence').iterrows():
-            highest_confidence_rules.append({
-                "antecedents": list(row['antecedents']),
-                "consequents": list(row['consequents']),
-                "support": float(row['support']),
-                "confidence": float(row['confidence']),
-                "lift": float(row['lift'])
-            })
-        
-        most_frequent_itemsets = []
-        for _, row in self.frequent_itemsets.nlargest(5, 'support').iterrows():
-            most_frequent_itemsets.append({
-                "support": float(row['support']),
-                "itemsets": list(row['itemsets'])
-            })
+        strongest_associations = list(self.iter_rule_rows(result.rules.nlargest(5, 'lift')))
+        
+        highest_confidence_rules = list(self.iter_rule_rows(result.rules.nlargest(5, 'confidence')))
+        
+        most_frequent_itemsets = list(iter_frame_records(result.frequent_itemsets.nlargest(5, 'support'), self.ITEMSET_FIELDS))
         
         insights = {
             "strongest_associations": strongest_associations,
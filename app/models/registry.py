@@ -0,0 +1,89 @@
+import importlib
+import threading
+import time
+
+# name -> "module:Class"; modules are imported only when the model is first used
+MODEL_PATHS = {
+    'market_basket': 'models.market_basket_analyzer:MarketBasketAnalyzer',
+    'customer_segments': 'models.customer_segmentation:CustomerSegmentation',
+    'sales_forecast': 'models.sales_predictor:SalesPredictor',
+    'rfm': 'models.rfm_analyzer:RFMAnalyzer',
+    'cohort': 'models.cohort_analyzer:CohortAnalyzer'
+}
+
+
+class ModelRegistry:
+    """Builds analyzers on first use so pandas-heavy modules, scikit-learn and mlxtend load lazily"""
+
+    def __init__(self, paths=None):
+        self._paths = dict(MODEL_PATHS if paths is None else paths)
+        self._instances = {}
+        self._load_ms = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path):
+        """Register a model as "module:Class" without importing it"""
+        self._paths[name] = path
+
+    def get(self, name):
+        """Return the model, importing its module and constructing it on first call"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._paths:
+                    raise KeyError(f"Unknown model: {name}")
+                module_name, class_name = self._paths[name].split(':')
+                start = time.perf_counter()
+                model_class = getattr(importlib.import_module(module_name), class_name)
+                self._instances[name] = model_class()
+                self._load_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+            return self._instances[name]
+
+    def proxy(self, name):
+        """Module-level stand-in that resolves the model on first attribute access"""
+        return LazyModel(self, name)
+
+    def names(self):
+        return list(self._paths)
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def load_all(self):
+        for name in self._paths:
+            self.get(name)
+
+    def get_stats(self):
+        """Which models are loaded, how long import plus construction took, and single-flight counters"""
+        stats = {}
+        for name in self._paths:
+            instance = self._instances.get(name)
+            stats[name] = {"loaded": instance is not None, "load_ms": self._load_ms.get(name)}
+            flights = getattr(instance, 'flights', None)
+            if flights is not None:
+                stats[name]["single_flight"] = flights.get_stats()
+        return stats
+
+
+class LazyModel:
+    """Forwards attribute access to the registry's model so call sites keep using a plain global"""
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self._registry.is_loaded(self._name) else 'not loaded'
+        return f"<LazyModel {self._name} ({state})>"
+
+
+# One registry per process (the web process and each job worker get their own)
+model_registry = ModelRegistry()
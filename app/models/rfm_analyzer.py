@@ -1,96 +1,335 @@
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from database.db_manager import DatabaseManager
+from database.fact_store import get_fact_store
+from database.rfm_state import get_rfm_state
+from utils.metrics import stage
+from utils.quantile_sketch import KLLSketch
+from utils.single_flight import SingleFlight
+from utils.streaming import iter_frame_records
+
+def segment_for_scores(r, f, m):
+    """Segment customers based on RFM scores"""
+    if r >= 4 and f >= 4 and m >= 4:
+        return "Champions"
+    elif r >= 3 and f >= 3 and m >= 3:
+        return "Loyal Customers"
+    elif r >= 4 and f <= 2:
+        return "New Customers"
+    elif r >= 3 and f >= 2 and m >= 2:
+        return "Potential Loyalists"
+    elif r >= 3 and f <= 2 and m <= 2:
+        return "At Risk"
+    elif r <= 2 and f >= 3 and m >= 3:
+        return "Cannot Lose Them"
+    elif r <= 2 and f >= 2 and m >= 2:
+        return "About to Sleep"
+    else:
+        return "Lost"
+
+
+# Segment name and "RFM" score label for every (R-1, F-1, M-1), so scoring is array indexing
+SEGMENT_LOOKUP = np.array([[[segment_for_scores(r, f, m) for m in range(1, 6)] for f in range(1, 6)] for r in range(1, 6)],
+                          dtype=object)
+SCORE_LABELS = np.array([[[f"{r}{f}{m}" for m in range(1, 6)] for f in range(1, 6)] for r in range(1, 6)], dtype=object)
+
+
+def segment_case_sql(r, f, m):
+    """SQL CASE expression giving SEGMENT_LOOKUP's segment for score columns r, f and m"""
+    combinations = {}
+    for (r_code, f_code, m_code), segment in np.ndenumerate(SEGMENT_LOOKUP):
+        combinations.setdefault(segment, []).append(f"{r_code + 1}{f_code + 1}{m_code + 1}")
+    branches = ''.join(
+        f"\n        WHEN {r} * 100 + {f} * 10 + {m} IN ({', '.join(scores)}) THEN '{segment}'"
+        for segment, scores in combinations.items()
+    )
+    return f"CASE{branches}\n    END"
+
+
+# Per-customer recency, frequency and monetary as of a reference date
+SQL_CUSTOMER_AGGREGATES = """
+SELECT
+    ao.ship_postal_code as customer_id,
+    %(reference_date)s::date - MAX(ao.date) as recency,
+    COUNT(*) as frequency,
+    COALESCE(SUM(aoi.amount::double precision), 0) as monetary
+FROM amazon_orders ao
+JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
+WHERE ao.ship_postal_code IS NOT NULL
+AND ao.date <= %(reference_date)s::date
+GROUP BY ao.ship_postal_code
+"""
+
+# RFM computed entirely in Postgres: per-customer aggregates, quintile scores and segments, so only
+# customer rows cross the wire instead of every order line. Scores count the quintile edges
+# (percentile_disc, i.e. np.quantile's inverted_cdf) below each value, exactly as quantile_codes does,
+# so equal values always share a score; heavy ties leave some quintiles larger than a fifth.
+SQL_RFM_QUERY = f"""
+WITH customers AS ({SQL_CUSTOMER_AGGREGATES}),
+edges AS (
+    SELECT
+        percentile_disc(ARRAY[0.2, 0.4, 0.6, 0.8]) WITHIN GROUP (ORDER BY recency) as recency_edges,
+        percentile_disc(ARRAY[0.2, 0.4, 0.6, 0.8]) WITHIN GROUP (ORDER BY frequency) as frequency_edges,
+        percentile_disc(ARRAY[0.2, 0.4, 0.6, 0.8]) WITHIN GROUP (ORDER BY monetary) as monetary_edges
+    FROM customers
+),
+scored AS (
+    SELECT
+        customers.*,
+        5 - (SELECT COUNT(*) FROM unnest(edges.recency_edges) edge WHERE edge < customers.recency) as r_score,
+        1 + (SELECT COUNT(*) FROM unnest(edges.frequency_edges) edge WHERE edge < customers.frequency) as f_score,
+        1 + (SELECT COUNT(*) FROM unnest(edges.monetary_edges) edge WHERE edge < customers.monetary) as m_score
+    FROM customers
+    CROSS JOIN edges
+)
+SELECT
+    customer_id, recency, frequency, monetary, r_score, f_score, m_score,
+    r_score::text || f_score::text || m_score::text as rfm_score,
+    {segment_case_sql('r_score', 'f_score', 'm_score')} as segment
+FROM scored
+"""
+
+# Only the per-segment summary crosses the wire
+SQL_RFM_SUMMARY_QUERY = f"""
+SELECT
+    segment,
+    COUNT(*) as customer_count,
+    AVG(recency)::double precision as avg_recency,
+    AVG(frequency)::double precision as avg_frequency,
+    AVG(monetary) as avg_monetary
+FROM ({SQL_RFM_QUERY}) rfm
+GROUP BY segment
+ORDER BY segment
+"""
+
+# Inner quintile edges used by quantile scoring
+SCORE_QUANTILES = [0.2, 0.4, 0.6, 0.8]
+SCORED_COLUMNS = ['recency', 'frequency', 'monetary']
+
+
+def exact_boundaries(rfm_df):
+    """Inner quintile edges of each scored column over every customer (percentile_disc, as in SQL mode)"""
+    return {column: np.quantile(rfm_df[column].to_numpy(dtype=np.float64), SCORE_QUANTILES, method='inverted_cdf')
+            for column in SCORED_COLUMNS}
+
+
+def build_score_sketches(chunks, k=400, seed=None):
+    """KLL sketches of recency, frequency and monetary, updated one chunk of customer rows at a time"""
+    sketches = {column: KLLSketch(k, seed) for column in SCORED_COLUMNS}
+    for chunk in chunks:
+        for column, sketch in sketches.items():
+            sketch.update(chunk[column].to_numpy(dtype=np.float64))
+    return sketches
+
+
+def merge_score_sketches(sketch_sets, seed=None):
+    """Merge score sketches built on disjoint customers (other chunks or processes)"""
+    merged = None
+    for sketches in sketch_sets:
+        if merged is None:
+            merged = {column: KLLSketch(sketch.k, seed).merge(sketch) for column, sketch in sketches.items()}
+        else:
+            for column, sketch in sketches.items():
+                merged[column].merge(sketch)
+    return merged
+
+
+def score_boundaries(sketches):
+    """Approximate inner quintile edges of each scored column from score sketches"""
+    return {column: sketches[column].quantiles(SCORE_QUANTILES) for column in SCORED_COLUMNS}
+
+
+def quantile_codes(values, edges):
+    """Zero-based quintile of each value; a value equal to an edge falls in the lower quintile, as with pd.cut"""
+    return np.searchsorted(edges, values, side='left')
+
 
 class RFMAnalyzer:
-    def __init__(self):
+    # 'full' reduces the fact store on every new data version or day; 'incremental' keeps
+    # per-customer totals in the customer_rfm_state table and applies only new order lines;
+    # 'sql' scores in Postgres with exact quintile edges instead of equal-width bins
+    MODES = ('full', 'incremental', 'sql')
+    # How 'full' and 'incremental' score: five equal-width bins, or exact quintiles as in 'sql'
+    SCORINGS = ('equal_width', 'quantile')
+    
+    def __init__(self, mode=None, scoring=None):
         self.db_manager = DatabaseManager()
+        self.fact_store = get_fact_store()
+        self.flights = SingleFlight()
+        self.mode = mode or os.getenv('RFM_MODE', 'full')
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown RFM mode: {self.mode}; choose from {', '.join(self.MODES)}")
+        self.scoring = scoring or os.getenv('RFM_SCORING', 'equal_width')
+        if self.scoring not in self.SCORINGS:
+            raise ValueError(f"Unknown RFM scoring: {self.scoring}; choose from {', '.join(self.SCORINGS)}")
+        self.state = get_rfm_state() if self.mode == 'incremental' else None
+        
+    # Output key, frame column and type of each customer row
+    RFM_FIELDS = [
+        ("customer_id", "customer_id", str),
+        ("recency", "recency", int),
+        ("frequency", "frequency", int),
+        ("monetary", "monetary", float),
+        ("r_score", "R_score", int),
+        ("f_score", "F_score", int),
+        ("m_score", "M_score", int),
+        ("rfm_score", "RFM_score", str),
+        ("segment", "segment", str)
+    ]
+    
+    SEGMENT_SUMMARY_FIELDS = [
+        ("segment", "segment", str),
+        ("customer_count", "customer_id", int),
+        ("avg_recency", "recency", float),
+        ("avg_frequency", "frequency", float),
+        ("avg_monetary", "monetary", float)
+    ]
+    
+    # The same output keys read from SQL_RFM_SUMMARY_QUERY's columns
+    SQL_SEGMENT_SUMMARY_FIELDS = [
+        ("segment", "segment", str),
+        ("customer_count", "customer_count", int),
+        ("avg_recency", "avg_recency", float),
+        ("avg_frequency", "avg_frequency", float),
+        ("avg_monetary", "avg_monetary", float)
+    ]
+    
+    def compute_rfm_frame(self, reference_date=None):
+        """Calculate per-customer RFM metrics, scores and segments (None when there is no data)
+        
+        Recency is counted in whole days, so concurrent calls for the same day share
+        one computation; the returned frame must not be modified.
+        """
+        if reference_date is None:
+            reference_date = datetime.now()
+        day = pd.Timestamp(reference_date).date()
+        if self.mode == 'sql':
+            key = ('rfm-sql', self.db_manager.get_cached_data_version(), day)
+            return self.flights.do(key, lambda: self._sql_rfm_frame(reference_date))
+        if self.state is not None and self.state.ensure_fresh():
+            rfm_df = self.flights.do(('rfm-state', self.state.revision, day), lambda: self._state_rfm_frame(reference_date))
+            if rfm_df is not None:
+                return rfm_df
+        key = ('rfm', self.fact_store.snapshot.version, day)
+        return self.flights.do(key, lambda: self._compute_rfm_frame(reference_date))
+    
+    def data_version(self):
+        """Version of the data compute_rfm_frame currently reads, for cache keys"""
+        if self.mode == 'sql':
+            return self.db_manager.get_cached_data_version()
+        if self.state is not None and self.state.ensure_fresh():
+            return f"rfm-state-{self.state.revision}"
+        return self.fact_store.snapshot.version
+    
+    @stage('rfm', 'state')
+    def _state_rfm_frame(self, reference_date):
+        # Scores are kept up to date per customer by the state; only recency depends on the date
+        scored = self.state.frame(reference_date)
+        if scored is None:
+            return None
+        rfm_df, r, f, m = scored
+        if self.scoring == 'quantile':
+            # Quantile edges move with every customer, so the state's per-customer bins do not apply
+            return self._score_by_quantiles(rfm_df)
+        return self._add_scores(rfm_df, r, f, m)
+    
+    @stage('rfm', 'sql')
+    def _sql_rfm_frame(self, reference_date):
+        rfm_df = self.db_manager.execute_query(SQL_RFM_QUERY, {'reference_date': pd.Timestamp(reference_date).date()})
+        if rfm_df.empty:
+            return None
+        return rfm_df.rename(columns={'r_score': 'R_score', 'f_score': 'F_score', 'm_score': 'M_score', 'rfm_score': 'RFM_score'})
+    
+    @stage('rfm', 'compute')
+    def _compute_rfm_frame(self, reference_date):
+        # Reduce the shared fact store's columns straight to per-customer arrays, indexed by customer code
+        snapshot = self.fact_store.snapshot
+        reference_day = np.datetime64(pd.Timestamp(reference_date).date(), 'D')
+        mask = (snapshot.codes['customer_id'] >= 0) & (snapshot.order_date <= reference_day)
+        if not mask.any():
+            return None
+        
+        codes = snapshot.codes['customer_id'][mask]
+        n_codes = len(snapshot.vocabularies['customer_id'])
+        frequency = np.bincount(codes, minlength=n_codes)
+        monetary = np.bincount(codes, weights=snapshot.amount[mask], minlength=n_codes)
+        last_day = np.full(n_codes, np.iinfo(np.int64).min)
+        np.maximum.at(last_day, codes, snapshot.order_date[mask].astype(np.int64))
         
+        customers = np.flatnonzero(frequency)
+        rfm_df = pd.DataFrame({
+            'customer_id': snapshot.vocabularies['customer_id'][customers],
+            'recency': reference_day.astype(np.int64) - last_day[customers],
+            'frequency': frequency[customers],
+            'monetary': monetary[customers]
+        })
+        
+        if self.scoring == 'quantile':
+            return self._score_by_quantiles(rfm_df)
+        
+        # RFM scores (1-5 scale) from five equal-width bins; recency scores high when recent
+        r = 4 - pd.cut(rfm_df['recency'], 5, labels=False).to_numpy()
+        f = pd.cut(rfm_df['frequency'], 5, labels=False).to_numpy()
+        m = pd.cut(rfm_df['monetary'], 5, labels=False).to_numpy()
+        return self._add_scores(rfm_df, r, f, m)
+    
+    def _score_by_quantiles(self, rfm_df):
+        """Quantile scores from exact quintile edges; every customer is in memory here already"""
+        return self.score_customers(rfm_df, exact_boundaries(rfm_df))
+    
+    def score_customers(self, rfm_df, boundaries):
+        """Quantile scores and segments for customer rows (a whole frame or one chunk) given exact_boundaries() or score_boundaries()"""
+        r = 4 - quantile_codes(rfm_df['recency'].to_numpy(), boundaries['recency'])
+        f = quantile_codes(rfm_df['frequency'].to_numpy(), boundaries['frequency'])
+        m = quantile_codes(rfm_df['monetary'].to_numpy(), boundaries['monetary'])
+        return self._add_scores(rfm_df, r, f, m)
+    
+    @staticmethod
+    def _add_scores(rfm_df, r, f, m):
+        """Score columns from zero-based R/F/M bin codes"""
+        rfm_df['R_score'] = r + 1
+        rfm_df['F_score'] = f + 1
+        rfm_df['M_score'] = m + 1
+        
+        # Score label and segment for all 125 score combinations are precomputed
+        rfm_df['RFM_score'] = SCORE_LABELS[r, f, m]
+        rfm_df['segment'] = SEGMENT_LOOKUP[r, f, m]
+        
+        return rfm_df
+    
+    def iter_rfm_rows(self, rfm_df):
+        """Yield JSON-serializable customer rows lazily from the RFM frame"""
+        return iter_frame_records(rfm_df, self.RFM_FIELDS)
+    
+    def summarize_segments(self, rfm_df):
+        """Per-segment customer counts and average R/F/M"""
+        segment_summary = rfm_df.groupby('segment').agg({
+            'customer_id': 'count',
+            'recency': 'mean',
+            'frequency': 'mean',
+            'monetary': 'mean'
+        }).reset_index()
+        
+        return list(iter_frame_records(segment_summary, self.SEGMENT_SUMMARY_FIELDS))
+    
     def calculate_rfm(self, reference_date=None):
         """Calculate RFM (Recency, Frequency, Monetary) scores"""
         try:
             if reference_date is None:
                 reference_date = datetime.now()
             
-            # Get customer transaction data
-            query = """
-            SELECT 
-                ao.ship_postal_code as customer_id,
-                ao.date as order_date,
-                aoi.amount as order_value,
-                aoi.qty as quantity
-            FROM amazon_orders ao
-            JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
-            WHERE ao.ship_postal_code IS NOT NULL
-            AND ao.date <= %s
-            ORDER BY ao.ship_postal_code, ao.date
-            """
-            
-            df = self.db_manager.execute_query(query, (reference_date,))
-            
-            if df.empty:
+            rfm_df = self.compute_rfm_frame(reference_date)
+            if rfm_df is None:
                 return {"error": "No customer data available"}
             
-            # Convert order_date to datetime if it's not already
-            df['order_date'] = pd.to_datetime(df['order_date'])
-            
-            # Calculate RFM metrics
-            rfm_df = df.groupby('customer_id').agg({
-                'order_date': lambda x: (pd.to_datetime(reference_date) - x.max()).days,  # Recency
-                'order_value': ['count', 'sum']  # Frequency and Monetary
-            }).reset_index()
-            
-            # Flatten column names
-            rfm_df.columns = ['customer_id', 'recency', 'frequency', 'monetary']
-            
-            # Calculate RFM scores (1-5 scale)
-            rfm_df['R_score'] = pd.cut(rfm_df['recency'], 5, labels=[5,4,3,2,1]).astype(int)
-            rfm_df['F_score'] = pd.cut(rfm_df['frequency'], 5, labels=[1,2,3,4,5]).astype(int)
-            rfm_df['M_score'] = pd.cut(rfm_df['monetary'], 5, labels=[1,2,3,4,5]).astype(int)
-            
-            # Combine scores
-            rfm_df['RFM_score'] = rfm_df['R_score'].astype(str) + rfm_df['F_score'].astype(str) + rfm_df['M_score'].astype(str)
-            
-            # Customer segmentation
-            rfm_df['segment'] = rfm_df.apply(self._segment_customers, axis=1)
-            
             # Convert to JSON-serializable format
-            rfm_data = []
-            for _, row in rfm_df.iterrows():
-                rfm_data.append({
-                    "customer_id": str(row['customer_id']),
-                    "recency": int(row['recency']),
-                    "frequency": int(row['frequency']),
-                    "monetary": float(row['monetary']),
-                    "r_score": int(row['R_score']),
-                    "f_score": int(row['F_score']),
-                    "m_score": int(row['M_score']),
-                    "rfm_score": str(row['RFM_score']),
-                    "segment": str(row['segment'])
-                })
-            
-            # Segment summary
-            segment_summary = rfm_df.groupby('segment').agg({
-                'customer_id': 'count',
-                'recency': 'mean',
-                'frequency': 'mean',
-                'monetary': 'mean'
-            }).reset_index()
-            
-            summary_data = []
-            for _, row in segment_summary.iterrows():
-                summary_data.append({
-                    "segment": str(row['segment']),
-                    "customer_count": int(row['customer_id']),
-                    "avg_recency": float(row['recency']),
-                    "avg_frequency": float(row['frequency']),
-                    "avg_monetary": float(row['monetary'])
-                })
+            rfm_data = list(self.iter_rfm_rows(rfm_df))
             
             return {
                 "rfm_data": rfm_data,
-                "segment_summary": summary_data,
+                "segment_summary": self.summarize_segments(rfm_df),
                 "total_customers": len(rfm_data),
                 "reference_date": reference_date.strftime('%Y-%m-%d')
             }
@@ -98,31 +337,44 @@ class RFMAnalyzer:
         except Exception as e:
             return {"error": f"RFM calculation failed: {str(e)}"}
     
-    def _segment_customers(self, row):
-        """Segment customers based on RFM scores"""
-        r, f, m = row['R_score'], row['F_score'], row['M_score']
+    def rfm_summary(self, reference_date=None):
+        """Segment summary and customer count without per-customer rows
         
-        if r >= 4 and f >= 4 and m >= 4:
-            return "Champions"
-        elif r >= 3 and f >= 3 and m >= 3:
-            return "Loyal Customers"
-        elif r >= 4 and f <= 2:
-            return "New Customers"
-        elif r >= 3 and f >= 2 and m >= 2:
-            return "Potential Loyalists"
-        elif r >= 3 and f <= 2 and m <= 2:
-            return "At Risk"
-        elif r <= 2 and f >= 3 and m >= 3:
-            return "Cannot Lose Them"
-        elif r <= 2 and f >= 2 and m >= 2:
-            return "About to Sleep"
-        else:
-            return "Lost"
+        In 'sql' mode only the summary is fetched from the database.
+        """
+        try:
+            if reference_date is None:
+                reference_date = datetime.now()
+            
+            if self.mode == 'sql':
+                key = ('rfm-sql-summary', self.db_manager.get_cached_data_version(), pd.Timestamp(reference_date).date())
+                summary = self.flights.do(key, lambda: self.db_manager.execute_query(
+                    SQL_RFM_SUMMARY_QUERY, {'reference_date': pd.Timestamp(reference_date).date()}
+                ))
+                if summary.empty:
+                    return {"error": "No customer data available"}
+                segment_summary = list(iter_frame_records(summary, self.SQL_SEGMENT_SUMMARY_FIELDS))
+                total_customers = sum(segment["customer_count"] for segment in segment_summary)
+            else:
+                rfm_df = self.compute_rfm_frame(reference_date)
+                if rfm_df is None:
+                    return {"error": "No customer data available"}
+                segment_summary = self.summarize_segments(rfm_df)
+                total_customers = int(len(rfm_df))
+            
+            return {
+                "segment_summary": segment_summary,
+                "total_customers": total_customers,
+                "reference_date": reference_date.strftime('%Y-%m-%d')
+            }
+            
+        except Exception as e:
+            return {"error": f"RFM calculation failed: {str(e)}"}
     
     def get_rfm_insights(self):
         """Get key insights from RFM analysis"""
         try:
-            rfm_result = self.calculate_rfm()
+            rfm_result = self.rfm_summary()
             if "error" in rfm_result:
                 return rfm_result
             
@@ -1,3 +1,4 @@
+from collections import namedtuple
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
@@ -5,41 +6,52 @@ from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from database.db_manager import DatabaseManager
+from database.fact_store import get_fact_store
+from utils.metrics import stage
+from utils.single_flight import SingleFlight
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+# Fitted scaler and models from one training run, published as a unit
+TrainedForecast = namedtuple('TrainedForecast', ['version', 'scaler', 'revenue_model', 'orders_model', 'feature_columns'])
+
 class SalesPredictor:
     def __init__(self):
         self.db_manager = DatabaseManager()
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-        self.scaler = StandardScaler()
-        self.is_trained = False
+        self.fact_store = get_fact_store()
+        self.trained = None
+        self.flights = SingleFlight()
+    
+    @property
+    def is_trained(self):
+        return self.trained is not None
         
     def prepare_training_data(self):
         """Prepare historical sales data for training"""
         try:
-            query = """
-            SELECT 
-                DATE_TRUNC('day', ao.date) as sale_date,
-                COUNT(DISTINCT ao.order_id) as daily_orders,
-                SUM(aoi.qty) as daily_quantity,
-                SUM(aoi.amount) as daily_revenue,
-                AVG(aoi.amount) as avg_order_value,
-                COUNT(DISTINCT ap.category) as categories_sold,
-                EXTRACT(DOW FROM DATE_TRUNC('day', ao.date)) as day_of_week,
-                EXTRACT(MONTH FROM DATE_TRUNC('day', ao.date)) as month,
-                EXTRACT(QUARTER FROM DATE_TRUNC('day', ao.date)) as quarter
-            FROM amazon_orders ao
-            JOIN amazon_order_items aoi ON ao.order_id = aoi.order_id
-            JOIN amazon_products ap ON aoi.sku = ap.sku
-            WHERE ao.date >= '2022-03-01' AND ao.date <= '2022-06-30'
-            GROUP BY DATE_TRUNC('day', ao.date)
-            HAVING COUNT(DISTINCT ao.order_id) >= 1
-            ORDER BY sale_date
-            """
-            
-            df = self.db_manager.execute_query(query)
+            # Daily aggregates from the shared fact store (order lines with a known product)
+            snapshot = self.fact_store.snapshot
+            mask = (
+                snapshot.has_product &
+                (snapshot.order_date >= np.datetime64('2022-03-01')) &
+                (snapshot.order_date <= np.datetime64('2022-06-30'))
+            )
+            lines = self.fact_store.frame(['order_date', 'order_id', 'category', 'qty', 'amount'], mask, snapshot)
+            
+            grouped = lines.groupby('order_date')
+            df = pd.DataFrame({
+                'daily_orders': grouped['order_id'].nunique(),
+                'daily_quantity': grouped['qty'].sum(),
+                'daily_revenue': grouped['amount'].sum(),
+                'avg_order_value': grouped['amount'].mean(),
+                'categories_sold': grouped['category'].nunique()
+            }).rename_axis('sale_date').reset_index()
+            
+            sale_dates = pd.to_datetime(df['sale_date'])
+            df['day_of_week'] = (sale_dates.dt.dayofweek + 1) % 7  # Postgres DOW: Sunday = 0
+            df['month'] = sale_dates.dt.month
+            df['quarter'] = sale_dates.dt.quarter
             
             if df.empty:
                 return None
@@ -71,9 +83,13 @@ class SalesPredictor:
             return None
     
     def train_model(self):
-        """Train the sales prediction model"""
+        """Train the sales prediction model (concurrent callers share one training run)"""
+        return self.flights.do(('train', self.fact_store.snapshot.version), self._train)
+    
+    def _train(self):
         try:
-            df = self.prepare_training_data()
+            with stage('sales_forecast', 'fetch'):
+                df = self.prepare_training_data()
             if df is None:
                 return {"error": "No training data available"}
             
@@ -90,18 +106,20 @@ class SalesPredictor:
             y_orders = df['daily_orders'].values
             
             # Scale features
-            X_scaled = self.scaler.fit_transform(X)
-            
-            # Train models for revenue and orders
-            self.revenue_model = RandomForestRegressor(n_estimators=100, random_state=42)
-            self.orders_model = RandomForestRegressor(n_estimators=100, random_state=42)
-            
-            self.revenue_model.fit(X_scaled, y_revenue)
-            self.orders_model.fit(X_scaled, y_orders)
+            with stage('sales_forecast', 'fit'):
+                scaler = StandardScaler()
+                X_scaled = scaler.fit_transform(X)
+                
+                # Train models for revenue and orders
+                revenue_model = RandomForestRegressor(n_estimators=100, random_state=42)
+                orders_model = RandomForestRegressor(n_estimators=100, random_state=42)
+                
+                revenue_model.fit(X_scaled, y_revenue)
+                orders_model.fit(X_scaled, y_orders)
             
             # Calculate training metrics
-            revenue_pred = self.revenue_model.predict(X_scaled)
-            orders_pred = self.orders_model.predict(X_scaled)
+            revenue_pred = revenue_model.predict(X_scaled)
+            orders_pred = orders_model.predict(X_scaled)
             
             metrics = {
                 "revenue_model": {
@@ -116,23 +134,24 @@ class SalesPredictor:
                 }
             }
             
-            self.is_trained = True
+            trained = TrainedForecast(self.fact_store.version, scaler, revenue_model, orders_model, feature_columns)
+            self.trained = trained
             
             return {
                 "status": "Model trained successfully",
                 "metrics": metrics,
-                "feature_importance": self._get_feature_importance(feature_columns)
+                "feature_importance": self._get_feature_importance(trained)
             }
             
         except Exception as e:
             return {"error": f"Training failed: {str(e)}"}
     
-    def _get_feature_importance(self, feature_columns):
+    def _get_feature_importance(self, trained):
         """Get feature importance from trained models"""
         try:
             importance_data = {
-                "revenue_features": [(col, float(imp)) for col, imp in zip(feature_columns, self.revenue_model.feature_importances_)],
-                "orders_features": [(col, float(imp)) for col, imp in zip(feature_columns, self.orders_model.feature_importances_)]
+                "revenue_features": [(col, float(imp)) for col, imp in zip(trained.feature_columns, trained.revenue_model.feature_importances_)],
+                "orders_features": [(col, float(imp)) for col, imp in zip(trained.feature_columns, trained.orders_model.feature_importances_)]
             }
             
             # Sort by importance
@@ -147,7 +166,8 @@ class SalesPredictor:
     def predict_sales(self, days_ahead=30):
         """Predict sales for the next N days"""
         try:
-            if not self.is_trained:
+            trained = self.trained
+            if trained is None:
                 train_result = self.train_model()
                 if "error" in train_result:
                     print("Using fallback sales forecast data")
@@ -173,37 +193,40 @@ class SalesPredictor:
                             "forecast_period_days": days_ahead
                         }
                     }
+                trained = self.trained
             
             # Get the last available data point
-            df = self.prepare_training_data()
+            with stage('sales_forecast', 'fetch'):
+                df = self.prepare_training_data()
             if df is None:
                 return {"error": "No data available for prediction"}
             
             last_date = df['sale_date'].max()
             predictions = []
             
-            for i in range(1, days_ahead + 1):
-                future_date = last_date + timedelta(days=i)
-                
-                # Prepare features for prediction
-                features = self._prepare_prediction_features(future_date, df)
-                
-                if features is None:
-                    continue
-                
-                # Scale features
-                features_scaled = self.scaler.transform([features])
-                
-                # Make predictions
-                predicted_revenue = self.revenue_model.predict(features_scaled)[0]
-                predicted_orders = self.orders_model.predict(features_scaled)[0]
-                
-                predictions.append({
-                    "date": future_date.strftime('%Y-%m-%d'),
-                    "predicted_revenue": round(predicted_revenue, 2),
-                    "predicted_orders": round(predicted_orders, 2),
-                    "predicted_avg_order_value": round(predicted_revenue / max(predicted_orders, 1), 2)
-                })
+            with stage('sales_forecast', 'predict'):
+                for i in range(1, days_ahead + 1):
+                    future_date = last_date + timedelta(days=i)
+                    
+                    # Prepare features for prediction
+                    features = self._prepare_prediction_features(future_date, df)
+                    
+                    if features is None:
+                        continue
+                    
+                    # Scale features
+                    features_scaled = trained.scaler.transform([features])
+                    
+                    # Make predictions
+                    predicted_revenue = trained.revenue_model.predict(features_scaled)[0]
+                    predicted_orders = trained.orders_model.predict(features_scaled)[0]
+                    
+                    predictions.append({
+                        "date": future_date.strftime('%Y-%m-%d'),
+                        "predicted_revenue": round(predicted_revenue, 2),
+                        "predicted_orders": round(predicted_orders, 2),
+                        "predicted_avg_order_value": round(predicted_revenue / max(predicted_orders, 1), 2)
+                    })
             
             # Calculate summary statistics
             total_predicted_revenue = sum(p['predicted_revenue'] for p in predictions)
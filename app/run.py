@@ -24,7 +24,7 @@ if __name__ == '__main__':
     
     # Run the application
     port = int(os.environ.get('PORT', 5000))
-    debug = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
+    debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     
     print(f"\n🚀 Starting E-Commerce Market Basket Analysis Application")
     print(f"📊 Dashboard: http://localhost:{port}")
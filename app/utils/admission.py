@@ -0,0 +1,178 @@
+import math
+import threading
+import time
+from collections import deque
+from flask import g, jsonify, request
+
+# Health probes are never shed, whatever the classes say: a shed probe takes a busy instance out of rotation
+EXEMPT_ENDPOINTS = ('healthz', 'healthz_ready')
+
+# Cost class of each endpoint; endpoints not listed (pages, static files) are never shed
+DEFAULT_ENDPOINT_CLASSES = {
+    'get_stats': 'cheap',
+    'get_top_products': 'cheap',
+    'get_sales_trends': 'cheap',
+    'get_job': 'cheap',
+    'get_recommendations': 'cheap',
+    'get_prepared_statement_stats': 'cheap',
+    'get_model_stats': 'cheap',
+    'get_admission_stats': 'cheap',
+    'api_slice': 'cheap',
+    'get_market_basket_analysis': 'heavy',
+    'get_customer_segments': 'heavy',
+    'get_sales_forecast': 'heavy',
+    'api_rfm_analysis': 'heavy',
+    'api_rfm_insights': 'heavy',
+    'api_cohort_analysis': 'heavy',
+    'api_cohort_insights': 'heavy',
+    'api_executive_summary': 'heavy'
+}
+
+# Tighter per-endpoint caps inside the heavy class (slider-driven re-mines, multi-part summaries)
+DEFAULT_ENDPOINT_LIMITS = {
+    'get_market_basket_analysis': 2,
+    'api_executive_summary': 2
+}
+
+
+class Gate:
+    """A concurrency limit with a bounded FIFO wait queue and a queueing deadline"""
+
+    def __init__(self, name, max_concurrent, max_queue, timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.avg_service_seconds = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    def acquire(self):
+        """Return None once admitted, or 'queue_full' / 'timeout' when the caller should be shed"""
+        with self._cond:
+            if self.active < self.max_concurrent and not self._waiters:
+                self.active += 1
+                self.stats["admitted"] += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self.stats["rejected_queue_full"] += 1
+                return 'queue_full'
+
+            waiter = object()
+            self._waiters.append(waiter)
+            self.stats["queued"] += 1
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self._waiters[0] is not waiter or self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["rejected_timeout"] += 1
+                        return 'timeout'
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.stats["admitted"] += 1
+                return None
+            finally:
+                self._waiters.remove(waiter)
+                self._cond.notify_all()
+
+    def release(self, service_seconds=None):
+        with self._cond:
+            self.active -= 1
+            # Exponentially weighted service time drives the Retry-After estimate
+            if service_seconds is None:
+                pass
+            elif self.avg_service_seconds == 0:
+                self.avg_service_seconds = service_seconds
+            else:
+                self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * service_seconds
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: the queue ahead drained at the observed service rate"""
+        service = self.avg_service_seconds or self.timeout
+        return max(1, math.ceil(service * (self.waiting + 1) / self.max_concurrent))
+
+    def get_stats(self):
+        with self._cond:
+            return dict(self.stats, active=self.active, waiting=self.waiting,
+                        max_concurrent=self.max_concurrent, max_queue=self.max_queue,
+                        avg_service_ms=round(self.avg_service_seconds * 1000, 1))
+
+
+class AdmissionController:
+    """Per-cost-class and per-endpoint concurrency limits; sheds excess load with 503 + Retry-After"""
+
+    def __init__(self, app=None, classes=None, endpoint_classes=None, endpoint_limits=None):
+        self.gates = {name: Gate(name, *limits) for name, limits in (classes or {}).items()}
+        self.endpoint_classes = dict(DEFAULT_ENDPOINT_CLASSES if endpoint_classes is None else endpoint_classes)
+        self.endpoint_gates = {}
+        for endpoint, max_concurrent in (DEFAULT_ENDPOINT_LIMITS if endpoint_limits is None else endpoint_limits).items():
+            class_gate = self.gates.get(self.endpoint_classes.get(endpoint))
+            if class_gate is not None:
+                self.endpoint_gates[endpoint] = Gate(endpoint, max_concurrent, class_gate.max_queue, class_gate.timeout)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def _gates_for(self, endpoint):
+        gates = []
+        if endpoint in EXEMPT_ENDPOINTS:
+            return gates
+        # The endpoint gate is taken first so one endpoint's backlog queues there, not in the shared class gate
+        if endpoint in self.endpoint_gates:
+            gates.append(self.endpoint_gates[endpoint])
+        class_gate = self.gates.get(self.endpoint_classes.get(endpoint))
+        if class_gate is not None:
+            gates.append(class_gate)
+        return gates
+
+    def _admit(self):
+        held = []
+        g.admission = (held, None)
+        for gate in self._gates_for(request.endpoint):
+            reason = gate.acquire()
+            if reason is not None:
+                return self._shed(gate, reason)
+            held.append(gate)
+        # Service time is measured from admission, so queueing does not inflate Retry-After
+        g.admission = (held, time.monotonic())
+        return None
+
+    def _release(self, exc):
+        admission = g.pop('admission', None)
+        if admission is None:
+            return
+        held, started = admission
+        elapsed = None if started is None else time.monotonic() - started
+        for gate in reversed(held):
+            gate.release(elapsed)
+
+    @staticmethod
+    def _shed(gate, reason):
+        retry_after = gate.retry_after()
+        response = jsonify({
+            "error": "Server busy, retry later",
+            "reason": reason,
+            "limit": gate.name,
+            "retry_after": retry_after
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(retry_after)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    def get_stats(self):
+        return {
+            "classes": {name: gate.get_stats() for name, gate in self.gates.items()},
+            "endpoints": {name: gate.get_stats() for name, gate in self.endpoint_gates.items()}
+        }
@@ -0,0 +1,156 @@
+import hashlib
+import itertools
+import threading
+import time
+from utils.json_provider import dumps_bytes
+
+
+class Subscription:
+    """One client's pending events, coalesced per key so a slow reader only gets the latest of each"""
+
+    def __init__(self, bus, topics=None):
+        self.bus = bus
+        self.topics = set(topics) if topics else None
+        self._pending = {}
+        self._condition = threading.Condition()
+        self.closed = False
+
+    def wants(self, event):
+        return self.topics is None or event[1] in self.topics
+
+    def put(self, event):
+        with self._condition:
+            self._pending.pop(event[2], None)
+            self._pending[event[2]] = event
+            self._condition.notify()
+
+    def get(self, timeout):
+        """Pending events in publish order, or [] after timeout seconds without any"""
+        with self._condition:
+            if not self._pending and not self.closed:
+                self._condition.wait(timeout)
+            events = sorted(self._pending.values())
+            self._pending.clear()
+            return events
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Publishes topic updates to Server-Sent Events subscribers; unchanged payloads are not re-sent
+
+    Sources are polled on a background thread while anyone is subscribed. Each
+    publish is keyed (a topic, or a topic plus job params); the bus keeps the
+    latest event per key, so a reconnecting client sends Last-Event-ID and only
+    receives what changed since.
+    """
+
+    def __init__(self, poll_interval=5.0, max_subscribers=None):
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._sources = []
+        self._subscribers = set()
+        self._latest = {}
+        self._fingerprints = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"published": 0, "unchanged": 0, "source_errors": 0}
+
+    def add_source(self, name, fn):
+        """Register fn(bus), called every poll_interval seconds to publish whatever changed"""
+        self._sources.append((name, fn))
+
+    def publish(self, topic, data, key=None, fingerprint=None):
+        """Send data to subscribers unless the key's last payload was identical; returns whether it was sent"""
+        key = key or topic
+        payload = dumps_bytes(data)
+        digest = hashlib.sha1(payload if fingerprint is None else dumps_bytes(fingerprint)).hexdigest()
+        with self._lock:
+            if self._fingerprints.get(key) == digest:
+                self._stats["unchanged"] += 1
+                return False
+            self._fingerprints[key] = digest
+            event = (next(self._ids), topic, key, payload)
+            self._latest[key] = event
+            self._stats["published"] += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.wants(event):
+                subscription.put(event)
+        return True
+
+    def subscribe(self, topics=None, last_event_id=None):
+        """New subscription primed with the latest event per key (only newer ones after last_event_id); None when full"""
+        subscription = Subscription(self, topics)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscription)
+            latest = list(self._latest.values())
+            self._start_polling()
+        for event in latest:
+            if subscription.wants(event) and (last_event_id is None or event[0] > last_event_id):
+                subscription.put(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def poll(self):
+        """Run every source once"""
+        for name, fn in self._sources:
+            try:
+                fn(self)
+            except Exception as e:
+                self._stats["source_errors"] += 1
+                print(f"Event source {name} failed: {e}")
+
+    def _start_polling(self):
+        if self._sources and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._poll_loop, name='event-bus', daemon=True)
+            self._thread.start()
+
+    def _poll_loop(self):
+        # Sources query the database, so polling stops with the last subscriber
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            self.poll()
+            time.sleep(self.poll_interval)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats, subscribers=len(self._subscribers), keys=len(self._latest))
+
+
+def sse_stream(subscription, heartbeat=15.0, max_seconds=None, retry_ms=5000):
+    """Yield text/event-stream chunks for a subscription until the client leaves or max_seconds pass"""
+    deadline = time.time() + max_seconds if max_seconds else None
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        while deadline is None or time.time() < deadline:
+            timeout = heartbeat if deadline is None else max(0.0, min(heartbeat, deadline - time.time()))
+            events = subscription.get(timeout)
+            if not events:
+                # Comment lines keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            yield ''.join(
+                f"id: {event_id}\nevent: {topic}\ndata: {payload.decode('utf-8')}\n\n"
+                for event_id, topic, _, payload in events
+            )
+    finally:
+        subscription.close()
+
+
+def sse_busy(retry_ms, message):
+    """A complete event stream telling the client to reconnect in retry_ms (EventSource gives up on a non-200)"""
+    yield f"retry: {retry_ms}\nevent: busy\ndata: {dumps_bytes({'error': message}).decode('utf-8')}\n\n"
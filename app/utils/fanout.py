@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from utils.metrics import FANOUT_PART_SECONDS, FANOUT_PARTS
+
+
+class FanOut:
+    """Runs independent parts concurrently with per-part deadlines
+
+    All runs share one executor of max_workers threads, so concurrent requests
+    never add threads. Part names identify the work: while a part is still
+    running or queued, from this run or an earlier one that gave up on it, a run
+    waits on that future instead of submitting another copy. Each part therefore
+    has at most one copy in the executor, and a part that missed its deadline is
+    joined by the next run rather than repeated.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix='fanout'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._inflight = {}
+        # Reentrant: a part that finishes before its callback is added runs the callback under the lock
+        self._lock = threading.RLock()
+
+    def run(self, parts, timeout):
+        """Run {name: (fn, default)}; parts that miss their deadline or fail fall back to default"""
+        started = time.perf_counter()
+        futures = {}
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(self.max_workers, 1),
+                                                    thread_name_prefix=self.thread_name_prefix)
+            for name, (fn, _) in parts.items():
+                future = self._inflight.get(name)
+                if future is not None and not future.done():
+                    FANOUT_PARTS.inc(fanout=self.thread_name_prefix, part=name, outcome='joined')
+                else:
+                    future = self._inflight[name] = self._executor.submit(self._timed, fn)
+                    future.add_done_callback(lambda done, name=name: self._forget(name, done))
+                futures[name] = future
+
+        results = {}
+        timings = {}
+        timed_out = []
+        errors = {}
+
+        for name, future in futures.items():
+            default = parts[name][1]
+            remaining = started + timeout - time.perf_counter()
+            try:
+                value, elapsed = future.result(timeout=max(remaining, 0))
+                results[name] = value
+                timings[name] = round(elapsed * 1000, 1)
+                self._record(name, 'ok', elapsed)
+            except FutureTimeoutError:
+                # Left running (or queued) for the next run to join; other runs may be waiting on it too
+                results[name] = default
+                timed_out.append(name)
+                FANOUT_PARTS.inc(fanout=self.thread_name_prefix, part=name, outcome='timeout')
+            except Exception as e:
+                results[name] = default
+                errors[name] = str(e)
+                elapsed = time.perf_counter() - started
+                timings[name] = round(elapsed * 1000, 1)
+                self._record(name, 'error', elapsed)
+
+        meta = {
+            "timings_ms": timings,
+            "timed_out": timed_out,
+            "errors": errors,
+            "partial": bool(timed_out or errors),
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        return results, meta
+
+    def _forget(self, name, future):
+        with self._lock:
+            if self._inflight.get(name) is future:
+                del self._inflight[name]
+
+    def _record(self, name, outcome, seconds):
+        FANOUT_PARTS.inc(fanout=self.thread_name_prefix, part=name, outcome=outcome)
+        FANOUT_PART_SECONDS.observe(seconds, fanout=self.thread_name_prefix, part=name)
+
+    @staticmethod
+    def _timed(fn):
+        start = time.perf_counter()
+        value = fn()
+        return value, time.perf_counter() - start
@@ -0,0 +1,200 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import date
+from email.utils import formatdate, parsedate_to_datetime
+from flask import Response, g, request
+from utils.metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Cache-Control per endpoint; "no-cache" still allows a cheap 304 revalidation via ETag
+DEFAULT_POLICIES = {
+    'get_stats': 'public, max-age=60',
+    'get_top_products': 'public, max-age=60',
+    'get_sales_trends': 'public, max-age=60',
+    'api_slice': 'public, max-age=60',
+    'get_market_basket_analysis': 'private, no-cache',
+    'get_customer_segments': 'private, no-cache',
+    'get_sales_forecast': 'private, no-cache',
+    'get_recommendations': 'private, max-age=300',
+    'api_rfm_analysis': 'private, no-cache',
+    'api_rfm_insights': 'private, no-cache',
+    'api_cohort_analysis': 'private, no-cache',
+    'api_cohort_insights': 'private, no-cache',
+    'api_executive_summary': 'private, no-cache',
+    'get_job': 'no-store',
+    'api_events': 'no-store',
+    'healthz': 'no-store',
+    'healthz_ready': 'no-store',
+    'get_admission_stats': 'no-store',
+    'metrics': 'no-store'
+}
+
+# Endpoints whose payload also depends on today's date (recency is measured from now), revalidated per day
+DATED_ENDPOINTS = ('api_rfm_analysis', 'api_rfm_insights', 'api_executive_summary')
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+
+class HttpCache:
+    """ETag/Last-Modified from the data version, 304 handling, Cache-Control and response compression
+
+    version_fns maps an endpoint to the version of the data it actually serves
+    (e.g. the fact store snapshot), so a validator never labels older content;
+    other endpoints use version_fn.
+    """
+
+    # Versions whose first-seen time is kept for Last-Modified; only recent versions are ever revalidated
+    MAX_VERSIONS = 64
+
+    def __init__(self, app=None, version_fn=None, policies=None, dated_endpoints=DATED_ENDPOINTS,
+                 min_compress_bytes=1024, compress_level=6, version_fns=None):
+        self.version_fn = version_fn
+        self.version_fns = dict(version_fns or {})
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        self.dated_endpoints = set(dated_endpoints)
+        self.min_compress_bytes = min_compress_bytes
+        self.compress_level = compress_level
+        self._version_seen_at = {}
+        self._version_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._check_not_modified)
+        app.after_request(self._finalize_response)
+
+    def _check_not_modified(self):
+        """Answer revalidation requests with 304 before the endpoint does any work"""
+        policy = self.policies.get(request.endpoint)
+        if request.method != 'GET' or policy is None or 'no-store' in policy:
+            return None
+
+        version_fn = self.version_fns.get(request.endpoint, self.version_fn)
+        try:
+            version = version_fn() if version_fn else None
+        except Exception as e:
+            # Served without validators; the endpoint reports the failure itself
+            print(f"Error reading data version for {request.endpoint}: {e}")
+            return None
+        if version is None:
+            return None
+        if request.endpoint in self.dated_endpoints:
+            version = f"{version}|{date.today().isoformat()}"
+
+        etag = self._etag(version)
+        last_modified = self._last_modified(version)
+        g.http_cache = (etag, last_modified, policy)
+
+        matched = self._matches(etag, last_modified)
+        record_cache('http_revalidation', matched)
+        if matched:
+            return self._not_modified(etag, last_modified, policy)
+        return None
+
+    def _last_modified(self, version):
+        """When this process first saw a version; the oldest versions are forgotten past MAX_VERSIONS"""
+        with self._version_lock:
+            last_modified = self._version_seen_at.get(version)
+            if last_modified is None:
+                last_modified = self._version_seen_at[version] = time.time()
+                while len(self._version_seen_at) > self.MAX_VERSIONS:
+                    del self._version_seen_at[next(iter(self._version_seen_at))]
+            return last_modified
+
+    def _finalize_response(self, response):
+        cache = g.pop('http_cache', None)
+        if response.status_code == 200 and self._is_error_payload(response):
+            # Many endpoints report failures as {"error": ...} with a 200; those are neither cached nor revalidated
+            response.headers['Cache-Control'] = 'no-store'
+        policy = self.policies.get(request.endpoint)
+        if policy is not None and 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = policy if response.status_code == 200 else 'no-store'
+        # Error and partial payloads are marked no-store; those get no validators either
+        if cache is not None and response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            etag, last_modified, _ = cache
+            response.headers['ETag'] = etag
+            response.headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+
+        return self._compress(response)
+
+    @staticmethod
+    def _is_error_payload(response):
+        """A JSON object body with a top-level "error" key; only bodies mentioning "error" are parsed"""
+        if response.mimetype != 'application/json' or response.is_streamed or response.direct_passthrough:
+            return False
+        data = response.get_data()
+        if not data.startswith(b'{') or b'"error"' not in data:
+            return False
+        try:
+            return 'error' in json.loads(data)
+        except ValueError:
+            return False
+
+    def _compress(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._negotiate_encoding()
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_compress_bytes:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=min(self.compress_level, 11))
+        else:
+            compressed = gzip.compress(data, compresslevel=self.compress_level)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Length'] = str(len(compressed))
+        return response
+
+    def _negotiate_encoding(self):
+        accepted = request.accept_encodings
+        options = ['br', 'gzip'] if brotli is not None else ['gzip']
+        best = accepted.best_match(options)
+        if best is None or accepted[best] <= 0:
+            return None
+        return best
+
+    def _etag(self, version):
+        args = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+        digest = hashlib.sha1(f"{version}|{request.path}|{args}".encode('utf-8')).hexdigest()[:20]
+        # Weak: the same representation is served with different content encodings
+        return f'W/"{digest}"'
+
+    def _matches(self, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            candidates = [tag.strip() for tag in if_none_match.split(',')]
+            bare = etag[2:]
+            return '*' in candidates or any(tag in (etag, bare) or tag[2:] == bare for tag in candidates)
+
+        if_modified_since = request.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _not_modified(etag, last_modified, policy):
+        response = Response(status=304)
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+        response.headers['Cache-Control'] = policy
+        return response
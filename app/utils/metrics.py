@@ -0,0 +1,260 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, request
+
+try:
+    import resource
+except ImportError:  # not available on Windows; process metrics then report RSS from /proc only
+    resource = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric family; samples are keyed by their label values"""
+
+    type = 'untyped'
+
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.label_names)
+
+    def samples(self):
+        """[(suffix, [(label, value)...], value)] in exposition order"""
+        with self._lock:
+            return [('', list(zip(self.label_names, key)), value) for key, value in sorted(self._values.items())]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                labels = list(zip(self.label_names, key))
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append(('_bucket', labels + [('le', _format_value(float(bound)))], bucket_count))
+                samples.append(('_bucket', labels + [('le', '+Inf')], count))
+                samples.append(('_sum', labels, total))
+                samples.append(('_count', labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Lightweight in-process registry rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name, help, label_names, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, help, label_names, **kwargs)
+            return metric
+
+    def counter(self, name, help, label_names=()):
+        return self._get_or_create(Counter, name, help, label_names)
+
+    def gauge(self, name, help, label_names=()):
+        return self._get_or_create(Gauge, name, help, label_names)
+
+    def histogram(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, label_names, buckets=buckets)
+
+    def add_collector(self, collect):
+        """Register collect(), called at scrape time, returning [(name, type, help, [(labels dict, value)])]"""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, metric_type, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry and the metrics shared across modules
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route, method and status',
+    ('route', 'method', 'status')
+)
+STAGE_SECONDS = registry.histogram(
+    'analyzer_stage_duration_seconds', 'Time spent in each analyzer stage',
+    ('analyzer', 'stage')
+)
+CACHE_REQUESTS = registry.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit or miss)',
+    ('cache', 'result')
+)
+FANOUT_PART_SECONDS = registry.histogram(
+    'fanout_part_duration_seconds', 'Time each fan-out part took to finish or fail',
+    ('fanout', 'part')
+)
+FANOUT_PARTS = registry.counter(
+    'fanout_parts_total', 'Fan-out parts by outcome (ok, timeout, error or joined, when a straggler was reused)',
+    ('fanout', 'part', 'outcome')
+)
+
+
+def stage(analyzer, name):
+    """Time a block as one stage of an analyzer: `with stage('market_basket', 'mine'):`"""
+    return STAGE_SECONDS.time(analyzer=analyzer, stage=name)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def collect_cache_ratios():
+    totals = {}
+    for (cache, result), count in list(CACHE_REQUESTS._values.items()):
+        totals.setdefault(cache, {'hit': 0, 'miss': 0})[result] += count
+    return [('cache_hit_ratio', 'gauge', 'Share of cache lookups that hit', [
+        ({'cache': cache}, counts['hit'] / max(counts['hit'] + counts['miss'], 1))
+        for cache, counts in sorted(totals.items())
+    ])]
+
+
+def collect_process():
+    """Resident memory and CPU of this worker process"""
+    rss = None
+    try:
+        with open('/proc/self/statm') as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    labels = {'pid': os.getpid()}
+    families = [('process_resident_memory_bytes', 'gauge', 'Current resident set size of this worker', [(labels, rss)])]
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        peak = usage.ru_maxrss if os.uname().sysname == 'Darwin' else usage.ru_maxrss * 1024
+        families.append(('process_peak_resident_memory_bytes', 'gauge', 'Peak resident set size of this worker', [(labels, peak)]))
+        families.append(('process_cpu_seconds_total', 'counter', 'User and system CPU time of this worker', [(labels, usage.ru_utime + usage.ru_stime)]))
+    return families
+
+
+registry.add_collector(collect_cache_ratios)
+registry.add_collector(collect_process)
+
+
+class RequestMetrics:
+    """Records per-route latency histograms; register before other hooks so queueing and 304s are included"""
+
+    def __init__(self, app=None, histogram=REQUEST_SECONDS):
+        self.histogram = histogram
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._record)
+
+    @staticmethod
+    def _start():
+        g.metrics_started = time.perf_counter()
+
+    def _record(self, response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # Templated rule keeps label cardinality bounded (/api/jobs/<job_id>, not every id)
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            self.histogram.observe(time.perf_counter() - started, route=route,
+                                   method=request.method, status=str(response.status_code))
+        return response
@@ -0,0 +1,168 @@
+import base64
+import json
+import threading
+import numpy as np
+import pandas as pd
+from utils.metrics import record_cache
+
+
+class InvalidCursor(ValueError):
+    """Raised for malformed cursors or cursors whose row no longer exists"""
+    pass
+
+
+class SortedIndex:
+    """Sort orders and filter subsets over a result frame, precomputed for keyset pagination
+
+    Every sort order breaks ties on the id column, so a cursor (the id of the last
+    row served) maps to one position. Looking it up is a dict hit plus a binary
+    search, which keeps page 500 as cheap as page 1.
+    """
+
+    def __init__(self, df, id_column, sort_columns, filter_columns, token=None):
+        self.df = df.reset_index(drop=True)
+        self.id_column = id_column
+        self.sort_columns = list(sort_columns)
+        self.filter_columns = list(filter_columns)
+        self.token = token
+
+        ids = self.df[id_column].astype(str).to_numpy()
+        self._row_by_id = {row_id: row for row, row_id in enumerate(ids)}
+        self._id_codes = pd.factorize(ids, sort=True)[0]
+        self._orders = {}
+        self._ranks = {}
+        self._subsets = {}
+        self._lock = threading.Lock()
+
+        # Sort orders are cheap to build up front and are what every page reads
+        for column in self.sort_columns:
+            for descending in (False, True):
+                self._order(column, descending)
+
+    def __len__(self):
+        return len(self.df)
+
+    def page(self, sort=None, descending=False, filters=None, after=None, limit=50):
+        """Return (rows DataFrame, next_cursor, total matching rows)"""
+        sort = sort or self.id_column
+        if sort not in self.sort_columns and sort != self.id_column:
+            raise ValueError(f"Cannot sort by {sort}; choose one of {', '.join([self.id_column] + self.sort_columns)}")
+
+        order, ranks = self._order(sort, descending)
+        subset_ranks = self._subset_ranks(sort, descending, filters or {})
+
+        start = 0
+        if after is not None:
+            row = self._row_by_id.get(self.decode_cursor(after))
+            if row is None:
+                raise InvalidCursor("Cursor refers to a row that is no longer in the result set")
+            if subset_ranks is None:
+                start = ranks[row] + 1
+            else:
+                start = int(np.searchsorted(subset_ranks, ranks[row], side='right'))
+
+        if subset_ranks is None:
+            total = len(order)
+            page_rows = order[start:start + limit]
+        else:
+            total = len(subset_ranks)
+            page_rows = order[subset_ranks[start:start + limit]]
+
+        next_cursor = None
+        if start + limit < total and len(page_rows):
+            next_cursor = self.encode_cursor(self.df[self.id_column].iloc[page_rows[-1]])
+
+        return self.df.iloc[page_rows], next_cursor, total
+
+    @staticmethod
+    def encode_cursor(row_id):
+        return base64.urlsafe_b64encode(json.dumps({"id": str(row_id)}).encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))["id"]
+        except Exception:
+            raise InvalidCursor("Malformed cursor")
+
+    def _order(self, column, descending):
+        key = (column, descending)
+        if key not in self._orders:
+            with self._lock:
+                if key not in self._orders:
+                    values = self.df[column]
+                    if pd.api.types.is_numeric_dtype(values):
+                        sort_key = values.to_numpy(dtype=np.float64)
+                    else:
+                        sort_key = pd.factorize(values.astype(str), sort=True)[0].astype(np.float64)
+                    if descending:
+                        sort_key = -sort_key
+                    order = np.lexsort((self._id_codes, sort_key))
+                    ranks = np.empty(len(order), dtype=np.int64)
+                    ranks[order] = np.arange(len(order))
+                    self._ranks[key] = ranks
+                    self._orders[key] = order
+        return self._orders[key], self._ranks[key]
+
+    def _subset_ranks(self, sort, descending, filters):
+        """Sorted ranks (within the sort order) of the rows matching every filter"""
+        if not filters:
+            return None
+
+        for column in filters:
+            if column not in self.filter_columns:
+                raise ValueError(f"Cannot filter by {column}; choose from {', '.join(self.filter_columns)}")
+
+        key = (sort, descending, tuple(sorted(filters.items())))
+        if key not in self._subsets:
+            mask = np.ones(len(self.df), dtype=bool)
+            for column, value in filters.items():
+                mask &= (self.df[column].astype(str) == str(value)).to_numpy()
+            _, ranks = self._order(sort, descending)
+            with self._lock:
+                self._subsets[key] = np.sort(ranks[mask])
+        return self._subsets[key]
+
+
+class IndexCache:
+    """Keeps the latest SortedIndex per view, rebuilt when its token (e.g. data version) changes"""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, token, build):
+        """Return the cached index for name, or build(token) if the token changed"""
+        index = self._indexes.get(name)
+        record_cache('pagination_index', index is not None and index.token == token)
+        if index is not None and index.token == token:
+            return index
+        with self._lock:
+            index = self._indexes.get(name)
+            if index is None or index.token != token:
+                index = build(token)
+                if index is not None:
+                    self._indexes[name] = index
+        return index
+
+
+def page_params(args, filter_columns, default_limit=50, max_limit=1000):
+    """Parse limit/after/sort/order and filter query parameters"""
+    try:
+        limit = int(args.get('limit', default_limit))
+    except (TypeError, ValueError):
+        limit = default_limit
+    limit = min(max(limit, 1), max_limit)
+
+    return {
+        "limit": limit,
+        "after": args.get('after') or None,
+        "sort": args.get('sort') or None,
+        "descending": args.get('order', 'asc').lower() == 'desc',
+        "filters": {column: args.get(column) for column in filter_columns if args.get(column) not in (None, '')}
+    }
+
+
+def wants_page(args):
+    """Pagination is opt-in so existing clients keep the full payload"""
+    return 'limit' in args or 'after' in args
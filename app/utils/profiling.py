@@ -0,0 +1,194 @@
+import cProfile
+import functools
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import Response, current_app, jsonify, request
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval and counts collapsed stacks"""
+
+    def __init__(self, thread_id, interval=0.002):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(self._frame_name(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _frame_name(frame):
+        code = frame.f_code
+        filename = code.co_filename
+        if filename.startswith(APP_DIR):
+            filename = os.path.relpath(filename, APP_DIR)
+        else:
+            filename = '/'.join(filename.split(os.sep)[-2:])
+        return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+    def collapsed(self):
+        """Flamegraph input: one "root;...;leaf count" line per distinct stack"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Profiles a single request when it carries ?_profile=1 (sampling) or ?_profile=cprofile
+
+    The report replaces the response body and is also written to the profiles
+    directory, which keeps the newest max_files reports. Views are only wrapped
+    when init_app is called, so a disabled profiler costs nothing per request.
+    A token is required: only requests with a matching X-Profile-Token header
+    are profiled. Endless streams (Server-Sent Events) are refused, since their
+    body cannot be materialized.
+    """
+
+    MODES = {'1': 'sample', 'sample': 'sample', 'cprofile': 'cprofile'}
+    EXTENSIONS = ('.collapsed', '.prof')
+
+    def __init__(self, app=None, profile_dir='profiles', token=None, interval_ms=2, max_files=50,
+                 unprofiled_endpoints=('api_events',)):
+        if not token:
+            raise ValueError("A profile token is required; set PROFILE_TOKEN when PROFILING_ENABLED is on")
+        self.profile_dir = profile_dir
+        self.token = token
+        self.interval = interval_ms / 1000.0
+        self.max_files = max_files
+        self.unprofiled_endpoints = set(unprofiled_endpoints)
+        self._files_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Wrap every registered view; call after all routes are defined"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        for endpoint, view in list(app.view_functions.items()):
+            if endpoint != 'static':
+                app.view_functions[endpoint] = self._wrap(view)
+
+    def _wrap(self, view):
+        @functools.wraps(view)
+        def profiled_view(*args, **kwargs):
+            mode = self.MODES.get(request.args.get('_profile', ''))
+            if mode is None or not self._authorized():
+                return view(*args, **kwargs)
+            if request.endpoint in self.unprofiled_endpoints:
+                return self._refuse()
+            if mode == 'cprofile':
+                return self._run_cprofile(view, args, kwargs)
+            return self._run_sampled(view, args, kwargs)
+        return profiled_view
+
+    def _authorized(self):
+        supplied = request.headers.get('X-Profile-Token', '')
+        return hmac.compare_digest(supplied.encode('utf-8'), self.token.encode('utf-8'))
+
+    @staticmethod
+    def _refuse():
+        response = jsonify({"error": f"{request.endpoint} streams without end and cannot be profiled"})
+        response.status_code = 400
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @staticmethod
+    def _call(view, args, kwargs):
+        # Materialize the body inside the profiled window so streamed responses are included
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.is_streamed and response.mimetype == 'text/event-stream':
+            # Endless: get_data() would never return
+            response.close()
+            return None
+        response.get_data()
+        return response
+
+    def _run_sampled(self, view, args, kwargs):
+        start = time.perf_counter()
+        with StackSampler(threading.get_ident(), self.interval) as sampler:
+            response = self._call(view, args, kwargs)
+        if response is None:
+            return self._refuse()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        report = sampler.collapsed()
+        path = self._save('collapsed', report)
+        return self._report_response(report, path, response, elapsed_ms, sampler.samples)
+
+    def _run_cprofile(self, view, args, kwargs):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self._call(view, args, kwargs)
+        finally:
+            profiler.disable()
+        if response is None:
+            return self._refuse()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        path = self._save('prof', None, lambda path: profiler.dump_stats(path))
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(40)
+        return self._report_response(out.getvalue(), path, response, elapsed_ms, None)
+
+    def _save(self, extension, text, write=None):
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint}-{uuid.uuid4().hex[:6]}.{extension}"
+        path = os.path.join(self.profile_dir, name)
+        if write is not None:
+            write(path)
+        else:
+            with open(path, 'w') as f:
+                f.write(text)
+        print(f"Profile for {request.full_path} written to {path}")
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Delete the oldest reports beyond max_files"""
+        with self._files_lock:
+            try:
+                paths = [os.path.join(self.profile_dir, name) for name in os.listdir(self.profile_dir)
+                         if name.endswith(self.EXTENSIONS)]
+                paths.sort(key=os.path.getmtime)
+                for path in paths[:max(len(paths) - self.max_files, 0)]:
+                    os.remove(path)
+            except OSError as e:
+                print(f"Error pruning profiles in {self.profile_dir}: {e}")
+
+    @staticmethod
+    def _report_response(report, path, response, elapsed_ms, samples):
+        profiled = Response(report, mimetype='text/plain')
+        profiled.headers['X-Profile-File'] = os.path.basename(path)
+        profiled.headers['X-Profiled-Status'] = str(response.status_code)
+        profiled.headers['X-Profiled-Duration-Ms'] = f"{elapsed_ms:.1f}"
+        if samples is not None:
+            profiled.headers['X-Profile-Samples'] = str(samples)
+        profiled.headers['Cache-Control'] = 'no-store'
+        return profiled
@@ -0,0 +1,107 @@
+import numpy as np
+
+
+class KLLSketch:
+    """Mergeable KLL quantile sketch of a stream of numbers
+
+    Items are kept in compactors, and an item at level h stands for 2**h inputs.
+    When a level outgrows its capacity, it is sorted and every other item (from
+    a random offset) is promoted one level up. Memory stays O(k log(n / k)) and
+    ranks are off by roughly 1.7 / k of n. Sketches built from separate chunks
+    or processes merge into the sketch of their union. to_dict/from_dict carry
+    a sketch across process boundaries. Compaction offsets are random; pass a
+    seed for reproducible quantiles.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def retained(self):
+        """Items held across all levels"""
+        return sum(len(items) for items in self.levels)
+
+    def update(self, values):
+        """Add an array of values (NaN is skipped)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.n += int(values.size)
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch (same k) into this one"""
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with k={self.k} and k={other.k}")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, fractions):
+        """Approximate values at the given quantiles (0-1); NaN when the sketch is empty"""
+        fractions = np.asarray(fractions, dtype=np.float64)
+        if self.n == 0:
+            return np.full(fractions.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_at), 2 ** level) for level, items_at in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        # First item whose cumulative weight reaches the requested rank
+        positions = np.minimum(np.searchsorted(cumulative, fractions * cumulative[-1], side='left'), len(items) - 1)
+        values = items[positions]
+        values[fractions <= 0] = self.min
+        values[fractions >= 1] = self.max
+        return values
+
+    def _capacity(self, level):
+        # The top level holds k items; each level below holds two thirds of the one above
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # With an odd count the largest item stays behind at its weight
+                keep = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[self._rng.integers(2)::2]])
+            level += 1
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "levels": [items.tolist() for items in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, data, seed=None):
+        sketch = cls(data["k"], seed)
+        sketch.n = data["n"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data["levels"]]
+        return sketch
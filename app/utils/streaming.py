@@ -0,0 +1,67 @@
+from flask import Response, stream_with_context
+from utils.json_provider import dumps
+
+CASTS = {
+    str: lambda series: series.astype(str).tolist(),
+    int: lambda series: series.astype('int64').tolist(),
+    float: lambda series: series.astype('float64').tolist(),
+    list: lambda series: [list(value) for value in series]
+}
+
+
+def iter_frame_records(df, fields, chunk_size=5000):
+    """Yield JSON-ready dicts from a DataFrame, converting one chunk of column arrays at a time
+
+    fields is a list of (output_key, column, type) with type one of str, int, float or list.
+    """
+    keys = [key for key, _, _ in fields]
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        columns = [CASTS[cast](chunk[column]) for _, column, cast in fields]
+        for values in zip(*columns):
+            yield dict(zip(keys, values))
+
+
+def wants_stream(request):
+    """Streaming mode requested via ?format=ndjson or ?stream=1"""
+    if request.args.get('format') == 'ndjson':
+        return 'ndjson'
+    if request.args.get('stream') == '1':
+        return 'json'
+    return None
+
+
+def ndjson_response(rows):
+    """Stream rows as newline-delimited JSON"""
+    def generate():
+        for row in rows:
+            yield dumps(row) + '\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def json_array_response(key, rows, envelope=None, batch_size=500):
+    """Stream {"key": [rows...], **envelope} as chunked JSON without building the list in memory"""
+    def generate():
+        yield '{' + dumps(key) + ': ['
+        batch = []
+        first = True
+        for row in rows:
+            batch.append(dumps(row))
+            if len(batch) >= batch_size:
+                yield ('' if first else ', ') + ', '.join(batch)
+                first = False
+                batch = []
+        if batch:
+            yield ('' if first else ', ') + ', '.join(batch)
+        yield ']'
+        for name, value in (envelope or {}).items():
+            yield ', ' + dumps(name) + ': ' + dumps(value)
+        yield '}'
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def stream_response(mode, key, rows, envelope=None):
+    """Build the streaming response for the requested mode"""
+    if mode == 'ndjson':
+        return ndjson_response(rows)
+    return json_array_response(key, rows, envelope)
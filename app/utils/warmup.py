@@ -0,0 +1,95 @@
+import threading
+import time
+
+
+class Warmup:
+    """Runs named precompute steps in order on a background thread and tracks per-step readiness
+
+    Required steps are the ones nothing can be served without: while one has
+    failed the instance is not ready, and the background thread retries the
+    failed steps every retry_seconds. Other failures only mark it degraded.
+    """
+
+    def __init__(self, steps=None, required=(), retry_seconds=30):
+        self.steps = []
+        self.state = {}
+        self.required = set(required)
+        self.retry_seconds = retry_seconds
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._thread = None
+        for name, fn in (steps or []):
+            self.add(name, fn)
+
+    def add(self, name, fn):
+        """Register a step; fn returns normally when its cache is hot and raises otherwise"""
+        self.steps.append((name, fn))
+        self.state[name] = {"status": "pending", "duration_ms": None, "error": None}
+
+    def start(self):
+        """Start warming in the background; calling it again while running is a no-op"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self.enabled = True
+            for name, _ in self.steps:
+                self.state[name] = {"status": "pending", "duration_ms": None, "error": None}
+            self._thread = threading.Thread(target=self._run_until_required_ready, name='warmup', daemon=True)
+            self._thread.start()
+            return True
+
+    def run(self, names=None):
+        """Run every step (or only the given ones) once in the calling thread"""
+        for name, fn in self.steps:
+            if names is not None and name not in names:
+                continue
+            self.state[name] = {"status": "running", "duration_ms": None, "error": None}
+            start = time.perf_counter()
+            try:
+                fn()
+                status, error = "ready", None
+            except Exception as e:
+                status, error = "failed", str(e)
+                print(f"Warm-up step {name} failed: {e}")
+            self.state[name] = {
+                "status": status,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "error": error
+            }
+
+    def _run_until_required_ready(self):
+        self.run()
+        while self.required_failed():
+            time.sleep(self.retry_seconds)
+            # Later steps usually failed for the same reason, so every failed step runs again
+            self.run([name for name, step in self.state.items() if step["status"] == "failed"])
+
+    def required_failed(self):
+        return [name for name in self.required if self.state.get(name, {}).get("status") == "failed"]
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def finished(self):
+        return all(step["status"] in ("ready", "failed") for step in self.state.values())
+
+    def readiness(self):
+        """(ready, report) where ready means every step has finished and no required step failed
+
+        A failed required step reports "failed"; failed optional steps report "degraded" and stay ready.
+        """
+        if not self.enabled:
+            return True, {"status": "ready", "warmup": "disabled", "models": {}}
+
+        models = {name: dict(step, required=name in self.required) for name, step in self.state.items()}
+        if self.required_failed():
+            return False, {"status": "failed", "warmup": "enabled", "models": models}
+        if not self.finished:
+            status = "warming"
+        elif any(step["status"] == "failed" for step in models.values()):
+            status = "degraded"
+        else:
+            status = "ready"
+        return status != "warming", {"status": status, "warmup": "enabled", "models": models}
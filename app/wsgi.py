@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app      (from the repository root; see gunicorn.conf.py)
+
+With preload_app the master imports this module once, builds the fact store,
+the default association rules and the fitted segmentation model, then freezes
+the heap before forking. Workers share those pages copy-on-write instead of
+each pulling and fitting its own copy.
+"""
+
+import gc
+import os
+import time
+
+from threadpoolctl import threadpool_limits
+
+from app import (app, build_rfm_index, build_segment_index, customer_segmentation, index_cache, job_queue,
+                 market_basket_analyzer, warm_cohorts, warm_fact_store, warm_rfm, warm_sales_cube, warmup)
+from config import Config
+from database.db_manager import DatabaseManager
+from utils.warmup import Warmup
+
+
+def preload_market_basket():
+    # Same thresholds as the dashboard and the warm-up step
+    _, error = market_basket_analyzer.mine(0.01, 0.3)
+    if error:
+        raise RuntimeError(error)
+
+
+def preload_customer_segments():
+    segments = customer_segmentation.get_segments()
+    if isinstance(segments, dict) and 'error' in segments:
+        raise RuntimeError(segments['error'])
+    index_cache.get('customer_segments', customer_segmentation.fact_store.snapshot.version, build_segment_index)
+
+
+# In-process steps only: jobs would start a process pool in the master, and the sales
+# forecast is trained inside the job workers, not by the web process.
+PRELOAD_STEPS = [
+    ('fact_store', warm_fact_store),
+    ('sales_cube', warm_sales_cube),
+    ('market_basket', preload_market_basket),
+    ('rfm', warm_rfm),
+    ('cohort', warm_cohorts),
+    ('customer_segments', preload_customer_segments)
+]
+
+
+def preload():
+    """Build shared state in the master before workers fork; failed steps are left to the workers"""
+    start = time.perf_counter()
+    preloader = Warmup(PRELOAD_STEPS)
+    # One thread keeps OpenMP/BLAS from starting thread pools, which are not fork-safe
+    with threadpool_limits(limits=1):
+        preloader.run()
+    for name, step in preloader.state.items():
+        print(f"Preload {name}: {step['status']} in {step['duration_ms']} ms" + (f" ({step['error']})" if step['error'] else ''))
+
+    # Connections opened while preloading must not be inherited by several workers
+    DatabaseManager.close_pools()
+    # Move everything allocated so far out of the collector's view, so collections in the
+    # workers do not write to (and un-share) the preloaded objects' pages
+    gc.collect()
+    gc.freeze()
+    print(f"Preloaded in {time.perf_counter() - start:.1f} s; {gc.get_freeze_count()} objects frozen in pid {os.getpid()}")
+
+
+def on_worker_start():
+    """Per-worker start-up after fork (gunicorn post_fork); threads are not inherited from the master"""
+    # Jobs left by workers that exited are taken over here; the master never starts a job pool
+    job_queue.recover()
+    if Config.WARMUP_ENABLED:
+        # Preloaded steps are cache hits; the job-backed results are computed once and shared via the job store
+        warmup.start()
+
+
+if Config.PRELOAD_APP:
+    preload()
+
+
+if __name__ == '__main__':
+    # No gunicorn (e.g. on Windows): the threaded Flask server, never with the debugger on
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=False, threaded=True)
@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for the analytics app: gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be tuned from the environment. Each worker is a process with
+its own job pool (JOB_WORKERS processes) and its own admission limits, so
+WEB_CONCURRENCY multiplies both.
+"""
+
+import multiprocessing
+import os
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+
+# wsgi.py and the flat module imports (database.*, models.*) live in app/
+chdir = APP_DIR
+pythonpath = APP_DIR
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# Analytics requests are CPU-bound pandas work, so processes scale compute and threads cover I/O waits
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(multiprocessing.cpu_count(), 4))))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Build the fact store, rules and fitted models once in the master; workers share them copy-on-write
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+os.environ['PRELOAD_APP'] = 'true' if preload_app else 'false'
+
+# Recycle workers to bound memory growth (pandas fragmentation, per-worker caches); jitter staggers restarts
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# Heavy endpoints wait up to JOB_SYNC_WAIT for their job. gthread workers keep heartbeating while a request
+# waits; a sync worker (GUNICORN_THREADS=1) is killed after timeout, so keep JOB_SYNC_WAIT below it there
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from wsgi import on_worker_start
+        on_worker_start()
+
+
+def worker_exit(server, worker):
+    # Cancel this worker's queued jobs; their rows stay pending for another worker to recover
+    from app import job_queue
+    job_queue.shutdown()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the analyzers on synthetic data (no database needed).
+
+For each --orders scale the generator's fact frame (scripts/generate_synthetic_data.py)
+is loaded into the fact store with FactStore.load_frame, then every case runs
+--repeat times on a fresh analyzer, so no per-instance cache or single-flight
+result is reused. One extra traced run per case records peak memory:
+  * traced_peak_mb: peak Python + NumPy heap allocated during the call (tracemalloc)
+  * rss_peak_mb: growth of the process's peak RSS during the call (Linux, reset via
+    /proc/self/clear_refs), which also covers native allocations tracemalloc misses
+
+Usage: python scripts/benchmark_analyzers.py [--orders 100000,1000000] [--repeat 3]
+       [--seed 42] [--cases market_basket.analyze,rfm.calculate_rfm]
+       [--output data/benchmarks/analyzers.json]
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, '..', 'app'))
+
+from generate_synthetic_data import generate
+from database.fact_store import get_fact_store
+from models.registry import MODEL_PATHS
+
+
+def _train_first(predictor):
+    predictor.train_model()
+
+
+# name -> (model name in the registry, untimed setup, timed call)
+CASES = {
+    'market_basket.analyze': ('market_basket', None, lambda m: m.analyze(0.01, 0.3)),
+    'rfm.calculate_rfm': ('rfm', None, lambda m: m.calculate_rfm()),
+    'cohort.calculate_cohort_analysis': ('cohort', None, lambda m: m.calculate_cohort_analysis('month')),
+    'customer_segments.get_segments': ('customer_segments', None, lambda m: m.get_segments()),
+    'sales_forecast.train_model': ('sales_forecast', None, lambda m: m.train_model()),
+    'sales_forecast.predict_sales': ('sales_forecast', _train_first, lambda m: m.predict_sales(90))
+}
+
+
+def new_model(name):
+    """A fresh analyzer instance, built the way the registry builds it"""
+    module_name, class_name = MODEL_PATHS[name].split(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def peak_rss_mb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def reset_peak_rss():
+    """Reset VmHWM to the current RSS; False when the kernel does not allow it"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def check_result(result):
+    if isinstance(result, dict) and 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+def time_case(name, repeat):
+    model_name, setup, call = CASES[name]
+    timings = []
+    for _ in range(repeat):
+        model = new_model(model_name)
+        if setup is not None:
+            setup(model)
+        gc.collect()
+        start = time.perf_counter()
+        check_result(call(model))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure_memory(name):
+    model_name, setup, call = CASES[name]
+    model = new_model(model_name)
+    if setup is not None:
+        setup(model)
+    gc.collect()
+
+    can_reset = reset_peak_rss()
+    rss_before = peak_rss_mb()
+    tracemalloc.start()
+    try:
+        check_result(call(model))
+        _, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rss_after = peak_rss_mb()
+    rss_growth = rss_after - rss_before if can_reset and rss_before is not None else None
+    return traced_peak / 2 ** 20, rss_growth
+
+
+def run_scale(n_orders, args, cases):
+    start = time.perf_counter()
+    data = generate(n_orders, args.seed)
+    frame = data.fact_frame()
+    generated = time.perf_counter() - start
+
+    store = get_fact_store()
+    store.version_ttl = float('inf')
+    start = time.perf_counter()
+    snapshot = store.load_frame(frame, version=f"synthetic-{n_orders}-{args.seed}")
+    loaded = time.perf_counter() - start
+    del frame, data
+    gc.collect()
+
+    print(f"\n{n_orders:,} orders: {len(snapshot):,} order lines, {len(snapshot.vocabularies['customer_id']):,} customers "
+          f"(generated {generated:.1f} s, load_frame {loaded:.1f} s)")
+    print(f"  {'case':<34} {'min s':>8} {'median s':>9} {'traced MB':>10} {'RSS +MB':>8}")
+
+    results = []
+    for name in cases:
+        try:
+            timings = time_case(name, args.repeat)
+            traced_mb, rss_mb = measure_memory(name)
+            row = {
+                "orders": n_orders, "order_lines": len(snapshot), "case": name,
+                "min_seconds": round(min(timings), 4), "median_seconds": round(statistics.median(timings), 4),
+                "traced_peak_mb": round(traced_mb, 1), "rss_peak_mb": None if rss_mb is None else round(rss_mb, 1)
+            }
+            print(f"  {name:<34} {row['min_seconds']:>8.3f} {row['median_seconds']:>9.3f} "
+                  f"{row['traced_peak_mb']:>10.1f} {'n/a' if rss_mb is None else f'{rss_mb:.1f}':>8}")
+        except Exception as e:
+            row = {"orders": n_orders, "case": name, "error": str(e)}
+            print(f"  {name:<34} failed: {e}")
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', default='100000,1000000', help='comma-separated order counts (1e5..1e7)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cases', default=','.join(CASES), help='comma-separated subset of: ' + ', '.join(CASES))
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    cases = [name for name in args.cases.split(',') if name]
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    results = []
+    for n_orders in (int(float(n)) for n in args.orders.split(',')):
+        results.extend(run_scale(n_orders, args, cases))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({"seed": args.seed, "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
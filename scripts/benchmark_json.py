@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compare JSON serialization time of the API payloads under Flask's default
+provider and the orjson-backed FastJSONProvider.
+
+Each endpoint is called once to capture the object it hands to jsonify; that
+object is then serialized repeatedly with both providers.
+
+Usage: python scripts/benchmark_json.py [--runs 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+ENDPOINTS = [
+    '/api/stats',
+    '/api/top-products',
+    '/api/sales-trends',
+    '/api/category-performance',
+    '/api/market-basket?min_support=0.01&min_confidence=0.3',
+    '/api/customer-segments',
+    '/api/sales-forecast?months=3',
+    '/api/rfm-analysis',
+    '/api/cohort-analysis',
+    '/api/executive-summary'
+]
+
+
+def capture_payloads(app, client):
+    """Call every endpoint and record the object passed to app.json.response"""
+    captured = {}
+    original = app.json.response
+
+    def recording_response(*args, **kwargs):
+        captured['obj'] = app.json._prepare_response_obj(args, kwargs)
+        return original(*args, **kwargs)
+
+    app.json.response = recording_response
+    payloads = {}
+    try:
+        for url in ENDPOINTS:
+            captured.pop('obj', None)
+            response = client.get(url, headers={'Accept-Encoding': 'identity'})
+            if 'obj' in captured and response.status_code == 200:
+                payloads[url] = captured['obj']
+            else:
+                print(f"skipping {url}: status {response.status_code}")
+    finally:
+        app.json.response = original
+    return payloads
+
+
+def time_dumps(provider, obj, runs):
+    """Best-of-runs serialization time in ms and the encoded size in bytes"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        encoded = provider.dumps(obj)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(encoded.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import app
+    from utils.json_provider import orjson
+
+    if orjson is None:
+        print("orjson is not installed; FastJSONProvider falls back to the standard library encoder")
+
+    client = app.test_client()
+    payloads = capture_payloads(app, client)
+    stdlib = DefaultJSONProvider(app)
+    fast = app.json
+
+    print(f"{'endpoint':<58}{'bytes':>10}{'stdlib ms':>12}{'orjson ms':>12}{'speedup':>9}")
+    totals = [0.0, 0.0]
+    for url, obj in payloads.items():
+        try:
+            stdlib_ms, size = time_dumps(stdlib, obj, args.runs)
+        except TypeError as e:
+            # The default provider cannot encode NumPy scalars and the like at all
+            print(f"{url:<58}{'':>10}{'n/a':>12}{'':>12}  ({e})")
+            continue
+        fast_ms, _ = time_dumps(fast, obj, args.runs)
+        totals[0] += stdlib_ms
+        totals[1] += fast_ms
+        print(f"{url:<58}{size:>10,}{stdlib_ms:>12.2f}{fast_ms:>12.2f}{stdlib_ms / max(fast_ms, 1e-6):>8.1f}x")
+
+    print(f"{'total':<58}{'':>10}{totals[0]:>12.2f}{totals[1]:>12.2f}{totals[0] / max(totals[1], 1e-6):>8.1f}x")
+
+    job_queue = getattr(sys.modules.get('app'), 'job_queue', None)
+    if job_queue is not None:
+        job_queue.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark quantile RFM scoring from KLL sketches against exact quantiles, at
+about 1M customers by default (no database needed).
+
+Customer aggregates come from RFMAnalyzer's fact-store path on the generator's
+data (scripts/generate_synthetic_data.py). Score boundaries are then computed
+three ways, each --repeat times:
+  * exact:   exact_boundaries over every customer at once, as served when
+             RFM_SCORING=quantile
+  * sketch:  build_score_sketches fed --chunk-rows customers at a time
+  * merged:  --processes worker processes each sketch a disjoint share of the
+             customers, and the parent merges the serialized sketches
+For each variant the report gives the worst rank error of any boundary (how
+far its true quantile is from the requested one; ties keep even exact
+boundaries off). Sketch variants also report the items they retain and the
+share of customers whose R/F/M scores match exact scoring.
+
+Usage: python scripts/benchmark_rfm_sketch.py [--population 1500000] [--chunk-rows 50000]
+       [--processes 4] [--repeat 3] [--seed 42] [--output data/benchmarks/rfm_sketch.json]
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, '..', 'app'))
+
+import numpy as np
+import pandas as pd
+
+from generate_synthetic_data import generate
+from database.fact_store import get_fact_store
+from models.rfm_analyzer import (RFMAnalyzer, SCORE_QUANTILES, SCORED_COLUMNS, build_score_sketches,
+                                 exact_boundaries, merge_score_sketches, score_boundaries)
+from utils.quantile_sketch import KLLSketch
+
+
+def timed(fn, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def chunks_of(frame, chunk_rows):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def sketch_partition(columns, chunk_rows, seed):
+    """Worker: sketch one share of the customers and return the sketches serialized"""
+    frame = pd.DataFrame(columns)
+    return {column: sketch.to_dict() for column, sketch in build_score_sketches(chunks_of(frame, chunk_rows), seed=seed).items()}
+
+
+def sketch_in_processes(pool, frame, processes, chunk_rows, seed):
+    shares = [{column: frame[column].to_numpy()[share::processes] for column in SCORED_COLUMNS} for share in range(processes)]
+    results = pool.starmap(sketch_partition, [(share, chunk_rows, seed) for share in shares])
+    return merge_score_sketches(({column: KLLSketch.from_dict(data) for column, data in result.items()} for result in results),
+                                seed=seed)
+
+
+def accuracy(frame, analyzer, boundaries, exact_scores):
+    """Worst boundary rank error per column, and the share of customers scored as exact quantiles score them"""
+    rank_errors = {}
+    for column in SCORED_COLUMNS:
+        values = np.sort(frame[column].to_numpy(dtype=np.float64))
+        ranks = np.searchsorted(values, boundaries[column], side='right') / len(values)
+        rank_errors[column] = round(float(np.max(np.abs(ranks - SCORE_QUANTILES))), 4)
+    scores = analyzer.score_customers(frame.copy(), boundaries)
+    matching = {column: round(float((scores[column] == exact_scores[column]).mean()), 4) for column in ['R_score', 'F_score', 'M_score']}
+    return rank_errors, matching
+
+
+def summarize(name, timings, extra=None):
+    row = {"variant": name, "min_seconds": round(min(timings), 4), "median_seconds": round(statistics.median(timings), 4)}
+    row.update(extra or {})
+    print(f"  {name:<8} {row['min_seconds']:>9.3f} {row['median_seconds']:>10.3f}  {extra or ''}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--population', type=int, default=1500000)
+    parser.add_argument('--orders-per-customer', type=float, default=2.0)
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    data = generate(int(args.population * args.orders_per_customer), args.seed, orders_per_customer=args.orders_per_customer)
+    store = get_fact_store()
+    store.version_ttl = float('inf')
+    snapshot = store.load_frame(data.fact_frame(), version=f"rfm-sketch-benchmark-{args.population}-{args.seed}")
+    del data
+    gc.collect()
+    analyzer = RFMAnalyzer(mode='full', scoring='equal_width')
+    frame = analyzer._compute_rfm_frame(pd.Timestamp(snapshot.order_date.max()) + pd.Timedelta(days=1))
+    frame = frame[['customer_id'] + SCORED_COLUMNS].sample(frac=1, random_state=args.seed).reset_index(drop=True)
+    print(f"{len(frame):,} customers, {args.chunk_rows:,} per chunk, {args.processes} processes")
+    print(f"  {'variant':<8} {'min s':>9} {'median s':>10}")
+
+    results = {"customers": int(len(frame)), "chunk_rows": args.chunk_rows, "processes": args.processes, "timings": []}
+    exact, timings = timed(lambda: exact_boundaries(frame), args.repeat)
+    exact_scores = analyzer.score_customers(frame.copy(), exact)
+    # Ties put even exact boundaries off their requested rank; this is the floor for the sketches
+    rank_errors, _ = accuracy(frame, analyzer, exact, exact_scores)
+    results["timings"].append(summarize('exact', timings, {"max_rank_error": rank_errors}))
+
+    sketches, timings = timed(lambda: build_score_sketches(chunks_of(frame, args.chunk_rows), seed=args.seed), args.repeat)
+    rank_errors, matching = accuracy(frame, analyzer, score_boundaries(sketches), exact_scores)
+    results["timings"].append(summarize('sketch', timings, {
+        "retained_items": sum(sketch.retained for sketch in sketches.values()),
+        "max_rank_error": rank_errors, "scores_matching_exact": matching
+    }))
+
+    with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+        merged, timings = timed(lambda: sketch_in_processes(pool, frame, args.processes, args.chunk_rows, args.seed), args.repeat)
+    rank_errors, matching = accuracy(frame, analyzer, score_boundaries(merged), exact_scores)
+    results["timings"].append(summarize('merged', timings, {
+        "retained_items": sum(sketch.retained for sketch in merged.values()),
+        "max_rank_error": rank_errors, "scores_matching_exact": matching
+    }))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
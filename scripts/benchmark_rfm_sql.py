@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark RFMAnalyzer's SQL push-down mode against the pandas path on the
+configured database (needs the tables from scripts/setup_database.py).
+
+Each variant runs --repeat times:
+  * pandas:       load the order-line join into the fact store (every line item
+                  crosses the wire), then reduce it with _compute_rfm_frame
+  * pandas_warm:  _compute_rfm_frame alone, with the fact store already loaded
+  * sql:          RFM_MODE=sql, aggregates, quintile scores and segments computed
+                  by Postgres; one row per customer crosses the wire
+  * sql_summary:  the same query reduced to the segment summary in Postgres
+The SQL scores are checked against quintile scores computed in pandas from the
+fact-store aggregates and exact quintile edges, values given more than one
+score are counted (tie splits; always 0), and rows transferred are reported.
+
+Usage: python scripts/benchmark_rfm_sql.py [--repeat 3] [--reference-date 2022-07-01]
+       [--output data/benchmarks/rfm_sql.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, '..', 'app'))
+
+import numpy as np
+import pandas as pd
+
+from database.db_manager import DatabaseManager
+from database.fact_store import get_fact_store
+from models.rfm_analyzer import SCORE_QUANTILES, SCORED_COLUMNS, RFMAnalyzer
+
+
+def timed(fn, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def exact_scores(frame):
+    """Quintile scores from exact edges (np.quantile, inverted_cdf), as the SQL mode's percentile_disc computes them"""
+    boundaries = {column: np.quantile(frame[column].to_numpy(dtype=np.float64), SCORE_QUANTILES, method='inverted_cdf')
+                  for column in SCORED_COLUMNS}
+    return RFMAnalyzer(mode='full', scoring='quantile').score_customers(frame, boundaries)
+
+
+def compare(pandas_frame, sql_frame):
+    """Customers whose values differ between pandas aggregates (scored from exact quintile edges) and the SQL rows"""
+    expected = exact_scores(pandas_frame[['customer_id', 'recency', 'frequency', 'monetary']].astype({'customer_id': str}).copy())
+    expected = expected.set_index('customer_id')
+    actual = sql_frame.astype({'customer_id': str}).set_index('customer_id').reindex(expected.index)
+    differences = {"missing_customers": int(actual['frequency'].isna().sum())}
+    for column in ['recency', 'frequency', 'R_score', 'F_score', 'M_score', 'segment']:
+        differences[column] = int((expected[column].astype(str) != actual[column].astype(str)).sum())
+    differences['monetary'] = int((~np.isclose(expected['monetary'], actual['monetary'].astype(float), rtol=1e-4)).sum())
+    return differences
+
+
+def tie_splits(sql_frame):
+    """Distinct values given more than one score; always 0 with tie-stable scoring"""
+    return {column: int((sql_frame.groupby(column)[score].nunique() > 1).sum())
+            for column, score in [('recency', 'R_score'), ('frequency', 'F_score'), ('monetary', 'M_score')]}
+
+
+def summarize(name, timings, rows):
+    row = {"variant": name, "min_seconds": round(min(timings), 4), "median_seconds": round(statistics.median(timings), 4),
+           "rows_transferred": int(rows)}
+    print(f"  {name:<12} {row['min_seconds']:>9.3f} {row['median_seconds']:>10.3f} {rows:>14,}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--reference-date', help='defaults to the day after the latest order')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    if db_manager.test_connection()["status"] != "Connected":
+        sys.exit("Database not reachable; this benchmark needs the order tables")
+
+    store = get_fact_store()
+    store.version_ttl = float('inf')
+    pandas_analyzer = RFMAnalyzer(mode='full')
+    sql_analyzer = RFMAnalyzer(mode='sql')
+
+    def pandas_cold():
+        store.refresh(db_manager.get_data_version())
+        return pandas_analyzer._compute_rfm_frame(reference_date)
+
+    store.refresh(db_manager.get_data_version())
+    snapshot = store.snapshot
+    if snapshot.empty:
+        sys.exit("No order lines in the database")
+    reference_date = pd.Timestamp(args.reference_date) if args.reference_date else (
+        pd.Timestamp(snapshot.order_date.max()) + pd.Timedelta(days=1))
+
+    print(f"{len(snapshot):,} order lines, reference date {reference_date.date()}")
+    print(f"  {'variant':<12} {'min s':>9} {'median s':>10} {'rows moved':>14}")
+    results = {"order_lines": int(len(snapshot)), "reference_date": str(reference_date.date()), "timings": []}
+
+    _, timings = timed(pandas_cold, args.repeat)
+    results["timings"].append(summarize('pandas', timings, len(store.snapshot)))
+    pandas_frame, timings = timed(lambda: pandas_analyzer._compute_rfm_frame(reference_date), args.repeat)
+    results["timings"].append(summarize('pandas_warm', timings, 0))
+    sql_frame, sql_timings = timed(lambda: sql_analyzer._sql_rfm_frame(reference_date), args.repeat)
+    results["timings"].append(summarize('sql', sql_timings, len(sql_frame)))
+    summary, timings = timed(lambda: sql_analyzer.rfm_summary(reference_date), args.repeat)
+    results["timings"].append(summarize('sql_summary', timings, len(summary["segment_summary"])))
+
+    results["customers"] = int(len(pandas_frame))
+    results["speedup"] = round(results["timings"][0]["min_seconds"] / min(sql_timings), 1)
+    results["differences"] = compare(pandas_frame, sql_frame)
+    results["tie_splits"] = tie_splits(sql_frame)
+    print(f"Speed-up of sql over cold pandas: {results['speedup']}x; customers differing per column: {results['differences']}; "
+          f"tie splits: {results['tie_splits']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
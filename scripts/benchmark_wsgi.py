@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Benchmark the gunicorn deployment: requests per second, latency and memory
+per worker for several worker x thread configurations, with and without
+preloading the app in the master.
+
+Each configuration starts `gunicorn -c gunicorn.conf.py wsgi:app` on a free
+port, waits for /healthz/ready, touches every path once, then drives the
+paths from --clients keep-alive connections for --duration seconds. Worker
+memory comes from /proc/<pid>/smaps_rollup: RSS counts shared pages in every
+worker, PSS splits them between the processes sharing them, so the gap
+between the two is what copy-on-write preloading saves. Linux only.
+
+Usage: python scripts/benchmark_wsgi.py [--configs 1x4,2x4,4x2] [--duration 15]
+       [--clients 16] [--paths /api/stats,/api/rfm-insights] [--no-preload-compare]
+       [--output data/benchmarks/wsgi.json]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+DEFAULT_PATHS = [
+    '/healthz',
+    '/api/stats',
+    '/api/top-products',
+    '/api/market-basket?min_support=0.01&min_confidence=0.3',
+    '/api/rfm-insights',
+    '/api/cohort-insights'
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(conn, path):
+    conn.request('GET', path)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def wait_ready(port, process, timeout):
+    """Poll /healthz/ready until it answers 200 (warm-up and preload can take minutes)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            if get(conn, '/healthz/ready') == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"server not ready after {timeout} s")
+
+
+def worker_pids(master_pid):
+    """Direct children of the gunicorn master (job pool processes are the workers' children)"""
+    pids = []
+    for task in os.listdir(f"/proc/{master_pid}/task"):
+        with open(f"/proc/{master_pid}/task/{task}/children") as f:
+            pids.extend(int(pid) for pid in f.read().split())
+    return pids
+
+
+def memory_mb(pid):
+    """RSS, PSS, private and shared resident memory of one process from smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        "rss": fields.get('Rss', 0) / 1024,
+        "pss": fields.get('Pss', 0) / 1024,
+        "private": (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024,
+        "shared": (fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024
+    }
+
+
+def drive(port, paths, clients, duration):
+    """Round-robin the paths from keep-alive clients; returns (latencies, status counts, wall seconds)"""
+    latencies = [[] for _ in range(clients)]
+    statuses = [{} for _ in range(clients)]
+    stop = threading.Event()
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        n = i
+        while not stop.is_set():
+            path = paths[n % len(paths)]
+            n += 1
+            start = time.perf_counter()
+            try:
+                status = get(conn, path)
+            except (OSError, http.client.HTTPException):
+                status = 'error'
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            latencies[i].append(time.perf_counter() - start)
+            statuses[i][status] = statuses[i].get(status, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    status_counts = {}
+    for counts in statuses:
+        for status, count in counts.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+    return [value for values in latencies for value in values], status_counts, wall
+
+
+def run_config(workers, threads, preload, args):
+    port = free_port()
+    env = dict(os.environ,
+               PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               GUNICORN_PRELOAD='true' if preload else 'false', GUNICORN_ACCESS_LOG='/dev/null',
+               GUNICORN_MAX_REQUESTS='0')  # no recycling mid-run, so memory reflects the measured workers
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    try:
+        started = time.perf_counter()
+        wait_ready(port, process, args.ready_timeout)
+        ready_seconds = time.perf_counter() - started
+
+        # Touch every path once per worker so lazy per-worker caches are built before measuring
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+        for _ in range(workers):
+            for path in args.paths:
+                get(conn, path)
+        conn.close()
+
+        latencies, statuses, wall = drive(port, args.paths, args.clients, args.duration)
+        memory = [memory_mb(pid) for pid in worker_pids(process.pid)]
+        master = memory_mb(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    latencies.sort()
+    result = {
+        "workers": workers,
+        "threads": threads,
+        "preload": preload,
+        "ready_seconds": round(ready_seconds, 1),
+        "requests": len(latencies),
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+        "statuses": statuses,
+        "master_rss_mb": round(master["rss"], 1),
+        "worker_rss_mb": round(statistics.mean(m["rss"] for m in memory), 1) if memory else None,
+        "worker_pss_mb": round(statistics.mean(m["pss"] for m in memory), 1) if memory else None,
+        "worker_private_mb": round(statistics.mean(m["private"] for m in memory), 1) if memory else None,
+        "worker_shared_mb": round(statistics.mean(m["shared"] for m in memory), 1) if memory else None,
+        "total_pss_mb": round(sum(m["pss"] for m in memory) + master["pss"], 1)
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configs', default='1x4,2x4,4x2', help='comma-separated WORKERSxTHREADS')
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--paths', default=','.join(DEFAULT_PATHS))
+    parser.add_argument('--no-preload-compare', action='store_true', help='only run with preload_app on')
+    parser.add_argument('--ready-timeout', type=float, default=900)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--verbose', action='store_true', help='show gunicorn logs')
+    args = parser.parse_args()
+    args.paths = [path for path in args.paths.split(',') if path]
+
+    configs = [tuple(int(n) for n in config.split('x')) for config in args.configs.split(',')]
+    results = []
+    header = f"{'workers':>7} {'threads':>7} {'preload':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} " \
+             f"{'RSS/wkr':>8} {'PSS/wkr':>8} {'shared':>8} {'total PSS':>9}  statuses"
+    print(header)
+    for workers, threads in configs:
+        for preload in ([True] if args.no_preload_compare else [True, False]):
+            r = run_config(workers, threads, preload, args)
+            results.append(r)
+            print(f"{r['workers']:>7} {r['threads']:>7} {str(r['preload']):>7} {r['rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+                  f"{r['worker_rss_mb']:>8} {r['worker_pss_mb']:>8} {r['worker_shared_mb']:>8} {r['total_pss_mb']:>9}  {r['statuses']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({"paths": args.paths, "clients": args.clients, "duration": args.duration, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Build the precomputed artifacts served by standalone_demo.py (and readable by
+anything using database/artifact_store.py).
+
+Two sources:
+  --source results  (default, no database) the analysis outputs shipped in the
+                    repo: data/results/association_rules.csv and
+                    frequent_item_sets.csv become the rules and itemsets
+                    artifacts, and data/results/customer_segmentation.csv becomes
+                    the segments artifact. These files have no order dates or
+                    amounts, so stats, RFM, cohorts and forecasts are not built
+                    from them.
+  --source db       the live analyzers run against the database: rules, itemsets,
+                    RFM, cohorts, segments, forecasts (1/3/6 months), overall
+                    stats, top products, sales trends and each customer's
+                    products (for recommendations).
+
+Artifacts are written to --out (default data/artifacts), one directory each,
+swapped in atomically, so a running demo never reads a half-written build.
+
+Usage: python scripts/build_artifacts.py [--source results|db] [--out data/artifacts]
+       [--min-support 0.001] [--min-confidence 0.1]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'app'))
+
+import pandas as pd
+
+from database.artifact_store import write_artifact
+from utils.json_provider import dumps
+
+RESULTS_DIR = os.path.join(ROOT, 'data', 'results')
+FORECAST_MONTHS = (1, 3, 6)
+
+
+def build_from_results(out):
+    rules = pd.read_csv(os.path.join(RESULTS_DIR, 'association_rules.csv')).drop_duplicates()
+    total = int(rules['total_count'].iloc[0]) if len(rules) else 0
+    rule_rows = [
+        {"antecedents": [a], "consequents": [c], "support": float(s), "confidence": float(conf), "lift": float(lift)}
+        for a, c, s, conf, lift in zip(rules['item1'], rules['item2'], rules['support'],
+                                       rules['confidence_item1_to_item2'], rules['lift'])
+    ]
+    yield write_artifact(out, 'rules', {
+        "association_rules": rule_rows,
+        "summary": {"total_transactions": total, "association_rules_count": len(rule_rows)}
+    }, 'association_rules', sort_by=['antecedents', '-confidence'], source='results')
+
+    itemsets = pd.read_csv(os.path.join(RESULTS_DIR, 'frequent_item_sets.csv'))
+    itemsets = itemsets.groupby(['item1_name', 'item2_name'], as_index=False)['pair_count'].sum()
+    # Both orderings of each pair are listed; keep one
+    itemsets = itemsets[itemsets['item1_name'] <= itemsets['item2_name']]
+    itemset_rows = [
+        {"support": count / total if total else 0.0, "itemsets": [a, b]}
+        for a, b, count in zip(itemsets['item1_name'], itemsets['item2_name'], itemsets['pair_count'])
+    ]
+    yield write_artifact(out, 'itemsets', {"frequent_itemsets": itemset_rows}, 'frequent_itemsets',
+                         sort_by=['-support'], source='results')
+
+    segments = pd.read_csv(os.path.join(RESULTS_DIR, 'customer_segmentation.csv'), dtype={'ship_postal_code': str})
+    segments['customer_id'] = segments['ship_postal_code'].fillna('unknown').str.replace(r'\.0$', '', regex=True)
+    profiles = segments.groupby('customer_segment')['orders_count'].agg(['size', 'mean', 'sum'])
+    yield write_artifact(out, 'segments', {
+        "customers": [
+            {"customer_id": customer, "total_orders": int(orders), "segment": segment}
+            for customer, orders, segment in zip(segments['customer_id'], segments['orders_count'], segments['customer_segment'])
+        ],
+        "cluster_profiles": {
+            segment: {"size": int(row['size']), "avg_total_orders": round(float(row['mean']), 2),
+                      "total_orders": int(row['sum']), "characteristics": segment}
+            for segment, row in profiles.iterrows()
+        },
+        "summary": {"total_customers": int(len(segments)), "clusters": int(len(profiles))}
+    }, 'customers', sort_by=['customer_id'], source='results')
+
+
+def raise_on_error(result, what):
+    if isinstance(result, dict) and 'error' in result:
+        raise RuntimeError(f"{what}: {result['error']}")
+    return result
+
+
+def json_safe(result, what):
+    """Analyzer output as plain JSON values (NumPy scalars, timestamps and NaN converted the way the API does)"""
+    return json.loads(dumps(raise_on_error(result, what)))
+
+
+def build_from_db(out, min_support, min_confidence):
+    from database.db_manager import DatabaseManager
+    from database.fact_store import get_fact_store
+    from models.registry import model_registry
+
+    db_manager = DatabaseManager()
+    if db_manager.test_connection()["status"] != "Connected":
+        raise RuntimeError("Database is not reachable; check the DB_* settings")
+    snapshot = get_fact_store().snapshot
+    if snapshot.empty:
+        raise RuntimeError("Fact store is empty; is the database reachable?")
+    source = f"db:{snapshot.version}"
+
+    analysis = json_safe(model_registry.get('market_basket').analyze(min_support, min_confidence), 'market basket')
+    yield write_artifact(out, 'itemsets', {"frequent_itemsets": analysis.pop('frequent_itemsets')},
+                         'frequent_itemsets', sort_by=['-support'], source=source)
+    yield write_artifact(out, 'rules', analysis, 'association_rules', sort_by=['antecedents', '-confidence'], source=source)
+
+    store = get_fact_store()
+    purchases = store.frame(['customer_id', 'product_name'], snapshot=snapshot).dropna().drop_duplicates()
+    yield write_artifact(out, 'customer_products', {"customer_products": [
+        {"customer_id": customer, "product_name": product}
+        for customer, product in zip(purchases['customer_id'].astype(str), purchases['product_name'].astype(str))
+    ]}, 'customer_products', sort_by=['customer_id'], source=source)
+
+    rfm = json_safe(model_registry.get('rfm').calculate_rfm(), 'RFM')
+    yield write_artifact(out, 'rfm', rfm, 'rfm_data', sort_by=['customer_id'], source=source)
+
+    segments = json_safe(model_registry.get('customer_segments').get_segments(), 'segments')
+    yield write_artifact(out, 'segments', segments, 'customers', sort_by=['customer_id'], source=source)
+
+    cohort_analyzer = model_registry.get('cohort')
+    yield write_artifact(out, 'cohorts', json_safe(cohort_analyzer.calculate_cohort_analysis('month'), 'cohorts'),
+                         source=source)
+
+    predictor = model_registry.get('sales_forecast')
+    yield write_artifact(out, 'forecast', {
+        str(months): json_safe(predictor.predict_sales(months * 30), 'forecast') for months in FORECAST_MONTHS
+    }, source=source)
+
+    yield write_artifact(out, 'stats', json_safe(db_manager.get_overall_stats(), 'stats'), source=source)
+    yield write_artifact(out, 'top_products', {"products": json_safe(db_manager.get_top_products(100), 'top products')},
+                         'products', source=source)
+    yield write_artifact(out, 'sales_trends', {"trends": json_safe(db_manager.get_sales_trends(), 'sales trends')},
+                         'trends', source=source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', choices=['results', 'db'], default='results')
+    parser.add_argument('--out', default=os.path.join(ROOT, 'data', 'artifacts'))
+    parser.add_argument('--min-support', type=float, default=0.001,
+                        help='db source: mining threshold (the demo filters higher thresholds from these rules)')
+    parser.add_argument('--min-confidence', type=float, default=0.1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.source == 'results':
+        built = build_from_results(args.out)
+    else:
+        built = build_from_db(args.out, args.min_support, args.min_confidence)
+    try:
+        for path in built:
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            print(f"  {os.path.basename(path):<18} {size / 1024:>9.1f} KB")
+    except (OSError, RuntimeError) as e:
+        sys.exit(f"Build failed: {e}")
+    print(f"Built {args.source} artifacts in {args.out} ({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+-- Tables and triggers behind RFM_MODE=incremental (app/database/rfm_state.py).
+-- Run once, and again after upgrading: python scripts/setup_rfm_state.py
+-- New order lines are queued by a trigger; any other change to the source tables
+-- flags the state for a rebuild. Every statement is safe to re-run.
+
+CREATE SEQUENCE IF NOT EXISTS customer_rfm_state_revision;
+CREATE TABLE IF NOT EXISTS customer_rfm_state (
+    customer_id VARCHAR(50) PRIMARY KEY,
+    last_order_date DATE NOT NULL,
+    frequency BIGINT NOT NULL,
+    monetary DOUBLE PRECISION NOT NULL,
+    revision BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_customer_rfm_state_revision ON customer_rfm_state (revision);
+CREATE TABLE IF NOT EXISTS customer_rfm_state_queue (
+    id BIGSERIAL PRIMARY KEY,
+    order_id VARCHAR(50) NOT NULL,
+    sku VARCHAR(50) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customer_rfm_state_meta (
+    singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    needs_rebuild BOOLEAN NOT NULL DEFAULT TRUE,
+    checked_at TIMESTAMP,
+    generation BIGINT NOT NULL DEFAULT 0
+);
+-- Meta tables created before rebuilds were counted
+ALTER TABLE customer_rfm_state_meta ADD COLUMN IF NOT EXISTS generation BIGINT NOT NULL DEFAULT 0;
+INSERT INTO customer_rfm_state_meta (singleton) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION customer_rfm_state_enqueue() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO customer_rfm_state_queue (order_id, sku) VALUES (NEW.order_id, NEW.sku);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION customer_rfm_state_invalidate() RETURNS trigger AS $$
+BEGIN
+    UPDATE customer_rfm_state_meta SET needs_rebuild = TRUE;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS customer_rfm_state_enqueue ON amazon_order_items;
+CREATE TRIGGER customer_rfm_state_enqueue AFTER INSERT ON amazon_order_items
+    FOR EACH ROW EXECUTE FUNCTION customer_rfm_state_enqueue();
+DROP TRIGGER IF EXISTS customer_rfm_state_items_changed ON amazon_order_items;
+CREATE TRIGGER customer_rfm_state_items_changed AFTER UPDATE OR DELETE OR TRUNCATE ON amazon_order_items
+    FOR EACH STATEMENT EXECUTE FUNCTION customer_rfm_state_invalidate();
+DROP TRIGGER IF EXISTS customer_rfm_state_orders_changed ON amazon_orders;
+CREATE TRIGGER customer_rfm_state_orders_changed AFTER UPDATE OF date, ship_postal_code OR DELETE OR TRUNCATE ON amazon_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION customer_rfm_state_invalidate();
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic data in the scripts/create_tables.sql layout
+(amazon_products, amazon_orders, amazon_order_items) at any scale, for
+sizing the analyzers beyond the ~120K orders of the real dataset.
+
+The shape follows the real data: most baskets hold one item with a long
+tail, style popularity is Zipf-skewed, sizes cluster around M-XL, a few
+customers (postal codes) place many orders, new customers arrive faster
+over time, and multi-item baskets favour companion styles so Apriori finds
+real rules. The same --seed always yields identical tables.
+
+Usage: python scripts/generate_synthetic_data.py --orders 1000000 [--seed 42]
+       [--products 2000] [--orders-per-customer 4] [--days 365]
+       [--out data/synthetic/1000000]
+Load the CSVs with the \\copy commands it prints (same columns as import_data.sql).
+
+As a module: generate(n_orders, seed).fact_frame() returns the FACT_QUERY
+frame that FactStore.load_frame accepts, without going through CSV.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ['Set', 'Kurta', 'Western Dress', 'Top', 'Ethnic Dress', 'Blouse', 'Bottom', 'Saree', 'Dupatta']
+# Roughly the category mix of the real order items
+CATEGORY_WEIGHTS = [0.39, 0.38, 0.12, 0.08, 0.012, 0.006, 0.006, 0.003, 0.003]
+CATEGORY_PREFIXES = ['SET', 'JNE', 'J', 'BL', 'JNE', 'BL', 'BTM', 'SAR', 'DPT']
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL', '3XL']
+SIZE_WEIGHTS = [0.08, 0.14, 0.2, 0.2, 0.18, 0.13, 0.07]
+
+STATES = {
+    'MAHARASHTRA': ('MUMBAI', 0.17), 'KARNATAKA': ('BENGALURU', 0.13), 'TELANGANA': ('HYDERABAD', 0.09),
+    'UTTAR PRADESH': ('LUCKNOW', 0.08), 'TAMIL NADU': ('CHENNAI', 0.09), 'DELHI': ('NEW DELHI', 0.07),
+    'KERALA': ('KOCHI', 0.05), 'WEST BENGAL': ('KOLKATA', 0.05), 'ANDHRA PRADESH': ('VISAKHAPATNAM', 0.04),
+    'GUJARAT': ('AHMEDABAD', 0.04), 'HARYANA': ('GURUGRAM', 0.04), 'RAJASTHAN': ('JAIPUR', 0.03),
+    'MADHYA PRADESH': ('BHOPAL', 0.03), 'ODISHA': ('BHUBANESWAR', 0.02), 'PUNJAB': ('LUDHIANA', 0.02),
+    'BIHAR': ('PATNA', 0.02), 'ASSAM': ('GUWAHATI', 0.01), 'GOA': ('PANAJI', 0.01)
+}
+
+STATUSES = ['Shipped', 'Shipped - Delivered to Buyer', 'Cancelled', 'Pending']
+STATUS_WEIGHTS = [0.61, 0.24, 0.14, 0.01]
+
+PRODUCT_COLUMNS = ['sku', 'style', 'category', 'size', 'asin', 'product_name']
+ORDER_COLUMNS = ['order_id', 'date', 'status', 'fulfillment', 'sales_channel', 'ship_service_level',
+                 'courier_status', 'currency', 'amount', 'ship_city', 'ship_state', 'ship_postal_code',
+                 'ship_country', 'promotion_ids', 'b2b', 'fulfilled_by']
+ORDER_ITEM_COLUMNS = ['order_id', 'sku', 'style', 'category', 'size', 'asin', 'qty', 'amount']
+
+START_DATE = np.datetime64('2022-01-01')
+
+
+def _normalized(weights):
+    weights = np.asarray(weights, dtype=float)
+    return weights / weights.sum()
+
+
+class SyntheticData:
+    """Generated tables kept as integer codes; frames are built on demand, whole or in order ranges"""
+
+    def __init__(self, products, orders, items, n_customers):
+        self.products = products
+        self.n_customers = n_customers
+        self.orders = orders
+        self.items = items
+
+    @property
+    def n_orders(self):
+        return len(self.orders['day'])
+
+    @property
+    def n_items(self):
+        return len(self.items['order'])
+
+    @staticmethod
+    def order_ids(order_index):
+        return np.char.add('SYN-', np.char.zfill(np.asarray(order_index).astype(str), 9))
+
+    def products_frame(self):
+        return pd.DataFrame({column: self.products[column] for column in PRODUCT_COLUMNS})
+
+    def orders_frame(self, start=0, stop=None):
+        o = self.orders
+        index = np.arange(start, self.n_orders if stop is None else stop)
+        states = np.array(list(STATES))
+        cities = np.array([city for city, _ in STATES.values()])
+        amazon = o['amazon_fulfilled'][index]
+        status = np.array(STATUSES)[o['status'][index]]
+        return pd.DataFrame({
+            'order_id': self.order_ids(index),
+            'date': (START_DATE + o['day'][index]).astype('datetime64[D]'),
+            'status': status,
+            'fulfillment': np.where(amazon, 'Amazon', 'Merchant'),
+            'sales_channel': np.where(o['non_amazon'][index], 'Non-Amazon', 'Amazon.in'),
+            'ship_service_level': np.where(amazon, 'Expedited', 'Standard'),
+            'courier_status': np.where(status == 'Cancelled', 'Cancelled', 'Shipped'),
+            'currency': 'INR',
+            'amount': o['amount'][index],
+            'ship_city': cities[o['state'][index]],
+            'ship_state': states[o['state'][index]],
+            'ship_postal_code': o['postal_code'][index].astype(str),
+            'ship_country': 'IN',
+            'promotion_ids': np.where(o['promotion'][index], 'Amazon PLCC Free-Financing Universal Merchant', ''),
+            'b2b': o['b2b'][index],
+            'fulfilled_by': np.where(amazon, '', 'Easy Ship')
+        })
+
+    def order_items_frame(self, start=0, stop=None):
+        lo, hi = self._item_range(start, stop)
+        product = self.items['product'][lo:hi]
+        p = self.products
+        return pd.DataFrame({
+            'order_id': self.order_ids(self.items['order'][lo:hi]),
+            'sku': p['sku'][product],
+            'style': p['style'][product],
+            'category': p['category'][product],
+            'size': p['size'][product],
+            'asin': p['asin'][product],
+            'qty': self.items['qty'][lo:hi],
+            'amount': self.items['amount'][lo:hi]
+        })
+
+    def fact_frame(self):
+        """Order lines in FACT_QUERY layout; string columns are categoricals, so no per-row Python strings"""
+        order = self.items['order']
+        product = self.items['product']
+        o, p = self.orders, self.products
+
+        def categorical(codes, categories):
+            return pd.Categorical.from_codes(codes, categories=pd.Index(categories))
+
+        return pd.DataFrame({
+            'order_id': categorical(order, self.order_ids(np.arange(self.n_orders))),
+            'order_date': (START_DATE + o['day'][order]).astype('datetime64[D]'),
+            'customer_id': categorical(o['customer'][order], (100000 + np.arange(self.n_customers)).astype(str)),
+            'ship_state': categorical(o['state'][order], list(STATES)),
+            'sales_channel': categorical(o['non_amazon'][order].astype(np.int8), ['Amazon.in', 'Non-Amazon']),
+            'sku': categorical(product, p['sku']),
+            'category': categorical(p['category_code'][product], CATEGORIES),
+            'product_name': categorical(product, p['product_name']),
+            'qty': self.items['qty'],
+            'amount': self.items['amount']
+        })
+
+    def _item_range(self, start, stop):
+        stop = self.n_orders if stop is None else stop
+        return np.searchsorted(self.items['order'], [start, stop])
+
+
+def generate_products(n_products, rng):
+    n_styles = max(1, -(-n_products // len(SIZES)))
+    style_category = rng.choice(len(CATEGORIES), n_styles, p=_normalized(CATEGORY_WEIGHTS))
+    prefixes = np.array(CATEGORY_PREFIXES)[style_category]
+    styles = np.char.add(prefixes, (3000 + np.arange(n_styles)).astype(str))
+    style_price = np.round(np.exp(rng.normal(6.4, 0.35, n_styles)), -1)
+
+    style = np.repeat(np.arange(n_styles), len(SIZES))[:n_products]
+    size = np.tile(np.arange(len(SIZES)), n_styles)[:n_products]
+    size_names = np.array(SIZES)[size]
+    category = style_category[style]
+    category_names = np.array(CATEGORIES)[category]
+    return {
+        'sku': np.char.add(np.char.add(styles[style], '-'), size_names),
+        'style': styles[style],
+        'category': category_names,
+        'category_code': category,
+        'size': size_names,
+        'size_code': size,
+        'style_code': style,
+        'asin': np.char.add('B0', np.char.zfill(np.arange(n_products).astype(str), 8)),
+        'product_name': np.char.add(np.char.add(category_names, ' '), np.char.add(np.char.add(styles[style], ' '), size_names)),
+        'price': style_price[style].astype(np.float32)
+    }
+
+
+def generate(n_orders, seed=42, n_products=2000, orders_per_customer=4.0, days=365,
+             max_basket=12, companion_affinity=0.6):
+    """Generate the three tables; identical arguments give identical data"""
+    rng = np.random.default_rng(seed)
+    products = generate_products(n_products, rng)
+    n_products = len(products['sku'])
+    n_styles = int(products['style_code'].max()) + 1
+
+    # Zipf-skewed style popularity (shuffled so popularity is unrelated to style number) times size preference
+    style_popularity = 1.0 / np.arange(1, n_styles + 1) ** 1.1
+    rng.shuffle(style_popularity)
+    product_popularity = _normalized(style_popularity[products['style_code']] * np.array(SIZE_WEIGHTS)[products['size_code']])
+    # Each style has a few companion styles that tend to be bought with it
+    companions = rng.integers(0, n_styles, (n_styles, 3))
+
+    # Customers: heavy-tailed activity, arrivals skewed towards later dates, a fixed home state
+    n_customers = max(1, int(n_orders / orders_per_customer))
+    activity = _normalized(rng.pareto(1.5, n_customers) + 1)
+    joined = (days * rng.random(n_customers) ** 0.7).astype(np.int32)
+    customer_state = rng.choice(len(STATES), n_customers, p=_normalized([w for _, w in STATES.values()]))
+
+    customer = rng.choice(n_customers, n_orders, p=activity).astype(np.int32)
+    day = (joined[customer] + (days - joined[customer]) * rng.random(n_orders)).astype(np.int32)
+    # Order numbers follow date order
+    by_date = np.argsort(day, kind='stable')
+    customer, day = customer[by_date], day[by_date]
+
+    # Basket sizes: mostly single items with a geometric tail
+    basket = np.minimum(rng.geometric(0.7, n_orders), max_basket)
+    line_order = np.repeat(np.arange(n_orders, dtype=np.int64), basket)
+    first_line = np.repeat(np.cumsum(basket) - basket, basket)
+    is_first = np.arange(len(line_order)) == first_line
+
+    product = rng.choice(n_products, len(line_order), p=product_popularity)
+    anchor = product[first_line]
+    companion_style = companions[products['style_code'][anchor], rng.integers(0, 3, len(line_order))]
+    companion_product = np.minimum(companion_style * len(SIZES) + products['size_code'][anchor], n_products - 1)
+    use_companion = ~is_first & (rng.random(len(line_order)) < companion_affinity)
+    product = np.where(use_companion, companion_product, product)
+
+    # (order_id, sku) is the order item primary key: collapse repeats within a basket
+    keys = np.unique(line_order * n_products + product)
+    line_order = (keys // n_products).astype(np.int64)
+    product = (keys % n_products).astype(np.int32)
+
+    n_lines = len(line_order)
+    qty = rng.choice([1, 2, 3], n_lines, p=[0.93, 0.05, 0.02]).astype(np.int16)
+    discount = rng.choice([1.0, 0.9, 0.8], n_lines, p=[0.7, 0.2, 0.1])
+    amount = np.round(products['price'][product] * qty * discount, 2).astype(np.float32)
+    order_amount = np.bincount(line_order, weights=amount, minlength=n_orders).astype(np.float32)
+
+    orders = {
+        'customer': customer,
+        'postal_code': (100000 + customer).astype(np.int64),
+        'day': day.astype(np.int16 if days < 32768 else np.int32),
+        'state': customer_state[customer].astype(np.int8),
+        'status': rng.choice(len(STATUSES), n_orders, p=STATUS_WEIGHTS).astype(np.int8),
+        'amazon_fulfilled': rng.random(n_orders) < 0.7,
+        'non_amazon': rng.random(n_orders) < 0.001,
+        'promotion': rng.random(n_orders) < 0.4,
+        'b2b': rng.random(n_orders) < 0.007,
+        'amount': order_amount
+    }
+    items = {'order': line_order, 'product': product, 'qty': qty, 'amount': amount}
+    return SyntheticData(products, orders, items, n_customers)
+
+
+def write_csv(data, out_dir, chunk_orders=500000):
+    """Write the three tables as CSV in import_data.sql column order, streaming in order ranges"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, f"{name}.csv") for name in ('amazon_products', 'amazon_orders', 'amazon_order_items')}
+    data.products_frame().to_csv(paths['amazon_products'], index=False)
+    for name, build, columns in (('amazon_orders', data.orders_frame, ORDER_COLUMNS),
+                                 ('amazon_order_items', data.order_items_frame, ORDER_ITEM_COLUMNS)):
+        for start in range(0, data.n_orders, chunk_orders):
+            build(start, min(start + chunk_orders, data.n_orders))[columns].to_csv(
+                paths[name], index=False, mode='w' if start == 0 else 'a', header=start == 0
+            )
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, required=True)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--orders-per-customer', type=float, default=4.0)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--out', help='output directory (default data/synthetic/<orders>)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = generate(args.orders, args.seed, args.products, args.orders_per_customer, args.days)
+    generated = time.perf_counter() - start
+    out_dir = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'synthetic', str(args.orders))
+    paths = write_csv(data, out_dir)
+
+    print(f"{data.n_orders:,} orders, {data.n_items:,} order items, {len(data.products['sku']):,} products "
+          f"(generated in {generated:.1f} s, written in {time.perf_counter() - start - generated:.1f} s)")
+    print("Load with psql (after scripts/create_tables.sql):")
+    for name, columns in (('amazon_products', PRODUCT_COLUMNS), ('amazon_orders', ORDER_COLUMNS),
+                          ('amazon_order_items', ORDER_ITEM_COLUMNS)):
+        print(f"  \\copy {name}({', '.join(columns)}) FROM '{os.path.abspath(paths[name])}' DELIMITER ',' CSV HEADER;")
+
+
+if __name__ == '__main__':
+    main()
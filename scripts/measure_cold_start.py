@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Measure cold start of the Flask app: `python -X importtime` for `import app`
+and time-to-first-response in a fresh interpreter.
+
+Each measurement runs twice: "lazy" (models built on first use, the default)
+and "eager" (every model constructed right after import, as app.py used to do).
+
+Usage: python scripts/measure_cold_start.py [--runs 3] [--url /]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+FIRST_RESPONSE = """
+import time
+start = time.perf_counter()
+import app
+if {eager}:
+    app.model_registry.load_all()
+imported = time.perf_counter()
+response = app.app.test_client().get({url!r})
+response.get_data()
+done = time.perf_counter()
+print(f"{{(imported - start) * 1000:.1f}} {{(done - start) * 1000:.1f}} {{response.status_code}}")
+app.job_queue.shutdown()
+"""
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_python(args):
+    return subprocess.run([sys.executable] + args, cwd=APP_DIR, capture_output=True, text=True)
+
+
+def importtime(eager):
+    """Cumulative import time (ms) of app and of its heaviest direct imports"""
+    code = 'import app' + ('; app.model_registry.load_all(); app.job_queue.shutdown()' if eager else '; app.job_queue.shutdown()')
+    result = run_python(['-X', 'importtime', '-c', code])
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            depth = len(match.group(3)) // 2
+            modules.setdefault(match.group(4), (int(match.group(2)) / 1000, depth))
+    total = sum(ms for ms, depth in modules.values() if depth == 0)
+    heaviest = sorted(((ms, name) for name, (ms, depth) in modules.items() if depth <= 1), reverse=True)[:8]
+    return total, heaviest
+
+
+def first_response(eager, url):
+    """(import ms, first response ms, status) measured inside a fresh interpreter"""
+    result = run_python(['-c', FIRST_RESPONSE.format(eager=eager, url=url)])
+    lines = [line for line in result.stdout.splitlines() if re.match(r'^[\d.]+ [\d.]+ \d+$', line)]
+    if not lines:
+        raise RuntimeError(result.stderr[-2000:])
+    imported, done, status = lines[-1].split()
+    return float(imported), float(done), int(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--url', default='/')
+    args = parser.parse_args()
+
+    for mode, eager in (('eager', True), ('lazy', False)):
+        total, heaviest = importtime(eager)
+        print(f"[{mode}] -X importtime total: {total:.0f} ms")
+        for ms, name in heaviest:
+            print(f"    {ms:>9.1f} ms  {name}")
+
+        imports, responses = [], []
+        for _ in range(args.runs):
+            imported, done, status = first_response(eager, args.url)
+            imports.append(imported)
+            responses.append(done)
+        print(f"[{mode}] import {statistics.median(imports):.0f} ms, first response to {args.url} "
+              f"{statistics.median(responses):.0f} ms (status {status}, median of {args.runs})")
+        print()
+
+
+if __name__ == '__main__':
+    main()
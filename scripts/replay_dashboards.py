@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Load test that replays the dashboards' own fetch sequences.
+
+Each virtual user loops over a weighted mix of scenarios taken from the
+templates:
+  dashboard_fixed.load      /api/stats, then the six chart fetches in parallel
+                            (loadDashboardData with the default filters)
+  dashboard_fixed.slider    min-support / min-confidence input sweeps; every
+                            settled value reloads the whole dashboard, and steps
+                            closer together than the 300 ms debounce collapse
+                            into the last one, as in updateAnalysis()
+  advanced_dashboard.load   /api/executive-summary, then RFM, cohorts, rules and
+                            forecast in parallel (the 2 s retry fires when the
+                            summary has no revenue_metrics)
+  advanced_dashboard.refresh  the sequential refreshDashboard() chain
+
+Fetches within a page run in parallel on up to 6 connections, like a browser.
+
+Target: --url of a running server (e.g. gunicorn), or by default the app
+served in-process on a threaded WSGI server. --seed-db first loads synthetic
+data (scripts/generate_synthetic_data.py) into the database named by the DB_*
+settings, which should be an empty stand-in database. It refuses to write to one
+that already has orders. Without a reachable database the in-process app gets
+the synthetic data in its fact store only, so database-only and job-backed
+endpoints show up as errors.
+
+Reports p50/p95/p99, throughput and error and shed (503) rates per endpoint
+and per scenario. Results are saved as JSON (default data/load_tests/). Pass
+--compare to diff against a saved run; with --max-regression, the script exits
+non-zero when any endpoint's p95 or the overall throughput regresses by more than that percentage.
+
+Usage: python scripts/replay_dashboards.py [--users 8] [--duration 60]
+       [--mix dashboard_fixed.load=4,dashboard_fixed.slider=1,advanced_dashboard.load=2,advanced_dashboard.refresh=1]
+       [--url http://127.0.0.1:5000] [--seed-db] [--orders 100000] [--seed 42]
+       [--label baseline] [--output PATH] [--compare PATH] [--max-regression 20]
+"""
+
+import argparse
+import gzip
+import http.client
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(SCRIPTS_DIR, '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+from generate_synthetic_data import ORDER_COLUMNS, ORDER_ITEM_COLUMNS, PRODUCT_COLUMNS, generate
+
+DEBOUNCE_MS = 300
+BROWSER_CONNECTIONS = 6
+
+# dashboard_fixed.html input ranges: min-support step 0.01, min-confidence step 0.1
+SUPPORT_SWEEP = ['0.01', '0.02', '0.03', '0.04', '0.05', '0.04', '0.03', '0.02', '0.01']
+CONFIDENCE_SWEEP = ['0.3', '0.4', '0.5', '0.6', '0.5', '0.4', '0.3', '0.2', '0.1', '0.2', '0.3']
+
+
+def dashboard_fixed_requests(min_support='0.01', min_confidence='0.3', forecast_period='3'):
+    """loadDashboardData(): stats first, then Promise.all over the chart loaders"""
+    filters = f"min_support={min_support}&min_confidence={min_confidence}"
+    return [
+        ['/api/stats'],
+        [
+            '/api/sales-trends',
+            '/api/top-products',
+            f"/api/market-basket?{filters}",
+            '/api/customer-segments',
+            f"/api/sales-forecast?months={forecast_period}",
+            '/api/top-products'
+        ]
+    ]
+
+
+ADVANCED_LOAD = [
+    ['/api/executive-summary'],
+    ['/api/rfm-analysis', '/api/cohort-analysis', '/api/market-basket?min_support=0.01&min_confidence=0.3',
+     '/api/sales-forecast?months=6']
+]
+
+ADVANCED_REFRESH = [
+    ['/api/executive-summary'], ['/api/rfm-analysis'], ['/api/cohort-analysis'],
+    ['/api/market-basket?min_support=0.01&min_confidence=0.3'], ['/api/sales-forecast?months=6']
+]
+
+
+class Recorder:
+    """Thread-safe latency and status samples keyed by endpoint and by scenario"""
+
+    def __init__(self):
+        self.requests = {}
+        self.scenarios = {}
+        self._lock = threading.Lock()
+
+    def record_request(self, endpoint, seconds, outcome):
+        with self._lock:
+            entry = self.requests.setdefault(endpoint, {"latencies": [], "outcomes": {}})
+            entry["latencies"].append(seconds)
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+
+    def record_scenario(self, name, seconds):
+        with self._lock:
+            self.scenarios.setdefault(name, []).append(seconds)
+
+
+class Browser:
+    """One virtual user: keep-alive connections and a small pool for a page's parallel fetches"""
+
+    def __init__(self, host, port, recorder, timeout):
+        self.host = host
+        self.port = port
+        self.recorder = recorder
+        self.timeout = timeout
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(BROWSER_CONNECTIONS)
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def fetch(self, path):
+        """GET path; returns the decoded JSON body (or None) and records the outcome"""
+        start = time.perf_counter()
+        body = None
+        try:
+            conn = self._connection()
+            conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = conn.getresponse()
+            raw = response.read()
+            status = response.status
+            if status == 200 and response.getheader('Content-Type', '').startswith('application/json'):
+                if response.getheader('Content-Encoding') == 'gzip':
+                    raw = gzip.decompress(raw)
+                body = json.loads(raw)
+            outcome = self._outcome(status, body)
+        except (OSError, http.client.HTTPException, ValueError):
+            self.local.conn = None
+            outcome = 'error'
+        self.recorder.record_request(urlsplit(path).path, time.perf_counter() - start, outcome)
+        return body
+
+    @staticmethod
+    def _outcome(status, body):
+        if status == 503:
+            return 'shed'
+        if status == 202:
+            return 'deferred'  # job still running; the dashboards do not poll, so this is what the user sees
+        if status >= 400 or (isinstance(body, dict) and 'error' in body):
+            return 'error'
+        return 'ok'
+
+    def load_page(self, batches):
+        """Run batches in order; the fetches inside a batch run in parallel. Returns the bodies"""
+        bodies = {}
+        for batch in batches:
+            for path, body in zip(batch, self.pool.map(self.fetch, batch)):
+                bodies[path] = body
+        return bodies
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def scenario_dashboard_fixed_load(browser, rng, args):
+    browser.load_page(dashboard_fixed_requests())
+
+
+def scenario_dashboard_fixed_slider(browser, rng, args):
+    sweep, field = (SUPPORT_SWEEP, 'min_support') if rng.random() < 0.5 else (CONFIDENCE_SWEEP, 'min_confidence')
+    if args.step_interval_ms < DEBOUNCE_MS:
+        # Every step lands inside the debounce window of the next one, so only the final value fires
+        sweep = sweep[-1:]
+    for i, value in enumerate(sweep):
+        if i:
+            time.sleep(args.step_interval_ms / 1000.0)
+        params = {'min_support': '0.01', 'min_confidence': '0.3', field: value}
+        browser.load_page(dashboard_fixed_requests(params['min_support'], params['min_confidence']))
+
+
+def scenario_advanced_dashboard_load(browser, rng, args):
+    bodies = browser.load_page(ADVANCED_LOAD)
+    summary = bodies.get('/api/executive-summary')
+    if not isinstance(summary, dict) or not summary.get('revenue_metrics'):
+        time.sleep(2)
+        browser.fetch('/api/executive-summary')
+
+
+def scenario_advanced_dashboard_refresh(browser, rng, args):
+    browser.load_page(ADVANCED_REFRESH)
+
+
+SCENARIOS = {
+    'dashboard_fixed.load': scenario_dashboard_fixed_load,
+    'dashboard_fixed.slider': scenario_dashboard_fixed_slider,
+    'advanced_dashboard.load': scenario_advanced_dashboard_load,
+    'advanced_dashboard.refresh': scenario_advanced_dashboard_refresh
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, wall, outcomes=None):
+    values = sorted(latencies)
+    summary = {
+        "count": len(values),
+        "per_second": round(len(values) / wall, 2),
+        "p50_ms": None if not values else round(percentile(values, 0.50) * 1000, 1),
+        "p95_ms": None if not values else round(percentile(values, 0.95) * 1000, 1),
+        "p99_ms": None if not values else round(percentile(values, 0.99) * 1000, 1)
+    }
+    if outcomes is not None:
+        total = max(sum(outcomes.values()), 1)
+        summary["outcomes"] = dict(sorted(outcomes.items()))
+        summary["error_rate"] = round(outcomes.get('error', 0) / total, 4)
+        summary["shed_rate"] = round(outcomes.get('shed', 0) / total, 4)
+    return summary
+
+
+def run_load(host, port, args, mix):
+    recorder = Recorder()
+    stop = threading.Event()
+    names, weights = zip(*mix.items())
+
+    def user(i):
+        rng = random.Random(args.seed * 1000 + i)
+        browser = Browser(host, port, recorder, args.timeout)
+        try:
+            while not stop.is_set():
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                SCENARIOS[name](browser, rng, args)
+                recorder.record_scenario(name, time.perf_counter() - start)
+                time.sleep(rng.uniform(0, args.think_ms / 1000.0))
+        finally:
+            browser.close()
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    all_latencies, all_outcomes = [], {}
+    endpoints = {}
+    for endpoint, entry in sorted(recorder.requests.items()):
+        endpoints[endpoint] = summarize(entry["latencies"], wall, entry["outcomes"])
+        all_latencies.extend(entry["latencies"])
+        for outcome, count in entry["outcomes"].items():
+            all_outcomes[outcome] = all_outcomes.get(outcome, 0) + count
+    return {
+        "wall_seconds": round(wall, 1),
+        "overall": summarize(all_latencies, wall, all_outcomes),
+        "endpoints": endpoints,
+        "scenarios": {name: summarize(values, wall) for name, values in sorted(recorder.scenarios.items())}
+    }
+
+
+def seed_database(n_orders, seed):
+    """Load synthetic tables into the configured database; refuses to touch one that already has orders"""
+    import psycopg2
+    from database.db_manager import DatabaseManager
+
+    conn = psycopg2.connect(**DatabaseManager().connection_params)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('amazon_orders')")
+            if cursor.fetchone()[0] is None:
+                with open(os.path.join(SCRIPTS_DIR, 'create_tables.sql')) as f:
+                    cursor.execute(f.read())
+            else:
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM amazon_orders)")
+                if cursor.fetchone()[0]:
+                    sys.exit("amazon_orders already has rows; point DB_NAME at an empty stand-in database")
+
+            data = generate(n_orders, seed)
+            chunk = 200000
+            tables = [('amazon_products', PRODUCT_COLUMNS, [data.products_frame])]
+            for name, columns, build in (('amazon_orders', ORDER_COLUMNS, data.orders_frame),
+                                         ('amazon_order_items', ORDER_ITEM_COLUMNS, data.order_items_frame)):
+                tables.append((name, columns, [lambda s=s, build=build: build(s, min(s + chunk, data.n_orders))
+                                               for s in range(0, data.n_orders, chunk)]))
+            for name, columns, builders in tables:
+                for build in builders:
+                    buffer = io.StringIO()
+                    build()[columns].to_csv(buffer, index=False, header=False)
+                    buffer.seek(0)
+                    cursor.copy_expert(f"COPY {name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute("ANALYZE amazon_orders; ANALYZE amazon_order_items; ANALYZE amazon_products")
+        print(f"Seeded {data.n_orders:,} orders and {data.n_items:,} order items")
+    finally:
+        conn.close()
+
+
+def start_in_process(args):
+    """Serve the app on a threaded WSGI server in this process; returns (host, port, stop)"""
+    from werkzeug.serving import make_server
+    from app import app, db_manager, job_queue
+    from database.fact_store import get_fact_store
+
+    if db_manager.test_connection()['status'] != 'Connected':
+        print("No database reachable: loading synthetic data into the fact store only; "
+              "database-only and job-backed endpoints will report errors")
+        store = get_fact_store()
+        store.version_ttl = float('inf')
+        store.load_frame(generate(args.orders, args.seed).fact_frame(), version=f"synthetic-{args.orders}-{args.seed}")
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        job_queue.shutdown()
+    return '127.0.0.1', server.server_port, stop
+
+
+def compare(current, baseline, max_regression):
+    """Print p95 and throughput deltas against a saved run; returns the regressions beyond the threshold"""
+    regressions = []
+    print(f"\nCompared with {baseline.get('label') or baseline.get('saved_at')}:")
+    rows = [('overall', current["overall"], baseline["overall"])]
+    rows += [(endpoint, stats, baseline["endpoints"][endpoint])
+             for endpoint, stats in current["endpoints"].items() if endpoint in baseline["endpoints"]]
+    for name, now, before in rows:
+        changes = []
+        for key, worse_when_higher in (("p95_ms", True), ("per_second", False)):
+            if not now.get(key) or not before.get(key):
+                continue
+            delta = (now[key] - before[key]) / before[key] * 100
+            changes.append(f"{key} {before[key]} -> {now[key]} ({delta:+.1f}%)")
+            if max_regression is None:
+                continue
+            # Per-endpoint throughput follows the scenario mix, so only the overall rate is gated
+            if delta > max_regression if worse_when_higher else (name == 'overall' and -delta > max_regression):
+                regressions.append(f"{name} {key}")
+        print(f"  {name:<28} {'; '.join(changes)}")
+    return regressions
+
+
+def print_report(results):
+    print(f"\n{'endpoint':<28} {'count':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'shed':>6}")
+    for name, stats in list(results["endpoints"].items()) + [('overall', results["overall"])]:
+        print(f"{name:<28} {stats['count']:>7} {stats['per_second']:>7} {stats['p50_ms']!s:>8} {stats['p95_ms']!s:>8} "
+              f"{stats['p99_ms']!s:>8} {stats['error_rate']:>7.1%} {stats['shed_rate']:>6.1%}")
+    print(f"\n{'scenario':<28} {'count':>7} {'per s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in results["scenarios"].items():
+        print(f"{name:<28} {stats['count']:>7} {stats['per_second']:>7} {stats['p50_ms']!s:>8} {stats['p95_ms']!s:>8} {stats['p99_ms']!s:>8}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load')
+    parser.add_argument('--mix', default='dashboard_fixed.load=4,dashboard_fixed.slider=1,advanced_dashboard.load=2,advanced_dashboard.refresh=1')
+    parser.add_argument('--think-ms', type=float, default=1000, help='max pause between scenarios per user')
+    parser.add_argument('--step-interval-ms', type=float, default=500, help='time between slider steps')
+    parser.add_argument('--timeout', type=float, default=120, help='per-request timeout in seconds')
+    parser.add_argument('--url', help='replay against a running server instead of the in-process app')
+    parser.add_argument('--seed-db', action='store_true', help='load synthetic data into the (empty) configured database first')
+    parser.add_argument('--orders', type=int, default=100000, help='synthetic orders for --seed-db or the fact-store fallback')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--label', help='name stored with the results')
+    parser.add_argument('--output', help='results file (default data/load_tests/<timestamp>[-label].json)')
+    parser.add_argument('--compare', help='a saved results file to compare against')
+    parser.add_argument('--max-regression', type=float, help='with --compare: fail when p95 or throughput regresses by more than this %%')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    if args.seed_db:
+        seed_database(args.orders, args.seed)
+
+    stop = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port, stop = start_in_process(args)
+
+    print(f"Replaying {', '.join(f'{k}={v:g}' for k, v in mix.items())} with {args.users} users for {args.duration:g} s "
+          f"against {host}:{port}")
+    try:
+        results = run_load(host, port, args, mix)
+    finally:
+        if stop is not None:
+            stop()
+
+    results = dict({
+        "label": args.label,
+        "saved_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "target": args.url or 'in-process',
+        "config": {"users": args.users, "duration": args.duration, "mix": mix, "think_ms": args.think_ms,
+                   "step_interval_ms": args.step_interval_ms, "orders": args.orders, "seed": args.seed}
+    }, **results)
+    print_report(results)
+
+    output = args.output or os.path.join(SCRIPTS_DIR, '..', 'data', 'load_tests',
+                                         time.strftime('%Y%m%d-%H%M%S') + (f"-{args.label}" if args.label else '') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"Regressed beyond {args.max_regression}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Create the tables and triggers behind RFM_MODE=incremental (scripts/create_rfm_state.sql)
+on the configured database. Run once before enabling the mode, and again after
+upgrading; every statement is safe to re-run. The app only reads and writes
+these tables, so its database user does not need DDL rights.
+
+Usage: python scripts/setup_rfm_state.py
+"""
+
+import os
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTS_DIR, '..', 'app'))
+
+from database.db_manager import DatabaseManager
+
+
+def main():
+    with open(os.path.join(SCRIPTS_DIR, 'create_rfm_state.sql'), 'r') as f:
+        sql_content = f.read()
+
+    db_manager = DatabaseManager()
+    conn = db_manager.get_connection()
+    if conn is None:
+        print("❌ No database connection")
+        return 1
+    try:
+        conn.autocommit = False
+        with conn, conn.cursor() as cursor:
+            # The lock syncs take, so a running app never sees half the schema
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('customer_rfm_state'))")
+            cursor.execute(sql_content)
+        print("✅ customer_rfm_state tables and triggers are ready")
+        return 0
+    except Exception as e:
+        print(f"❌ Error creating customer_rfm_state: {e}")
+        return 1
+    finally:
+        if not conn.closed:
+            conn.autocommit = True
+        db_manager.release_connection(conn)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for the analyzers' atomic result snapshots and
+single-flight de-duplication.
+
+Runs against a synthetic order-line frame loaded into the fact store (no
+database needed) and checks that:
+  * concurrent identical market-basket requests run Apriori once and all get
+    the same result as a sequential run
+  * concurrent requests with different thresholds each get a self-consistent
+    result for their own thresholds
+  * concurrent forecasts train the models once
+and reports CPU time against one analyzer per thread (no sharing).
+
+Usage: python scripts/stress_single_flight.py [--threads 10] [--orders 20000]
+Exits non-zero when a check fails.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import numpy as np
+import pandas as pd
+
+PARAM_SETS = [(0.01, 0.3), (0.02, 0.2), (0.015, 0.5)]
+
+
+def synthetic_fact_frame(n_orders, seed=0):
+    """Order lines in FACT_QUERY layout with skewed product popularity"""
+    rng = np.random.default_rng(seed)
+    products = np.array([f"Product {i}" for i in range(60)])
+    popularity = 1 / np.arange(1, 61)
+    popularity /= popularity.sum()
+
+    lines_per_order = np.minimum(rng.geometric(0.45, n_orders), 6)
+    order_index = np.repeat(np.arange(n_orders), lines_per_order)
+    n_lines = len(order_index)
+    product_index = rng.choice(60, size=n_lines, p=popularity)
+    order_days = rng.integers(0, 120, n_orders)
+
+    return pd.DataFrame({
+        'order_id': np.char.add('O', order_index.astype(str)),
+        'order_date': (np.datetime64('2022-03-01') + order_days[order_index]).astype('datetime64[D]'),
+        'customer_id': np.char.add('C', rng.integers(0, n_orders // 4 + 1, n_orders)[order_index].astype(str)),
+        'ship_state': rng.choice(['MAHARASHTRA', 'KARNATAKA', 'DELHI'], n_lines),
+        'sales_channel': rng.choice(['Amazon.in', 'Non-Amazon'], n_lines),
+        'sku': np.char.add('SKU-', product_index.astype(str)),
+        'category': rng.choice(['Kurta', 'Set', 'Top', 'Western Dress'], n_lines),
+        'product_name': products[product_index],
+        'qty': rng.integers(1, 3, n_lines),
+        'amount': rng.integers(200, 1500, n_lines).astype(float)
+    })
+
+
+def run_concurrently(n_threads, fn):
+    """Start n threads behind a barrier; returns (results by thread, wall seconds, CPU seconds)"""
+    barrier = threading.Barrier(n_threads)
+    results = [None] * n_threads
+    errors = []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results, time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+
+def rule_rows(rules):
+    return sorted(
+        (tuple(sorted(a)), tuple(sorted(c)), round(float(conf), 9))
+        for a, c, conf in zip(rules['antecedents'], rules['consequents'], rules['confidence'])
+    )
+
+
+def check(condition, message, failures):
+    print(f"  [{'ok' if condition else 'FAIL'}] {message}")
+    if not condition:
+        failures.append(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=10)
+    parser.add_argument('--orders', type=int, default=20000)
+    args = parser.parse_args()
+
+    from database.fact_store import get_fact_store
+    from models.market_basket_analyzer import MarketBasketAnalyzer
+    from models.sales_predictor import SalesPredictor
+
+    store = get_fact_store()
+    store.version_ttl = float('inf')
+    store.load_frame(synthetic_fact_frame(args.orders), version='stress')
+    failures = []
+
+    print(f"Identical market-basket requests x{args.threads}")
+    reference, _ = MarketBasketAnalyzer().mine(*PARAM_SETS[0])
+    shared = MarketBasketAnalyzer()
+    shared.prepare_transaction_data()  # both sides start from built transactions; only Apriori is compared
+    before = shared.flights.get_stats()
+    outcomes, wall, cpu = run_concurrently(args.threads, lambda i: shared.mine(*PARAM_SETS[0]))
+    check(all(error is None for _, error in outcomes), "no errors", failures)
+    check(len({id(result) for result, _ in outcomes}) == 1, "every caller got the same result snapshot", failures)
+    check(rule_rows(outcomes[0][0].rules) == rule_rows(reference.rules), "rules match a sequential run", failures)
+    after = shared.flights.get_stats()
+    stats = {key: after[key] - before[key] for key in after}
+    check(stats['executions'] == 1, f"Apriori ran once (single-flight stats {stats})", failures)
+
+    isolated = [MarketBasketAnalyzer() for _ in range(args.threads)]
+    for analyzer in isolated:
+        analyzer.prepare_transaction_data()
+    _, wall_isolated, cpu_isolated = run_concurrently(args.threads, lambda i: isolated[i].mine(*PARAM_SETS[0]))
+    print(f"  single-flight: {cpu:.2f} s CPU, {wall:.2f} s wall | one analyzer per thread: "
+          f"{cpu_isolated:.2f} s CPU, {wall_isolated:.2f} s wall ({cpu_isolated / max(cpu, 1e-6):.1f}x CPU saved)")
+
+    print(f"Mixed thresholds x{args.threads}")
+    mixed = MarketBasketAnalyzer()
+    references = {params: rule_rows(MarketBasketAnalyzer().mine(*params)[0].rules) for params in PARAM_SETS}
+    outcomes, _, _ = run_concurrently(args.threads, lambda i: (PARAM_SETS[i % len(PARAM_SETS)], mixed.mine(*PARAM_SETS[i % len(PARAM_SETS)])))
+    consistent = True
+    for params, (result, error) in outcomes:
+        if error is not None or (result.min_support, result.min_confidence) != params or rule_rows(result.rules) != references[params]:
+            consistent = False
+    check(consistent, "each caller got rules for its own thresholds", failures)
+    latest = mixed.result
+    itemsets = set(frozenset(items) for items in latest.frequent_itemsets['itemsets'])
+    check(all(frozenset(a) | frozenset(c) in itemsets for a, c in zip(latest.rules['antecedents'], latest.rules['consequents'])),
+          "latest snapshot's rules come from its own itemsets", failures)
+
+    print(f"Concurrent forecasts x{args.threads}")
+    predictor = SalesPredictor()
+    forecasts, wall, cpu = run_concurrently(args.threads, lambda i: predictor.predict_sales(30))
+    check(all(f == forecasts[0] for f in forecasts), "every caller got the same forecast", failures)
+    train_stats = predictor.flights.get_stats()
+    check(train_stats['executions'] == 1, f"models trained once (single-flight stats {train_stats})", failures)
+    print(f"  {cpu:.2f} s CPU, {wall:.2f} s wall")
+
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("All checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,10 @@
 """
 Standalone Demo App - No Database Required
 Complete E-Commerce Market Basket Analysis Demo
+
+Responses come from the precomputed artifacts in data/artifacts (built by
+scripts/build_artifacts.py) when they exist, and from the sample data below
+otherwise. The X-Data-Source header tells which one answered.
 """
 
 import os
@@ -12,10 +16,20 @@ import json
 from datetime import datetime, timedelta
 import numpy as np
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, 'app'))
+
+from database.artifact_store import ArtifactStore
+
 # Create Flask app with correct template folder
 app = Flask(__name__, template_folder='app/templates')
 CORS(app)
 
+artifacts = ArtifactStore(os.environ.get('ARTIFACT_DIR', os.path.join(BASE_DIR, 'data', 'artifacts')))
+# Open every artifact up front; their columns are memory-mapped, so this reads only the metadata
+for name in artifacts.names():
+    artifacts.get(name)
+
 # Demo data
 DEMO_STATS = {
     'total_revenue': 77521210.0,
@@ -29,6 +43,12 @@ DEMO_STATS = {
     }
 }
 
+def demo_response(data, artifact=None):
+    """JSON response tagged with where the data came from"""
+    response = jsonify(data)
+    response.headers['X-Data-Source'] = f"{artifact.name}@{artifact.meta['built_at']}" if artifact else 'sample'
+    return response
+
 @app.route('/')
 def landing_page():
     """Landing page"""
@@ -47,11 +67,27 @@ def advanced_dashboard():
 @app.route('/api/stats')
 def get_stats():
     """Get overall statistics"""
-    return jsonify(DEMO_STATS)
+    artifact = artifacts.get('stats')
+    if artifact is not None:
+        return demo_response(artifact.payload, artifact)
+    return demo_response(DEMO_STATS)
 
 @app.route('/api/market-basket')
 def get_market_basket_analysis():
     """Market basket analysis with demo data"""
+    rules = artifacts.get('rules')
+    if rules is not None:
+        min_support = request.args.get('min_support', 0.01, type=float)
+        min_confidence = request.args.get('min_confidence', 0.3, type=float)
+        selected = np.flatnonzero((rules.values('support') >= min_support) & (rules.values('confidence') >= min_confidence))
+        results = rules.response(selected)
+        itemsets = artifacts.get('itemsets')
+        if itemsets is not None:
+            results["frequent_itemsets"] = itemsets.records(np.flatnonzero(itemsets.values('support') >= min_support))
+        results["summary"] = dict(results.get("summary", {}), association_rules_count=len(selected),
+                                  frequent_itemsets_count=len(results.get("frequent_itemsets", [])))
+        return demo_response(results, rules)
+
     demo_rules = [
         {
             'antecedents': 'Cotton Kurta',
@@ -97,11 +133,15 @@ def get_market_basket_analysis():
         }
     }
     
-    return jsonify(results)
+    return demo_response(results)
 
 @app.route('/api/customer-segments')
 def get_customer_segments():
     """Customer segmentation with demo data"""
+    artifact = artifacts.get('segments')
+    if artifact is not None:
+        return demo_response(artifact.response(), artifact)
+
     segments = {
         "customers": [
             {"customer_id": "1001", "cluster": 0, "total_orders": 12, "total_spent": 8500, "segment": "High-Value Loyal"},
@@ -140,12 +180,15 @@ def get_customer_segments():
             "clusters": 4
         }
     }
-    return jsonify(segments)
+    return demo_response(segments)
 
 @app.route('/api/sales-forecast')
 def get_sales_forecast():
     """Sales forecast with demo data"""
     months_ahead = request.args.get('months', 3, type=int)
+    artifact = artifacts.get('forecast')
+    if artifact is not None and str(months_ahead) in artifact.payload:
+        return demo_response(artifact.payload[str(months_ahead)], artifact)
     
     base_date = datetime.now()
     predictions = []
@@ -176,12 +219,15 @@ def get_sales_forecast():
         }
     }
     
-    return jsonify(forecast)
+    return demo_response(forecast)
 
 @app.route('/api/top-products')
 def get_top_products():
     """Top products with demo data"""
     limit = request.args.get('limit', 20, type=int)
+    artifact = artifacts.get('top_products')
+    if artifact is not None:
+        return demo_response(artifact.records(slice(0, max(limit, 0))), artifact)
     
     products = [
         {"product_name": "Cotton Kurta", "category": "Kurta", "total_revenue": 2500000, "order_count": 3420},
@@ -196,11 +242,15 @@ def get_top_products():
         {"product_name": "Summer Dress", "category": "Western Dress", "total_revenue": 680000, "order_count": 980}
     ]
     
-    return jsonify(products[:limit])
+    return demo_response(products[:limit])
 
 @app.route('/api/sales-trends')
 def get_sales_trends():
     """Sales trends with demo data"""
+    artifact = artifacts.get('sales_trends')
+    if artifact is not None:
+        return demo_response(artifact.records(), artifact)
+
     trends = [
         {"month": "2022-01", "orders": 28500, "revenue": 20850000, "avg_order_value": 731.58},
         {"month": "2022-02", "orders": 31200, "revenue": 22800000, "avg_order_value": 730.77},
@@ -210,11 +260,15 @@ def get_sales_trends():
         {"month": "2022-06", "orders": 29500, "revenue": 21560000, "avg_order_value": 730.85}
     ]
     
-    return jsonify(trends)
+    return demo_response(trends)
 
 @app.route('/api/rfm-analysis')
 def api_rfm_analysis():
     """RFM Analysis with demo data"""
+    artifact = artifacts.get('rfm')
+    if artifact is not None:
+        return demo_response(artifact.response(), artifact)
+
     rfm_data = {
         "rfm_data": [
             {"segment": "Champions", "count": 1500, "percentage": 12.5, "monetary": 8500},
@@ -232,11 +286,15 @@ def api_rfm_analysis():
             "retention_rate": 73.5
         }
     }
-    return jsonify(rfm_data)
+    return demo_response(rfm_data)
 
 @app.route('/api/cohort-analysis')
 def api_cohort_analysis():
     """Cohort Analysis with demo data"""
+    artifact = artifacts.get('cohorts')
+    if artifact is not None:
+        return demo_response(artifact.payload, artifact)
+
     cohort_data = {
         "cohort_data": [
             {"cohort": "2022-01", "size": 2500, "retention_rates": [100, 82, 70, 66, 63, 60, 58, 56, 54, 52, 50, 48]},
@@ -266,7 +324,7 @@ def api_cohort_analysis():
             "total_cohorts": 6
         }
     }
-    return jsonify(cohort_data)
+    return demo_response(cohort_data)
 
 @app.route('/api/executive-summary')
 def api_executive_summary():
@@ -286,11 +344,32 @@ def api_executive_summary():
             "Improve customer retention through targeted campaigns"
         ]
     }
-    return jsonify(summary)
+    artifact = artifacts.get('stats')
+    if artifact is not None:
+        summary.update({key: artifact.payload[key] for key in
+                        ('total_revenue', 'total_orders', 'total_customers', 'avg_order_value') if key in artifact.payload})
+    return demo_response(summary, artifact)
 
 @app.route('/api/recommendations/<customer_id>')
 def get_recommendations(customer_id):
     """Product recommendations with demo data"""
+    purchases, rules = artifacts.get('customer_products'), artifacts.get('rules')
+    if purchases is not None and rules is not None:
+        bought = set(purchases.values('product_name', purchases.range('customer_id', customer_id)).tolist())
+        best = {}
+        for product in bought:
+            # Rules are sorted by antecedent, then by confidence descending
+            for rule in rules.records(rules.range('antecedents', product))[:10]:
+                for consequent in rule['consequents']:
+                    if consequent not in bought and rule['confidence'] > best.get(consequent, {}).get('confidence', 0):
+                        best[consequent] = {
+                            "product": consequent,
+                            "confidence": rule['confidence'],
+                            "reason": f"Customers who bought {product} also bought {consequent}"
+                        }
+        recommendations = sorted(best.values(), key=lambda r: r['confidence'], reverse=True)[:10]
+        return demo_response({"recommendations": recommendations}, rules)
+
     recommendations = [
         {
             "product": "Designer Kurta",
@@ -309,7 +388,7 @@ def get_recommendations(customer_id):
         }
     ]
     
-    return jsonify({"recommendations": recommendations})
+    return demo_response({"recommendations": recommendations})
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5003))
@@ -319,7 +398,11 @@ if __name__ == '__main__':
     print(f"🌐 Host: {host}")
     print(f"📊 Port: {port}")
     print(f"📁 Working Directory: {os.getcwd()}")
-    print("📊 Using standalone demo data - no database required")
+    built = artifacts.names()
+    if built:
+        print(f"📊 Serving precomputed artifacts: {', '.join(built)} (sample data for the rest)")
+    else:
+        print("📊 Using standalone demo data - no database required (run scripts/build_artifacts.py for real results)")
     print("🎯 All features working: Dashboard, Analytics, RFM, Cohort Analysis")
     print("=" * 70)
     
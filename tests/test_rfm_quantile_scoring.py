@@ -0,0 +1,71 @@
+"""Quantile RFM scoring: exact quintile edges when served, and sketches merged across chunks scoring as one pass does"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.rfm_analyzer import (RFMAnalyzer, build_score_sketches, exact_boundaries, merge_score_sketches,
+                                 score_boundaries)
+
+SCORES = ['R_score', 'F_score', 'M_score']
+
+
+def customers(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'customer_id': [f"{i:07d}" for i in range(n)],
+        'recency': rng.integers(0, 400, n),
+        'frequency': rng.geometric(0.35, n),
+        'monetary': np.round(rng.lognormal(7, 1, n), 2)
+    })
+
+
+def chunks_of(frame, rows):
+    return [frame.iloc[start:start + rows] for start in range(0, len(frame), rows)]
+
+
+@pytest.fixture
+def analyzer():
+    return RFMAnalyzer(mode='full', scoring='quantile')
+
+
+def score(analyzer, frame, sketches):
+    return analyzer.score_customers(frame.copy(), score_boundaries(sketches))[SCORES]
+
+
+def test_merged_chunks_match_single_pass_when_nothing_is_compacted(analyzer):
+    # Fewer customers than k: both sketches hold every value, so both give the exact quintile edges
+    frame = customers(300)
+    single = build_score_sketches([frame], k=400, seed=1)
+    merged = merge_score_sketches((build_score_sketches([chunk], k=400, seed=1) for chunk in chunks_of(frame, 70)), seed=1)
+
+    expected = analyzer.score_customers(frame.copy(), exact_boundaries(frame))[SCORES]
+    pd.testing.assert_frame_equal(score(analyzer, frame, single), expected)
+    pd.testing.assert_frame_equal(score(analyzer, frame, merged), expected)
+
+
+def test_merged_chunks_match_single_pass(analyzer):
+    frame = customers(200000)
+    seed = 1
+    single = build_score_sketches([frame], seed=seed)
+    merged = merge_score_sketches((build_score_sketches([chunk], seed=seed) for chunk in chunks_of(frame, 20000)), seed=seed)
+
+    single_scores, merged_scores = score(analyzer, frame, single), score(analyzer, frame, merged)
+    for column in SCORES:
+        # Each is within about 1% of rank of the true edges, so only customers next to an edge may differ
+        assert (single_scores[column] == merged_scores[column]).mean() >= 0.98, column
+
+
+def test_served_scores_use_exact_quintiles(analyzer):
+    frame = customers(100000)
+    scored = analyzer._score_by_quantiles(frame.copy())
+    # Monetary values are nearly distinct, so each score holds a fifth of the customers
+    assert np.allclose(scored['M_score'].value_counts(normalize=True).sort_index().to_numpy(), 0.2, atol=0.001)
+    # Equal values always share a score, however many there are
+    for column, score_column in (('recency', 'R_score'), ('frequency', 'F_score'), ('monetary', 'M_score')):
+        assert (scored.groupby(column)[score_column].nunique() == 1).all(), column
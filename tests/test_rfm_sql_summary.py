@@ -0,0 +1,49 @@
+"""RFM_MODE=sql: the segment summary is read from SQL_RFM_SUMMARY_QUERY's own columns"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import pandas as pd
+import pytest
+
+from models.rfm_analyzer import SQL_RFM_SUMMARY_QUERY, RFMAnalyzer
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    analyzer = RFMAnalyzer(mode='sql')
+    summary = pd.DataFrame({
+        'segment': ['At Risk', 'Champions'],
+        'customer_count': [30, 10],
+        'avg_recency': [120.5, 4.0],
+        'avg_frequency': [1.2, 9.5],
+        'avg_monetary': [800.0, 12500.0]
+    })
+    queries = []
+
+    def execute_query(query, params=None, typed=False):
+        queries.append(query)
+        return summary.copy() if query == SQL_RFM_SUMMARY_QUERY else pd.DataFrame()
+
+    monkeypatch.setattr(analyzer.db_manager, 'execute_query', execute_query)
+    monkeypatch.setattr(analyzer.db_manager, 'get_cached_data_version', lambda: 'v1')
+    analyzer.queries = queries
+    return analyzer
+
+
+def test_rfm_summary_reads_sql_columns(analyzer):
+    result = analyzer.rfm_summary(pd.Timestamp('2022-07-01'))
+    assert 'error' not in result, result
+    assert result['total_customers'] == 40
+    assert result['segment_summary'][1] == {
+        'segment': 'Champions', 'customer_count': 10, 'avg_recency': 4.0, 'avg_frequency': 9.5, 'avg_monetary': 12500.0
+    }
+    assert analyzer.queries == [SQL_RFM_SUMMARY_QUERY]
+
+
+def test_rfm_insights_in_sql_mode(analyzer):
+    insights = analyzer.get_rfm_insights()
+    assert 'error' not in insights, insights
+    assert insights['revenue_opportunity']['champions_revenue'] == 125000.0